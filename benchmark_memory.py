@@ -0,0 +1,87 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from PIL import Image
+from raster_store import as_displacement_map, displacement_options, displacement_region
+from raster_pyramid import RasterPyramid
+from render import PERSPECTIVE_PROJECTION
+
+# widths of the displacement textures measured, the textures are twice as wide as high
+SIZES = {"1k": 1000, "2k": 2000, "4k": 4000, "10k": 10800}
+
+REGIONS = [[-180, 180, -90, 90], [0, 40, 0, 40]]
+
+def peak_rss_mb():
+    # high water mark of this process, VmHWM starts over at exec while ru_maxrss keeps the
+    # peak of the process that forked it. Both are in kilobytes on linux
+    if os.path.isfile("/proc/self/status"):
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def write_texture(path, width):
+    # smooth stand-in for a bump map, written as a grayscale JPEG like the real textures
+    height = width // 2
+    lon = np.linspace(-np.pi, np.pi, width, dtype=np.float32)
+    lat = np.linspace(-np.pi / 2, np.pi / 2, height, dtype=np.float32)[:, None]
+    values = 127.5 + 127.5 * np.sin(3 * lon) * np.cos(5 * lat)
+    Image.fromarray(values.astype(np.uint8), "L").save(path, quality=90)
+
+def eager(source_path, region_to_plot):
+    # the pipeline before the uint8 store: a float64 map of the whole texture and a full clipped copy
+    image = np.asarray(Image.open(source_path))
+    options = displacement_options()
+    values = options["offset"] + options["scale"] * image
+    clipped = np.where(values < 1, -10, values)
+    return clipped.shape
+
+def lazy(source_path, store_dir, region_to_plot):
+    # the uint8 pyramid, with only the region of the level the 3D view is drawn from rescaled and clipped
+    pyramid = RasterPyramid(source_path, as_displacement_map, store_dir, **displacement_options())
+    _, grid = pyramid.level_for(region_to_plot, PERSPECTIVE_PROJECTION)
+    return displacement_region(grid, region_to_plot, below=[1, -10]).shape
+
+def measure(*child_args):
+    # each measurement runs in a fresh interpreter so its peak is its own
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", *child_args], check=True, capture_output=True, text=True).stdout
+    baseline, peak = output.split()
+    return float(baseline), float(peak)
+
+def benchmark():
+    print(f"{'size':>5} {'pipeline':<26} {'peak RSS':>10} {'over imports':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, width in SIZES.items():
+            source_path = os.path.join(directory, f"bump{name}.jpg")
+            store_dir = os.path.join(directory, f"store{name}")
+            write_texture(source_path, width)
+
+            runs = [("eager float64", ["eager", source_path, "global"]), ("ingest (once)", ["lazy", source_path, store_dir, "global"])]
+            runs += [(f"uint8 lazy {label}", ["lazy", source_path, store_dir, label]) for label in ("global", "region")]
+            for label, child_args in runs:
+                baseline, peak = measure(*child_args)
+                print(f"{name:>5} {label:<26} {peak:>7.0f} MB {peak - baseline:>10.0f} MB")
+
+def child(args):
+    region_to_plot = REGIONS[0] if args[-1] == "global" else REGIONS[1]
+    baseline = peak_rss_mb()
+    if args[0] == "eager":
+        eager(args[1], region_to_plot)
+    else:
+        lazy(args[1], args[2], region_to_plot)
+    print(baseline, peak_rss_mb())
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2:])
+        raise SystemExit(0)
+
+    parser = argparse.ArgumentParser(description="Peak memory of loading and clipping the displacement map, for 1k to 10k textures")
+    parser.parse_args()
+    benchmark()
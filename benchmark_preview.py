@@ -0,0 +1,59 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from grid_provider import default_provider
+from render import COLOR_MAP_FILE, DISPLACEMENT_MAP_FILE, REGION_PROJECTION, PERSPECTIVE_PROJECTION, PREVIEW_DPI, PREVIEW_RESOLUTION, load_color_map, load_displacement_map, preview_grid, render_map, render_perspective_bump_preview, render_perspective_relief_preview
+
+# latency budget of the first pass of the progressive renders, in seconds
+PREVIEW_BUDGET = 0.2
+
+REGIONS = [[-180, 180, -90, 90], [-20, 60, -40, 40], [0, 40, 0, 40]]
+
+def preview_jobs(region_to_plot):
+    # the preview passes of both visualizers for a region, as (name, render_function, args)
+    jobs = [
+        ("perspective (educational)", render_perspective_relief_preview, (region_to_plot, [-120, 30])),
+        ("contour basemap (educational)", render_map, (preview_grid(region_to_plot, REGION_PROJECTION), REGION_PROJECTION, region_to_plot, PREVIEW_DPI)),
+    ]
+
+    if os.path.isfile(COLOR_MAP_FILE):
+        _, color_map = load_color_map().level_for(region_to_plot, REGION_PROJECTION, PREVIEW_DPI)
+        jobs.append(("contour basemap (scientific)", render_map, (color_map, REGION_PROJECTION, region_to_plot, PREVIEW_DPI)))
+
+    if os.path.isfile(DISPLACEMENT_MAP_FILE):
+        _, grid = load_displacement_map().level_for(region_to_plot, PERSPECTIVE_PROJECTION, PREVIEW_DPI)
+        jobs.append(("perspective (scientific)", render_perspective_bump_preview, (grid, region_to_plot, [-120, 30])))
+
+    return jobs
+
+def benchmark(repeat=5):
+    # median time of each preview pass with the 10m grid already loaded, as in the visualizers
+    default_provider().global_grid(PREVIEW_RESOLUTION)
+
+    over_budget = 0
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, "preview.png")
+
+        for region_to_plot in REGIONS:
+            for name, render_function, args in preview_jobs(region_to_plot):
+                times = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    render_function(output_path, *args)
+                    times.append(time.perf_counter() - started)
+
+                median = statistics.median(times)
+                over_budget += median > PREVIEW_BUDGET
+                print(f"{name} {region_to_plot}: {median * 1000:.0f} ms {'OVER BUDGET' if median > PREVIEW_BUDGET else 'ok'}")
+
+    print(f"{over_budget} preview passes over the {PREVIEW_BUDGET * 1000:.0f} ms budget")
+    return over_budget
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the latency of the preview passes against their budget")
+    parser.add_argument("--repeat", type=int, default=5, help="renders per preview pass, the median is reported")
+    args = parser.parse_args()
+
+    raise SystemExit(1 if benchmark(args.repeat) else 0)
@@ -0,0 +1,45 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# startup budget of the visualizers, from the first line of the script to the first paint
+# of the window and to the first map shown in it, in seconds
+FIRST_PAINT_BUDGET = 1.0
+FIRST_MAP_BUDGET = 3.0
+
+SCRIPTS = ["problem1.py", "problem2.py"]
+
+def startup_times(script):
+    # each start is a fresh interpreter with cold imports, the window closes itself after the first map
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    output = subprocess.run([sys.executable, script, "--startup-time"], check=True, capture_output=True, text=True, env=environment, timeout=600).stdout
+
+    first_paint = float(re.search(r"first paint after (\d+) ms", output).group(1)) / 1000
+    first_map = float(re.search(r"first map after (\d+) ms", output).group(1)) / 1000
+    return first_paint, first_map
+
+def benchmark(repeat=5):
+    over_budget = 0
+    for script in SCRIPTS:
+        times = [startup_times(os.path.join(os.path.dirname(os.path.abspath(__file__)), script)) for _ in range(repeat)]
+        first_paint = statistics.median(paint for paint, _ in times)
+        first_map = statistics.median(shown for _, shown in times)
+
+        over_budget += first_paint > FIRST_PAINT_BUDGET
+        over_budget += first_map > FIRST_MAP_BUDGET
+        print(f"{script}: first paint {first_paint * 1000:.0f} ms {'OVER BUDGET' if first_paint > FIRST_PAINT_BUDGET else 'ok'}, "
+              f"first map {first_map * 1000:.0f} ms {'OVER BUDGET' if first_map > FIRST_MAP_BUDGET else 'ok'}")
+
+    print(f"{over_budget} startup times over the {FIRST_PAINT_BUDGET * 1000:.0f} ms first paint and {FIRST_MAP_BUDGET * 1000:.0f} ms first map budgets")
+    return over_budget
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the cold start time of both visualizers against their budget")
+    parser.add_argument("--repeat", type=int, default=5, help="starts per visualizer, the median is reported")
+    args = parser.parse_args()
+
+    raise SystemExit(1 if benchmark(args.repeat) else 0)
@@ -0,0 +1,21 @@
+import os
+import time
+import pytest
+
+# the Qt tests run without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+@pytest.fixture(scope="session")
+def app():
+    # a QApplication rather than a QCoreApplication so the tests of the windows can share it
+    return QApplication.instance() or QApplication([])
+
+def wait_until(condition, timeout=5):
+    # signals from other threads are delivered by the event loop of this one
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        QApplication.processEvents()
+        time.sleep(0.005)
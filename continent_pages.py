@@ -0,0 +1,166 @@
+import argparse
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from PyQt5.QtCore import QObject, pyqtSignal
+from grid_provider import default_provider
+from regions import REGIONS
+from render import PAGE_CMAP, render_globe_layer, render_highlight_layer, render_relief_layer, render_shading_layer
+
+CACHE_DIR = "./render_cache/continents"
+
+# bump when the layout of the pages changes so cached pages are rendered again
+PAGE_LAYOUT = 3
+
+def page_layers(region, resolution="10m"):
+    # layers of a page as name: (file name, render_function, args). The globe is the same
+    # on every page and rendered once, the info panel is shown from its own file
+    return {
+        "globe": ("globe.png", render_globe_layer, ()),
+        "highlight": (f"{region.name}_highlight.png", render_highlight_layer, (region.code,)),
+        "relief": (f"{region.name}_relief.png", render_relief_layer, (region.region_to_plot, resolution)),
+        "shading": (f"{region.name}_shading.png", render_shading_layer, (region.region_to_plot, resolution)),
+    }
+
+def render_timed(render_function, output_path, *args):
+    started = time.perf_counter()
+    render_function(output_path, *args)
+    return time.perf_counter() - started
+
+def pages_version(regions=REGIONS, resolution="10m"):
+    # hash of everything a page is made from: relief source, local grid file and resolution,
+    # info panels, colour table and page layout. Any change gives a new cache directory
+    provider = default_provider()
+    digest = hashlib.sha256(f"{PAGE_LAYOUT}|{PAGE_CMAP}|{provider.fingerprint(resolution)}|{resolution}".encode())
+
+    for region in regions:
+        digest.update(f"|{region.name}|{region.code}|{region.region_to_plot}|".encode())
+        if os.path.isfile(region.info_file):
+            with open(region.info_file, "rb") as file:
+                digest.update(file.read())
+
+    return digest.hexdigest()[:16]
+
+class ContinentPages(QObject):
+    # the continent detail pages are static, so their layers are rendered once per version
+    # of their inputs into a versioned cache directory, in parallel in background processes.
+    # page_ready is emitted with the name of a continent once all its layers are there
+    page_ready = pyqtSignal(str)
+    page_failed = pyqtSignal(str, str)
+    layer_finished = pyqtSignal(str, str, bool, str)
+
+    def __init__(self, regions=REGIONS, resolution="10m", cache_dir=CACHE_DIR, parent=None):
+        super().__init__(parent)
+
+        self.regions = regions
+        self.resolution = resolution
+        self.cache_dir = cache_dir
+        self.directory = os.path.join(cache_dir, pages_version(regions, resolution))
+
+        self.executor = None
+        self.pending = set()
+
+        # layers finish on the executor's thread, the pages are completed on the GUI thread
+        self.layer_finished.connect(self.store_layer)
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def layer_paths(self, region):
+        return {name: os.path.join(self.directory, file_name) for name, (file_name, _, _) in page_layers(region, self.resolution).items()}
+
+    def is_ready(self, region):
+        return all(os.path.isfile(path) for path in self.layer_paths(region).values())
+
+    def request(self, region):
+        # starts rendering the layers of a page that are neither cached nor already being rendered
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=min(len(self.regions), os.cpu_count()), mp_context=get_context("spawn"))
+
+        for name, (file_name, render_function, args) in page_layers(region, self.resolution).items():
+            path = os.path.join(self.directory, file_name)
+            if os.path.isfile(path) or path in self.pending:
+                continue
+
+            partial_path = path.replace(".png", ".partial.png")
+            future = self.executor.submit(render_function, partial_path, *args)
+            future.add_done_callback(partial(self.layer_done, path, partial_path))
+            self.pending.add(path)
+
+    def layer_done(self, path, partial_path, future):
+        if future.cancelled():
+            self.layer_finished.emit(path, partial_path, False, "")
+        elif future.exception() is not None:
+            self.layer_finished.emit(path, partial_path, False, str(future.exception()))
+        else:
+            self.layer_finished.emit(path, partial_path, True, "")
+
+    def store_layer(self, path, partial_path, rendered, error):
+        self.pending.discard(path)
+        if not rendered and not error:
+            return
+
+        # a shared layer completes the pages of every continent waiting for it
+        waiting = [region for region in self.regions if path in self.layer_paths(region).values()]
+        if not rendered:
+            for region in waiting:
+                self.page_failed.emit(region.name, error)
+            return
+
+        os.replace(partial_path, path)
+        for region in waiting:
+            if self.is_ready(region):
+                self.page_ready.emit(region.name)
+
+    def warm_up(self):
+        self.prune()
+        for region in self.regions:
+            self.request(region)
+
+    def prune(self):
+        # pages of older versions of the inputs are never used again
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if path != self.directory and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+def build(workers=None, resolution="10m"):
+    # build step: renders all missing layers of the pages and reports the time each one took
+    pages = ContinentPages(resolution=resolution)
+    pages.prune()
+
+    layers = {}
+    for region in pages.regions:
+        for name, (file_name, render_function, args) in page_layers(region, resolution).items():
+            path = os.path.join(pages.directory, file_name)
+            if not os.path.isfile(path):
+                layers[path] = (render_function, args)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+        futures = {}
+        for path, (render_function, args) in layers.items():
+            partial_path = path.replace(".png", ".partial.png")
+            futures[path] = (partial_path, executor.submit(render_timed, render_function, partial_path, *args))
+
+        for path, (partial_path, future) in futures.items():
+            seconds = future.result()
+            os.replace(partial_path, path)
+            print(f"{os.path.basename(path)}: {seconds:.1f}s")
+
+    print(f"{len(layers)} layers rendered for {len(pages.regions)} pages in {pages.directory}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pre-render the continent detail pages")
+    parser.add_argument("--workers", type=int, default=None, help="number of render processes")
+    parser.add_argument("--resolution", default="10m", help="relief grid resolution")
+    args = parser.parse_args()
+
+    build(args.workers, args.resolution)
@@ -0,0 +1,78 @@
+import numpy as np
+
+# isolines are traced at every multiple of this interval, the contour slider moves in steps of it
+BASE_INTERVAL = 50
+
+# edges of a marching squares cell crossed by the isoline, for each case of the corners
+# above the level. Corners are 0 (i, j), 1 (i, j+1), 2 (i+1, j+1) and 3 (i+1, j) with
+# the bits 1, 2, 4 and 8, edges are 0 (corners 0-1), 1 (1-2), 2 (3-2) and 3 (0-3).
+# The saddles 5 and 10 are split so the corners above the level stay separated
+CASE_EDGES = {
+    1: [(3, 0)], 2: [(0, 1)], 3: [(3, 1)], 4: [(1, 2)], 5: [(3, 0), (1, 2)], 6: [(0, 2)], 7: [(3, 2)],
+    8: [(2, 3)], 9: [(0, 2)], 10: [(0, 1), (2, 3)], 11: [(1, 2)], 12: [(1, 3)], 13: [(0, 1)], 14: [(3, 0)],
+}
+
+class ContourEngine:
+    # isolines of a grid at every multiple of a fine base interval, computed once with a
+    # vectorized marching squares pass over all levels together. The contours of any
+    # interval that is a multiple of the base are a filter of these segments
+    def __init__(self, grid, base_interval=BASE_INTERVAL):
+        self.base_interval = base_interval
+        self.levels, self.segments = self.trace(grid)
+
+    def trace(self, grid):
+        values = np.asarray(grid.values, dtype=np.float64)
+        longitudes = np.asarray(grid.lon.values, dtype=np.float64)
+        latitudes = np.asarray(grid.lat.values, dtype=np.float64)
+
+        corners = np.stack([values[:-1, :-1], values[:-1, 1:], values[1:, 1:], values[1:, :-1]])
+        with np.errstate(invalid="ignore"):
+            low = np.floor(corners.min(axis=0) / self.base_interval)
+            high = np.floor(corners.max(axis=0) / self.base_interval)
+
+        # a cell is crossed by the levels above its lowest and up to its highest corner,
+        # cells with missing corners have no isolines
+        crossings = np.nan_to_num(high - low).astype(np.intp)
+        rows, cols = np.nonzero(crossings > 0)
+        counts = crossings[rows, cols]
+
+        # one entry per cell and level it is crossed by
+        first = np.repeat(low[rows, cols] + 1, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        levels = (first + offsets) * self.base_interval
+        rows, cols = np.repeat(rows, counts), np.repeat(cols, counts)
+
+        z = corners[:, rows, cols]
+        cases = (z[0] >= levels) * 1 + (z[1] >= levels) * 2 + (z[2] >= levels) * 4 + (z[3] >= levels) * 8
+
+        # crossing point of the level on each edge, by linear interpolation between its corners
+        x0, x1 = longitudes[cols], longitudes[cols + 1]
+        y0, y1 = latitudes[rows], latitudes[rows + 1]
+        edge_points = []
+        for (a, b), (xa, ya, xb, yb) in zip([(0, 1), (1, 2), (3, 2), (0, 3)], [(x0, y0, x1, y0), (x1, y0, x1, y1), (x0, y1, x1, y1), (x0, y0, x0, y1)]):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.clip(np.nan_to_num((levels - z[a]) / (z[b] - z[a])), 0, 1)
+            edge_points.append(np.stack([xa + (xb - xa) * t, ya + (yb - ya) * t], axis=-1))
+
+        segment_levels = []
+        segments = []
+        for case, edges in CASE_EDGES.items():
+            selected = np.nonzero(cases == case)[0]
+            for start, end in edges:
+                segment_levels.append(levels[selected])
+                segments.append(np.stack([edge_points[start][selected], edge_points[end][selected]], axis=1))
+
+        segment_levels, segments = np.concatenate(segment_levels), np.concatenate(segments)
+
+        # levels through a corner give empty segments
+        drawn = np.any(segments[:, 0] != segments[:, 1], axis=1)
+        return segment_levels[drawn].astype(np.int32), segments[drawn].astype(np.float32)
+
+    def select(self, interval):
+        # (levels, segments) of the isolines at multiples of interval, segments as lon/lat pairs
+        selected = self.levels % snap_interval(interval, self.base_interval) == 0
+        return self.levels[selected], self.segments[selected]
+
+def snap_interval(interval, base_interval=BASE_INTERVAL):
+    # nearest interval that can be served without tracing the grid again
+    return max(base_interval, int(round(interval / base_interval)) * base_interval)
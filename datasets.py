@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+
+class DatasetLoader(QObject):
+    # loads the datasets of a visualizer on a background thread once start is called, in the
+    # order they are added so the one the first view needs comes first. A dataset asked for
+    # while it is loading is waited for, one that has not started yet is loaded right away on
+    # the thread that asks for it
+    loaded = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="datasets")
+        self.loaders = {}
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, load_function):
+        self.loaders[name] = load_function
+        self.futures[name] = Future()
+
+    def start(self):
+        for name in self.loaders:
+            self.executor.submit(self.load, name)
+
+    def claim(self, name):
+        # the future of a dataset nobody is loading yet, marked as running, otherwise None
+        with self.lock:
+            future = self.futures[name]
+            if future.running() or future.done():
+                return None
+
+            future.set_running_or_notify_cancel()
+            return future
+
+    def load(self, name):
+        future = self.claim(name)
+        if future is None:
+            return
+
+        try:
+            future.set_result(self.loaders[name]())
+        except Exception as error:
+            future.set_exception(error)
+            self.failed.emit(name, str(error))
+            return
+
+        self.loaded.emit(name)
+
+    def get(self, name):
+        self.load(name)
+        return self.futures[name].result()
+
+    def is_loaded(self, name):
+        future = self.futures[name]
+        return future.done() and future.exception() is None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
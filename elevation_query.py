@@ -0,0 +1,182 @@
+import numpy as np
+from picking import ElevationSampler
+
+# elevation queries on the in-memory relief grid for other tools: heights of many points,
+# profiles along great circles and statistics of regions and continents. The grid is
+# indexed once so that region statistics do not scan the region: means come from summed
+# area tables, min/max from sparse tables over blocks of nodes and histograms from summed
+# area tables of block histograms. Only the nodes in the part blocks along the edges of a
+# region are read
+
+# nodes per side of the blocks of the min/max and histogram indexes
+BLOCK = 16
+
+# edges of the histogram bins in metres, elevations outside are counted in the end bins
+HISTOGRAM_EDGES = np.arange(-11000, 9001, 500)
+
+EARTH_RADIUS_KM = 6371.0
+
+def summed_area(values):
+    # table with a zero row and column in front, the sum of values[r0:r1, c0:c1] is
+    # table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1) + values.shape[2:], dtype=values.dtype)
+    table[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+    return table
+
+def area_sum(table, r0, r1, c0, c1):
+    return table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+
+class SparseTable:
+    # minimum or maximum of any rectangle of an array from four lookups. Level (k, l) holds
+    # the reduction of every 2**k by 2**l window, so a rectangle is covered by four windows
+    def __init__(self, values, reduce):
+        self.reduce = reduce
+        self.levels = [[values]]
+
+        for k in range(int(np.log2(values.shape[0])) + 1):
+            if k > 0:
+                finer, half = self.levels[k - 1][0], 2 ** (k - 1)
+                self.levels.append([reduce(finer[:-half], finer[half:])])
+            for l in range(1, int(np.log2(values.shape[1])) + 1):
+                finer, half = self.levels[k][l - 1], 2 ** (l - 1)
+                self.levels[k].append(reduce(finer[:, :-half], finer[:, half:]))
+
+    def query(self, r0, r1, c0, c1):
+        k, l = int(np.log2(r1 - r0)), int(np.log2(c1 - c0))
+        level = self.levels[k][l]
+        r, c = r1 - 2 ** k, c1 - 2 ** l
+        return self.reduce(self.reduce(level[r0, c0], level[r, c0]), self.reduce(level[r0, c], level[r, c]))
+
+def bin_indices(values, edges=HISTOGRAM_EDGES):
+    return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+
+def great_circle(start, end, samples=256):
+    # lon/lat of points evenly spaced along the great circle from start to end, (lon, lat)
+    # pairs, with their distance from start in km
+    lon, lat = np.radians([start[0], end[0]]), np.radians([start[1], end[1]])
+    points = np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+    angle = np.arccos(np.clip(points[0] @ points[1], -1, 1))
+
+    t = np.linspace(0, 1, samples)[:, None]
+    if angle < 1e-9:
+        path = np.repeat(points[:1], samples, axis=0)
+    else:
+        path = (np.sin((1 - t) * angle) * points[0] + np.sin(t * angle) * points[1]) / np.sin(angle)
+
+    lons = np.degrees(np.arctan2(path[:, 1], path[:, 0]))
+    lats = np.degrees(np.arcsin(np.clip(path[:, 2], -1, 1)))
+    return lons, lats, t[:, 0] * angle * EARTH_RADIUS_KM
+
+class QueryEngine:
+    # elevation queries on a relief grid, regions is an optional RegionIndex for the
+    # statistics of the continents
+    def __init__(self, grid, regions=None, block=BLOCK, edges=HISTOGRAM_EDGES):
+        self.values = np.asarray(grid.values, dtype=np.float32)
+        self.latitudes = grid.lat.values
+        self.longitudes = grid.lon.values
+        self.sampler = ElevationSampler(grid)
+        self.regions = regions
+        self.block = block
+        self.edges = np.asarray(edges)
+        self.continents = {}
+
+        valid = ~np.isnan(self.values)
+        self.sums = summed_area(np.where(valid, self.values, 0).astype(np.float64))
+        self.counts = summed_area(valid.astype(np.int64))
+
+        # whole blocks only, the nodes past the last one are always read directly
+        rows, cols = self.values.shape[0] // block, self.values.shape[1] // block
+        blocks = self.values[:rows * block, :cols * block].reshape(rows, block, cols, block)
+        self.block_min = SparseTable(np.where(np.isnan(blocks), np.inf, blocks).min(axis=(1, 3)), np.minimum)
+        self.block_max = SparseTable(np.where(np.isnan(blocks), -np.inf, blocks).max(axis=(1, 3)), np.maximum)
+
+        # histogram of every block as one bincount over (block, bin) indices
+        bins = len(self.edges) - 1
+        block_ids = (np.arange(rows)[:, None, None, None] * cols + np.arange(cols)[None, None, :, None]) * bins
+        indices = (block_ids + bin_indices(blocks, self.edges))[~np.isnan(blocks)]
+        self.block_histograms = summed_area(np.bincount(indices, minlength=rows * cols * bins).reshape(rows, cols, bins).astype(np.int32))
+
+    def heights(self, lons, lats):
+        return self.sampler.sample(lons, lats)
+
+    def profile(self, start, end, samples=256):
+        lons, lats, distances = great_circle(start, end, samples)
+        return {"lon": lons, "lat": lats, "distance_km": distances, "height": self.heights(lons, lats)}
+
+    def node_range(self, coordinates, low, high):
+        # first and one past the last node with low <= coordinate <= high, for either order
+        if not low <= high:
+            raise ValueError(f"empty coordinate range {low} to {high}")
+
+        if coordinates[0] > coordinates[-1]:
+            first = len(coordinates) - np.searchsorted(coordinates[::-1], high, side="right")
+            last = len(coordinates) - np.searchsorted(coordinates[::-1], low, side="left")
+        else:
+            first, last = np.searchsorted(coordinates, low, side="left"), np.searchsorted(coordinates, high, side="right")
+        return int(first), int(last)
+
+    def region_stats(self, region_to_plot):
+        # regions across the antimeridian are not supported, they are asked for in two parts
+        west, east, south, north = region_to_plot
+        if not -180 <= west < east <= 180:
+            raise ValueError(f"west {west} and east {east} must satisfy -180 <= west < east <= 180")
+        if not -90 <= south < north <= 90:
+            raise ValueError(f"south {south} and north {north} must satisfy -90 <= south < north <= 90")
+
+        r0, r1 = self.node_range(self.latitudes, south, north)
+        c0, c1 = self.node_range(self.longitudes, west, east)
+
+        count = int(area_sum(self.counts, r0, r1, c0, c1))
+        if count == 0:
+            return {"count": 0, "min": None, "max": None, "mean": None, "histogram": [0] * (len(self.edges) - 1), "edges": self.edges.tolist()}
+
+        # the blocks that lie inside the region, and the strips along its edges that are read node by node
+        b = self.block
+        br0, br1 = -(-r0 // b), min(r1 // b, self.block_min.levels[0][0].shape[0])
+        bc0, bc1 = -(-c0 // b), min(c1 // b, self.block_min.levels[0][0].shape[1])
+        if br0 < br1 and bc0 < bc1:
+            low = self.block_min.query(br0, br1, bc0, bc1)
+            high = self.block_max.query(br0, br1, bc0, bc1)
+            histogram = area_sum(self.block_histograms, br0, br1, bc0, bc1).astype(np.int64)
+            strips = [(r0, br0 * b, c0, c1), (br1 * b, r1, c0, c1), (br0 * b, br1 * b, c0, bc0 * b), (br0 * b, br1 * b, bc1 * b, c1)]
+        else:
+            low, high = np.inf, -np.inf
+            histogram = np.zeros(len(self.edges) - 1, dtype=np.int64)
+            strips = [(r0, r1, c0, c1)]
+
+        for s0, s1, t0, t1 in strips:
+            strip = self.values[s0:s1, t0:t1]
+            strip = strip[~np.isnan(strip)]
+            if strip.size:
+                low, high = min(low, strip.min()), max(high, strip.max())
+                histogram += np.bincount(bin_indices(strip, self.edges), minlength=len(self.edges) - 1)
+
+        return {
+            "count": count,
+            "min": float(low),
+            "max": float(high),
+            "mean": float(area_sum(self.sums, r0, r1, c0, c1) / count),
+            "histogram": histogram.tolist(),
+            "edges": self.edges.tolist(),
+        }
+
+    def continent_stats(self, name):
+        # computed over the continent's mask once, then served from memory
+        if name not in self.continents:
+            names = [region.name for region in self.regions.regions]
+            if name not in names:
+                raise KeyError(f"unknown continent {name}")
+
+            index = names.index(name)
+            values = self.values[self.regions.mask(self.longitudes, self.latitudes) == index]
+            values = values[~np.isnan(values)]
+            self.continents[name] = {
+                "count": int(values.size),
+                "min": float(values.min()),
+                "max": float(values.max()),
+                "mean": float(values.mean(dtype=np.float64)),
+                "histogram": np.bincount(bin_indices(values, self.edges), minlength=len(self.edges) - 1).tolist(),
+                "edges": self.edges.tolist(),
+            }
+
+        return self.continents[name]
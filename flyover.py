@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import get_context
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+from render import GLOBAL_REGION, run_job
+from lazy_import import LazyModule
+
+imageio = LazyModule("imageio.v2")
+Image = LazyModule("PIL.Image")
+
+# fly-over animations of the 3D perspective view. A camera path of keyframes with an
+# azimuth, elevation and region is interpolated into frames, the frames are rendered as
+# perspective manifest jobs across a process pool and encoded with imageio. Frames are
+# kept next to the output until the video is written, so an interrupted export resumes
+# with the frames that are still missing
+
+FRAMES_PER_SEGMENT = 24
+FPS = 24
+FRAME_DPI = 100
+
+# frames are padded to a multiple of this so video encoders do not resize them
+FRAME_ALIGN = 16
+
+def interpolate(start, end, t):
+    return start + (end - start) * t
+
+def camera_path(keyframes, frames_per_segment=FRAMES_PER_SEGMENT):
+    # (perspective, region) of every frame. A keyframe can set the frames of the segment
+    # that ends at it and leave out the region to keep the one before it
+    region_to_plot = list(keyframes[0].get("region", GLOBAL_REGION))
+    cameras = []
+    for start, end in zip(keyframes, keyframes[1:]):
+        start_region, region_to_plot = region_to_plot, list(end.get("region", region_to_plot))
+        frames = end.get("frames", frames_per_segment)
+        for step in range(frames):
+            t = step / frames
+            perspective = [round(interpolate(start["azimuth"], end["azimuth"], t), 3), round(interpolate(start["elevation"], end["elevation"], t), 3)]
+            cameras.append((perspective, [round(interpolate(a, b, t), 6) for a, b in zip(start_region, region_to_plot)]))
+
+    cameras.append(([keyframes[-1]["azimuth"], keyframes[-1]["elevation"]], region_to_plot))
+    return cameras
+
+def frame_jobs(keyframes, style, frames_per_segment=FRAMES_PER_SEGMENT, dpi=FRAME_DPI):
+    return [{"mode": "perspective", "style": style, "region": region_to_plot, "perspective": perspective, "dpi": dpi} for perspective, region_to_plot in camera_path(keyframes, frames_per_segment)]
+
+def frames_dir_for(output_path):
+    return os.path.splitext(output_path)[0] + ".frames"
+
+def prepare_frames(frames_dir, jobs):
+    # keeps the frames of an interrupted export of the same path, anything else in the directory is stale
+    os.makedirs(frames_dir, exist_ok=True)
+    plan_path = os.path.join(frames_dir, "plan.json")
+
+    if os.path.isfile(plan_path):
+        with open(plan_path) as file:
+            if json.load(file) == jobs:
+                return
+
+    for name in os.listdir(frames_dir):
+        os.remove(os.path.join(frames_dir, name))
+
+    with open(plan_path, "w") as file:
+        json.dump(jobs, file, indent=2)
+
+def frame_path(frames_dir, index):
+    return os.path.join(frames_dir, f"frame_{index:05d}.png")
+
+def encode(output_path, frame_paths, fps=FPS):
+    # frames cropped by GMT differ a little in size, they are centred on a white canvas of the largest one
+    sizes = [Image.open(path).size for path in frame_paths]
+    width = -(-max(width for width, _ in sizes) // FRAME_ALIGN) * FRAME_ALIGN
+    height = -(-max(height for _, height in sizes) // FRAME_ALIGN) * FRAME_ALIGN
+
+    if output_path.lower().endswith(".gif"):
+        writer = imageio.get_writer(output_path, mode="I", duration=1000 / fps, loop=0)
+    else:
+        writer = imageio.get_writer(output_path, fps=fps)
+
+    with writer:
+        for path in frame_paths:
+            frame = np.asarray(Image.open(path).convert("RGB"))
+            canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+            top, left = (height - frame.shape[0]) // 2, (width - frame.shape[1]) // 2
+            canvas[top:top + frame.shape[0], left:left + frame.shape[1]] = frame
+            writer.append_data(canvas)
+
+def export_flyover(output_path, keyframes, style="educational", frames_per_segment=FRAMES_PER_SEGMENT, fps=FPS, dpi=FRAME_DPI, workers=None, progress=None, stop=None):
+    # renders the missing frames of a fly-over and encodes it, returns the timing report.
+    # progress(done, total) is called as frames finish, stop is an optional threading.Event
+    # that ends the export early with the finished frames kept for the next run
+    started = time.perf_counter()
+    jobs = frame_jobs(keyframes, style, frames_per_segment, dpi)
+    frames_dir = frames_dir_for(output_path)
+    prepare_frames(frames_dir, jobs)
+
+    missing = [index for index in range(len(jobs)) if not os.path.isfile(frame_path(frames_dir, index))]
+    resumed = len(jobs) - len(missing)
+    if resumed:
+        print(f"resuming with {resumed} of {len(jobs)} frames already rendered")
+
+    frame_seconds = {}
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+    try:
+        futures = {executor.submit(run_job, dict(jobs[index], output=frame_path(frames_dir, index))): index for index in missing}
+        for future in as_completed(futures):
+            index = futures[future]
+            frame_seconds[index] = future.result()
+            print(f"frame {index + 1}/{len(jobs)}: {frame_seconds[index]:.1f}s")
+
+            if progress is not None:
+                progress(resumed + len(frame_seconds), len(jobs))
+            if stop is not None and stop.is_set():
+                raise InterruptedError(f"stopped after {resumed + len(frame_seconds)} of {len(jobs)} frames")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    render_seconds = time.perf_counter() - started
+    encode_started = time.perf_counter()
+    encode(output_path, [frame_path(frames_dir, index) for index in range(len(jobs))], fps)
+    encode_seconds = time.perf_counter() - encode_started
+
+    # the frames are only needed until the video is complete
+    for name in os.listdir(frames_dir):
+        os.remove(os.path.join(frames_dir, name))
+    os.rmdir(frames_dir)
+
+    rendered = len(frame_seconds)
+    report = {
+        "output": output_path,
+        "frames": len(jobs),
+        "rendered": rendered,
+        "resumed": resumed,
+        "frame_seconds": [frame_seconds.get(index) for index in range(len(jobs))],
+        "render_seconds": render_seconds,
+        "encode_seconds": encode_seconds,
+        "frames_per_second": rendered / render_seconds if rendered else 0.0,
+    }
+    print(summary(report))
+    return report
+
+def summary(report):
+    return (f"{report['rendered']} frames rendered in {report['render_seconds']:.1f}s ({report['frames_per_second']:.2f} frames/s), "
+            f"{report['resumed']} resumed, encoded in {report['encode_seconds']:.1f}s")
+
+def orbit(perspective, region_to_plot, frames=72):
+    # keyframes of a full turn around a view at its elevation, one frame each. The turn stops
+    # a step short of 360 degrees so a looping video does not show the first frame twice
+    azimuths = np.linspace(perspective[0], perspective[0] + 360, frames, endpoint=False)
+    keyframes = [{"azimuth": round(float(azimuth), 3), "elevation": perspective[1], "frames": 1} for azimuth in azimuths]
+    keyframes[0]["region"] = list(region_to_plot)
+    return keyframes
+
+class FlyoverExport(QObject):
+    # runs an export off the GUI thread, its frames render in processes of their own.
+    # Closing the window stops it, the next export of the same path resumes it
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str, str)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="flyover")
+        self.stop = threading.Event()
+
+    def start(self, output_path, keyframes, style, **options):
+        self.stop.clear()
+        self.executor.submit(self.run, output_path, keyframes, style, options)
+
+    def run(self, output_path, keyframes, style, options):
+        try:
+            report = export_flyover(output_path, keyframes, style, progress=self.progress.emit, stop=self.stop, **options)
+        except Exception as error:
+            self.failed.emit(output_path, str(error))
+            return
+
+        self.finished.emit(output_path, summary(report))
+
+    def shutdown(self):
+        self.stop.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render a fly-over of the 3D perspective view to an MP4 or GIF")
+    parser.add_argument("path", help="json list of keyframes with azimuth, elevation and optionally region and frames (frames of the segment ending at the keyframe)")
+    parser.add_argument("--output", default="flyover.mp4", help="video file, .mp4 or .gif")
+    parser.add_argument("--style", default="educational", choices=["scientific", "educational"], help="visualizer whose 3D view is animated")
+    parser.add_argument("--frames", type=int, default=FRAMES_PER_SEGMENT, help="frames between keyframes that do not set their own")
+    parser.add_argument("--fps", type=int, default=FPS)
+    parser.add_argument("--dpi", type=int, default=FRAME_DPI)
+    parser.add_argument("--workers", type=int, default=None, help="number of render processes")
+    parser.add_argument("--report", default=None, help="write the per-frame timings to this json file")
+    args = parser.parse_args()
+
+    with open(args.path) as file:
+        keyframes = json.load(file)
+
+    report = export_flyover(args.output, keyframes, args.style, args.frames, args.fps, args.dpi, args.workers)
+    if args.report is not None:
+        with open(args.report, "w") as file:
+            json.dump(report, file, indent=2)
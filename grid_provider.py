@@ -0,0 +1,188 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from raster_pyramid import RELIEF_LEVELS
+from render_cache import dataset_fingerprint
+from lazy_import import LazyModule, is_available
+
+xr = LazyModule("xarray")
+pygmt = LazyModule("pygmt")
+dask_array = LazyModule("dask.array")
+
+# resolutions up to this one are loaded for the whole globe once, finer ones only for
+# the regions that are asked for
+GLOBAL_LIMIT = "05m"
+
+# with dask installed the finer grids are opened for the whole globe as chunked arrays that
+# are only evaluated when a view computes them. Slicing, clipping and decimating then run
+# chunk by chunk on all cores and read only the chunks inside the region
+OUT_OF_CORE = is_available("dask")
+
+# grid nodes per side of a chunk
+CHUNK_SIZE = 2048
+
+# GMT sessions are not thread safe, every pygmt call of the process holds this lock: the
+# renders of the render worker and the grid loads of the loader, contour and tile threads.
+# Providers guard their grids with the same lock, so a render that asks a provider for its
+# grid and a load under a provider always take it in the same order
+GMT_LOCK = threading.RLock()
+
+def synthetic_relief(resolution, region_to_plot=(-180, 180, -90, 90), chunks=None):
+    # deterministic offline stand-in for the relief grid, with continents, ranges and trenches.
+    # With chunks set it is a dask array whose chunks are generated when they are computed
+    pixels_per_degree = dict(RELIEF_LEVELS)[resolution]
+    west, east, south, north = region_to_plot
+
+    latitudes = np.linspace(south, north, round((north - south) * pixels_per_degree) + 1)
+    longitudes = np.linspace(west, east, round((east - west) * pixels_per_degree) + 1)
+
+    lat = np.radians(latitudes)[:, None]
+    lon = np.radians(longitudes)[None, :]
+    if chunks is not None:
+        shape = (len(latitudes), len(longitudes))
+        lat = dask_array.broadcast_to(dask_array.from_array(lat, chunks=(chunks, 1)), shape, chunks=chunks)
+        lon = dask_array.broadcast_to(dask_array.from_array(lon, chunks=(1, chunks)), shape, chunks=chunks)
+
+    elevation = 3500 * np.sin(2 * lon + 0.5) * np.cos(lat) + 1500 * np.sin(5 * lat + 3 * lon) + 800 * np.cos(11 * lon) * np.sin(7 * lat) - 1200
+
+    return xr.DataArray(elevation.astype(np.float32), coords=[("lat", latitudes), ("lon", longitudes)], dims=["lat", "lon"], name="z")
+
+def clip_below(grid, below):
+    # same as pygmt.grdclip(grid, below=below): values under below[0] are set to below[1]
+    return grid.where((grid >= below[0]) | grid.isnull(), below[1])
+
+class GridProvider:
+    # relief grids shared by every view of the visualizers. Each resolution is loaded once,
+    # from a local file, a synthetic stand-in or the GMT remote dataset, and regions are
+    # served as slices of that array. Derived grids (clipped, regional) are kept in a
+    # region keyed LRU cache
+    def __init__(self, source="remote", local_file=None, cache_size=32):
+        self.source = source
+        self.local_file = local_file
+        self.cache_size = cache_size
+
+        self.grids = {}
+        self.chunked_grids = {}
+        self.cache = OrderedDict()
+
+        # the GUI thread, the render worker and the loader threads all ask for grids
+        self.lock = GMT_LOCK
+
+    def fingerprint(self, resolution):
+        # identifies the grid load gives for a resolution, with the local file by its path,
+        # size and modification time so a replaced file is not served from cached renders
+        sources = ["earth_relief", self.source]
+        if self.local_file is not None:
+            sources.append(self.local_file.format(resolution=resolution))
+
+        return dataset_fingerprint(*sources)
+
+    def is_global(self, resolution):
+        resolutions = [name for name, _ in RELIEF_LEVELS]
+        return resolutions.index(resolution) <= resolutions.index(GLOBAL_LIMIT)
+
+    def load(self, resolution, region_to_plot=None):
+        if self.local_file is not None:
+            path = self.local_file.format(resolution=resolution)
+            if os.path.isfile(path):
+                grid = xr.load_dataarray(path)
+                return grid if region_to_plot is None else self.slice(grid, region_to_plot)
+
+        if self.source == "synthetic":
+            return synthetic_relief(resolution, region_to_plot or (-180, 180, -90, 90))
+
+        with GMT_LOCK:
+            return pygmt.datasets.load_earth_relief(resolution=resolution, region=region_to_plot)
+
+    def global_grid(self, resolution):
+        with self.lock:
+            if resolution not in self.grids:
+                self.grids[resolution] = self.load(resolution)
+
+            return self.grids[resolution]
+
+    def open_chunked(self, resolution):
+        # the whole globe at a resolution as a lazily evaluated grid, None where that is not
+        # possible. Remote grids are downloaded by GMT for the regions asked for instead
+        if not OUT_OF_CORE:
+            return None
+
+        if self.local_file is not None:
+            path = self.local_file.format(resolution=resolution)
+            if os.path.isfile(path):
+                return xr.open_dataarray(path, chunks={"lat": CHUNK_SIZE, "lon": CHUNK_SIZE})
+
+        if self.source == "synthetic":
+            return synthetic_relief(resolution, chunks=CHUNK_SIZE)
+
+        return None
+
+    def chunked_grid(self, resolution):
+        with self.lock:
+            if resolution not in self.chunked_grids:
+                self.chunked_grids[resolution] = self.open_chunked(resolution)
+
+            return self.chunked_grids[resolution]
+
+    def slice(self, grid, region_to_plot):
+        # basic slicing, so the subset is a view of the shared array and nothing is copied
+        west, east, south, north = region_to_plot
+        latitudes = grid.lat.values
+        if latitudes[0] > latitudes[-1]:
+            south, north = north, south
+
+        return grid.sel(lon=slice(west, east), lat=slice(south, north))
+
+    def cached(self, key, compute):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+            value = compute()
+            self.cache[key] = value
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+            return value
+
+    def lazy(self, resolution, region_to_plot):
+        # the grid of a region before it is computed, a slice of the chunked globe where the
+        # resolution has one and the loaded grid otherwise
+        chunked = None if self.is_global(resolution) else self.chunked_grid(resolution)
+        if chunked is None:
+            return self.grid(resolution, region_to_plot)
+
+        return self.slice(chunked, region_to_plot)
+
+    def grid(self, resolution, region_to_plot):
+        if self.is_global(resolution):
+            return self.slice(self.global_grid(resolution), region_to_plot)
+
+        if self.chunked_grid(resolution) is not None:
+            return self.cached(("grid", resolution, tuple(region_to_plot)), lambda: self.lazy(resolution, region_to_plot).compute())
+
+        return self.cached(("grid", resolution, tuple(region_to_plot)), lambda: self.load(resolution, list(region_to_plot)))
+
+    def clipped(self, resolution, region_to_plot, below):
+        # clipped chunk by chunk before the region is computed, nothing is computed twice
+        return self.cached(("clipped", resolution, tuple(region_to_plot), tuple(below)), lambda: clip_below(self.lazy(resolution, region_to_plot), below).compute())
+
+    def decimated(self, resolution, region_to_plot, pixels_per_degree):
+        # every n-th node of a grid down to about the given density. For the loaded grids this
+        # is a strided view of the shared array so previews cost nothing to prepare, chunked
+        # grids only compute the nodes that are kept
+        step = max(1, int(dict(RELIEF_LEVELS)[resolution] // pixels_per_degree))
+        return self.lazy(resolution, region_to_plot)[::step, ::step].compute()
+
+provider = None
+
+def default_provider():
+    # one provider per process, configured with EARTH_RELIEF_SOURCE=remote|synthetic and
+    # EARTH_RELIEF_FILE, a local grid path with a {resolution} placeholder
+    global provider
+    if provider is None:
+        provider = GridProvider(source=os.environ.get("EARTH_RELIEF_SOURCE", "remote"), local_file=os.environ.get("EARTH_RELIEF_FILE"))
+
+    return provider
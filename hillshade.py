@@ -0,0 +1,172 @@
+import os
+import tempfile
+from functools import lru_cache
+import numpy as np
+from raster_store import as_color_map
+from grid_provider import default_provider
+from lazy_import import LazyModule
+
+pygmt = LazyModule("pygmt")
+
+# relief grids turned into images with numpy before they reach GMT: the hillshade that
+# grdimage shading=True would compute with grdgradient, and the colours of a GMT colour
+# table. The images are kept in the grid provider's cache next to the grids they are made
+# from, so a view drawn again is a plain RGB image to grdimage
+
+# direction and height of the sun in degrees, the default is the illumination of shading=True
+SUN_AZIMUTH = 315
+SUN_ALTITUDE = 45
+
+# metres per degree of latitude
+METRES_PER_DEGREE = 111320.0
+
+# saturation and value a fully lit and a fully shaded pixel are moved to, as GMT does
+LIT_SATURATION, LIT_VALUE = 0.1, 1.0
+SHADED_SATURATION, SHADED_VALUE = 1.0, 0.3
+
+def cpt_color(fields):
+    # a colour at the start of fields as r/g/b, r g b or a gray level, with the fields after
+    # it. Named colours are left to the defaults
+    count = 3 if len(fields) >= 3 and "/" not in fields[0] and all(field.replace(".", "", 1).isdigit() for field in fields[:3]) else 1
+    try:
+        values = [float(value) for value in "/".join(fields[:count]).split("/")[:3]]
+    except ValueError:
+        return None, fields[count:]
+
+    return (values * 3 if len(values) == 1 else values), fields[count:]
+
+def parse_cpt(text):
+    # segments (z0, rgb0, z1, rgb1) of a GMT colour table as arrays, with its background,
+    # foreground and NaN colours
+    z0, rgb0, z1, rgb1 = [], [], [], []
+    special = {"B": [0, 0, 0], "F": [255, 255, 255], "N": [127.5, 127.5, 127.5]}
+
+    for line in text.splitlines():
+        fields = line.split("#")[0].split(";")[0].split()
+        if not fields:
+            continue
+
+        if fields[0] in special:
+            color, _ = cpt_color(fields[1:])
+            if color is not None:
+                special[fields[0]] = color
+            continue
+
+        # z0 color z1 color
+        start_color, rest = cpt_color(fields[1:])
+        end_color, _ = cpt_color(rest[1:])
+        z0.append(float(fields[0]))
+        rgb0.append(start_color)
+        z1.append(float(rest[0]))
+        rgb1.append(end_color)
+
+    return np.array(z0), np.array(rgb0, dtype=np.float32), np.array(z1), np.array(rgb1, dtype=np.float32), special
+
+@lru_cache(maxsize=32)
+def colour_table(cmap, series, continuous=False):
+    # the table makecpt makes of a master table for a z range, the same one GMT draws with
+    with tempfile.TemporaryDirectory(prefix="cpt-") as directory:
+        path = os.path.join(directory, "table.cpt")
+        pygmt.makecpt(cmap=cmap, series=series, continuous=continuous, output=path)
+        with open(path) as file:
+            return parse_cpt(file.read())
+
+def apply_cpt(values, table):
+    # (..., 3) float32 colours of values, linear within each segment of the table
+    z0, rgb0, z1, rgb1, special = table
+    segment = np.clip(np.searchsorted(z0, values, side="right") - 1, 0, len(z0) - 1)
+
+    span = z1[segment] - z0[segment]
+    t = np.clip(np.divide(values - z0[segment], span, out=np.zeros(values.shape), where=span > 0), 0, 1).astype(np.float32)
+    colors = rgb0[segment] + t[..., None] * (rgb1[segment] - rgb0[segment])
+
+    colors[values < z0[0]] = special["B"]
+    colors[values > z1[-1]] = special["F"]
+    colors[np.isnan(values)] = special["N"]
+    return colors
+
+def hillshade(grid, azimuth=SUN_AZIMUTH, altitude=SUN_ALTITUDE):
+    # illumination of a lon/lat grid in [-1, 1], 0 for flat ground. The light falling on each
+    # node relative to flat ground is normalized by its spread through an arctangent, like
+    # grdgradient normalize="t1"
+    values = np.nan_to_num(np.asarray(grid.values, dtype=np.float32))
+    lat, lon = grid.lat.values, grid.lon.values
+
+    # slopes in metres per metre, the distance of a degree of longitude shrinks towards the poles
+    slope_north, slope_east = np.gradient(values, lat, lon)
+    slope_north = slope_north / METRES_PER_DEGREE
+    slope_east = slope_east / (METRES_PER_DEGREE * np.maximum(np.cos(np.radians(lat)), 1e-6))[:, None]
+
+    azimuth, altitude = np.radians(azimuth), np.radians(altitude)
+    sun_east, sun_north, sun_up = np.sin(azimuth) * np.cos(altitude), np.cos(azimuth) * np.cos(altitude), np.sin(altitude)
+    light = (sun_up - slope_east * sun_east - slope_north * sun_north) / np.sqrt(1 + slope_east ** 2 + slope_north ** 2)
+
+    relative = light - sun_up
+    spread = relative.std()
+    if spread == 0:
+        return np.zeros_like(relative)
+
+    return (2 / np.pi * np.arctan(relative / spread)).astype(np.float32)
+
+def illuminate(colors, intensity):
+    # colours lit and shaded by an intensity in [-1, 1] as grdimage does it, by moving the
+    # saturation and value of each colour towards those of a fully lit or shaded pixel
+    rgb = colors / 255
+    value = rgb.max(axis=-1)
+    low = rgb.min(axis=-1)
+    saturation = np.divide(value - low, value, out=np.zeros_like(value), where=value > 0)
+
+    lit = intensity > 0
+    amount = np.abs(intensity)
+    saturation = np.where(lit, (1 - amount) * saturation + amount * LIT_SATURATION, (1 - amount) * saturation + amount * SHADED_SATURATION)
+    new_value = np.where(lit, (1 - amount) * value + amount * LIT_VALUE, (1 - amount) * value + amount * SHADED_VALUE)
+
+    # the hue is kept, each channel keeps its place between the smallest and largest one
+    position = np.divide(rgb - low[..., None], (value - low)[..., None], out=np.zeros_like(rgb), where=(value > low)[..., None])
+    new_low = new_value * (1 - saturation)
+    return (new_low[..., None] + position * (new_value - new_low)[..., None]) * 255
+
+def as_image(colors, grid):
+    # an RGB image over the extent of a grid, in the layout of the colour map for grdimage
+    latitudes, longitudes = grid.lat.values, grid.lon.values
+    metadata = {"latitude": [latitudes[0], latitudes[-1]], "longitude": [longitudes[0], longitudes[-1]]}
+    return as_color_map(np.rint(np.clip(colors, 0, 255)).astype(np.uint8), metadata)
+
+def relief_series(grid):
+    # the z range grdimage stretches a master table to for a grid
+    return (float(np.nanmin(grid.values)), float(np.nanmax(grid.values)))
+
+def relief_image(resolution, region_to_plot, cmap="geo", shaded=True, azimuth=SUN_AZIMUTH, altitude=SUN_ALTITUDE):
+    # the relief of a region in the colours of cmap, shaded like grdimage shading=True unless
+    # shaded is False, as a uint8 RGB image
+    provider = default_provider()
+
+    def compute():
+        grid = provider.grid(resolution, region_to_plot)
+        colors = apply_cpt(np.asarray(grid.values, dtype=np.float32), colour_table(cmap, relief_series(grid)))
+        if shaded:
+            colors = illuminate(colors, relief_intensity(resolution, region_to_plot, azimuth, altitude).values)
+        return as_image(colors, grid)
+
+    return provider.cached(("relief image", resolution, tuple(region_to_plot), cmap, shaded, azimuth, altitude), compute)
+
+def relief_intensity(resolution, region_to_plot, azimuth=SUN_AZIMUTH, altitude=SUN_ALTITUDE):
+    provider = default_provider()
+
+    def compute():
+        grid = provider.grid(resolution, region_to_plot)
+        return grid.copy(data=hillshade(grid, azimuth, altitude))
+
+    return provider.cached(("intensity", resolution, tuple(region_to_plot), azimuth, altitude), compute)
+
+def shading_image(resolution, region_to_plot, azimuth=SUN_AZIMUTH, altitude=SUN_ALTITUDE):
+    # the hillshade in gray, stretched over its range as grdimage cmap="gray" would draw it
+    provider = default_provider()
+
+    def compute():
+        intensity = relief_intensity(resolution, region_to_plot, azimuth, altitude)
+        low, high = float(intensity.min()), float(intensity.max())
+        gray = (intensity.values - low) / max(high - low, 1e-6) * 255
+        return as_image(np.repeat(gray[..., None], 3, axis=-1), intensity)
+
+    return provider.cached(("shading image", resolution, tuple(region_to_plot), azimuth, altitude), compute)
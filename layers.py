@@ -0,0 +1,93 @@
+from PyQt5.QtWidgets import QGraphicsPixmapItem
+from PyQt5.QtGui import QPixmap
+
+# layers drawn over and next to the map, bottom to top. Geographic layers are rendered
+# with the same region, projection, canvas and frame as the map so they crop to the same image
+# and line up with it pixel for pixel, panels are placed around it
+LAYER_ORDER = ["shading", "contours", "globe", "highlight", "colorbar", "info"]
+PANELS = ["globe", "highlight", "colorbar", "info"]
+
+# the shading is a gray hillshade blended over the map below it
+LAYER_OPACITY = {"shading": 0.4}
+
+# space between the map and the panels around it, in inches
+PANEL_GAP = 0.4
+
+class LayerStack:
+    # pixmap items for the layers of the displayed view, children of the map item so they
+    # follow its zoom. Every layer is its own cached image, so a parameter change replaces
+    # only the layer it affects, and hidden layers are kept to be shown again without a render
+    def __init__(self, map_item):
+        self.map_item = map_item
+        self.dpi = 300
+        self.items = {}
+        self.layer_dpi = {}
+        self.hidden = set()
+
+        for name in LAYER_ORDER:
+            item = QGraphicsPixmapItem(map_item)
+            item.setZValue(LAYER_ORDER.index(name) + 1)
+            item.setOpacity(LAYER_OPACITY.get(name, 1.0))
+            self.items[name] = item
+            self.layer_dpi[name] = 300
+
+    def set_dpi(self, dpi):
+        # dpi of the displayed map, layers keep their size in inches when a preview is replaced
+        self.dpi = dpi
+        for name in LAYER_ORDER:
+            self.place(name)
+
+    def size(self, name):
+        # size of a layer in inches
+        pixmap = self.items[name].pixmap()
+        return pixmap.width() / self.layer_dpi[name], pixmap.height() / self.layer_dpi[name]
+
+    def map_size(self):
+        pixmap = self.map_item.pixmap()
+        return pixmap.width() / self.dpi, pixmap.height() / self.dpi
+
+    def position(self, name):
+        # top left corner of a layer in inches from the top left of the map
+        if name not in PANELS:
+            return 0, 0
+
+        map_width, map_height = self.map_size()
+        width, height = self.size(name)
+        if name == "colorbar":
+            return (map_width - width) / 2, map_height + PANEL_GAP
+
+        # globe left of the map and level with its bottom, the highlight on the globe and the info panel above them
+        globe_width, globe_height = self.size("globe")
+        globe_x, globe_y = -globe_width - PANEL_GAP, map_height - globe_height
+        if name == "info":
+            return globe_x, globe_y - height - PANEL_GAP
+
+        return globe_x, globe_y
+
+    def place(self, name):
+        item = self.items[name]
+        x, y = self.position(name)
+        item.setPos(x * self.dpi, y * self.dpi)
+        item.setScale(self.dpi / self.layer_dpi[name])
+
+    def set_layer(self, name, pixmap, dpi=300):
+        self.items[name].setPixmap(pixmap)
+        self.items[name].setVisible(name not in self.hidden)
+        self.layer_dpi[name] = dpi
+
+        # panels are placed relative to each other
+        for layer in [name] + (PANELS if name in PANELS else []):
+            self.place(layer)
+
+    def clear(self, names=None):
+        for name in names if names is not None else LAYER_ORDER:
+            self.items[name].setPixmap(QPixmap())
+
+    def set_visible(self, name, visible):
+        # toggling a layer keeps its image, nothing is rendered again
+        if visible:
+            self.hidden.discard(name)
+        else:
+            self.hidden.add(name)
+
+        self.items[name].setVisible(visible)
@@ -0,0 +1,20 @@
+import importlib
+import importlib.util
+
+class LazyModule:
+    # stands in for a module that is imported on first attribute access, so heavy libraries
+    # such as pygmt and xarray are not imported before the window is shown. After the first
+    # access every lookup is a sys.modules hit, and the import lock makes it thread safe
+    def __init__(self, name):
+        object.__setattr__(self, "name", name)
+
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self.name), attribute)
+
+    def __setattr__(self, attribute, value):
+        # module settings such as PIL.Image.MAX_IMAGE_PIXELS are set on the module itself
+        setattr(importlib.import_module(self.name), attribute, value)
+
+def is_available(name):
+    # whether an optional module is installed, without importing it
+    return importlib.util.find_spec(name) is not None
@@ -0,0 +1,803 @@
+import time
+from abc import ABCMeta, abstractmethod
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QWidget, QPushButton, QSlider, QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QLabel, QProgressBar, QHBoxLayout, QCheckBox, QComboBox, QFileDialog, QGraphicsLineItem
+from PyQt5.QtGui import QPixmap, QImage, QPainter, QPen, QPolygonF
+from PyQt5.QtCore import Qt, QLineF, QTimer, pyqtSignal
+from render_worker import RenderWorker
+from render_scheduler import RenderScheduler
+from render_cache import RenderCache, dataset_fingerprint
+from perspective_sweep import PerspectiveSweep
+from raster_pyramid import relief_resolution
+from grid_provider import default_provider
+from picking import ViewTransform
+from contours import BASE_INTERVAL, snap_interval
+from layers import LayerStack
+from datasets import DatasetLoader
+from profile_view import profile_pixmap, DRAG_DISTANCE
+from tiles import TileView, ColorTiles, ReliefTiles
+from reproject import reproject
+from flyover import FlyoverExport, orbit
+from render import render_job, COLOR_MAP_FILE, DISPLACEMENT_MAP_FILE, PREVIEW_DPI, MAP_MARGIN
+
+def point_pairs(lines):
+    # (n, 4) line ends as the 2n points of a polygon for QPainter.drawLines, written into
+    # its buffer as a whole since a QLineF per segment takes longer than drawing them
+    polygon = QPolygonF(2 * len(lines))
+    if len(lines):
+        points = polygon.data()
+        points.setsize(lines.size * np.dtype(np.float64).itemsize)
+        np.frombuffer(points, dtype=np.float64)[:] = lines.ravel()
+
+    return polygon
+
+class MapWindowMeta(type(QMainWindow), ABCMeta):
+    # Qt's metaclass with abstract methods, for the hooks every visualizer implements
+    pass
+
+class MapWindow(QMainWindow, metaclass=MapWindowMeta):
+    # the window of both visualizers: the map view with its layers, the render worker and
+    # cache, picking, profiles, the sliders, the tile viewer and the exports. The visualizers
+    # add their datasets and draw their own global, 3D and isocontour views on top of it
+    title = ""
+    style = "scientific"
+    default_tile_source = "colour"
+
+    # (layer, label) of the layers that can be toggled
+    layer_toggles = [("contours", "Contours")]
+
+    # isolines at multiples of this are drawn thicker
+    annotated_interval = 500
+
+    # contour engines traced in the background, with the request and the view they are for
+    contours_traced = pyqtSignal(int, object, object)
+    contours_failed = pyqtSignal(int, str)
+
+    # colour map textures reprojected in the background, with the request, view and dpi they are for
+    texture_ready = pyqtSignal(int, object, object, int)
+    texture_failed = pyqtSignal(int, str)
+
+    def __init__(self, started):
+        super().__init__()
+
+        # startup is timed from the first line of the visualizer
+        self.started = started
+
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle(self.title)
+        self.setGeometry(100, 100, 800, 600)
+
+        self.region_to_plot = [-180, 180, -90, 90]
+        self.perspective = [-120, 30]
+        self.contour_interval = 250
+
+        # relief grids are loaded once per resolution and shared with the render jobs
+        self.relief = default_provider()
+
+        # datasets are loaded in the background after the window is shown, the colour map of
+        # the first view first. Each is read through a property that waits for it or loads it
+        # if needed. The loaded signal is queued so a load on the GUI thread does not bring up
+        # the global map in the middle of setting up another view
+        self.datasets = DatasetLoader(self)
+        self.datasets.loaded.connect(self.dataset_loaded, Qt.QueuedConnection)
+        self.datasets.failed.connect(self.dataset_failed)
+        self.add_datasets()
+
+        # rendered images are cached on the view parameters and the data they were made from
+        self.render_cache = RenderCache()
+        self.color_map_id = dataset_fingerprint(COLOR_MAP_FILE)
+        self.displacement_map_id = dataset_fingerprint(DISPLACEMENT_MAP_FILE)
+
+        # general setup for the window
+        central_widget = QWidget(self)
+        self.setCentralWidget(central_widget)
+
+        layout = QVBoxLayout(central_widget)
+
+        self.graphics_view = QGraphicsView(self)
+        layout.addWidget(self.graphics_view)
+
+        # elevation profile of the last drag over the map
+        self.profile_chart = QLabel(self)
+        self.profile_chart.setFixedHeight(150)
+        self.profile_chart.hide()
+        layout.addWidget(self.profile_chart)
+
+        self.scene = QGraphicsScene(self)
+        self.graphics_view.setScene(self.scene)
+
+        # slippy map of the whole globe, shown in place of the rendered map and never re-rendered on zoom
+        self.tile_view = TileView({"colour": ColorTiles(partial(self.datasets.get, "color_map")), "relief": ReliefTiles(self.relief)}, self.default_tile_source, self)
+        self.tile_view.hovered.connect(self.tile_hovered)
+        self.tile_view.hide()
+        layout.addWidget(self.tile_view)
+
+        # pixmap item to hold the map image
+        self.map_item = QGraphicsPixmapItem()
+        self.scene.addItem(self.map_item)
+
+        # line of the profile being dragged, in pixels of the map image
+        pen = QPen(Qt.red, 2)
+        pen.setCosmetic(True)
+        self.profile_line = QGraphicsLineItem(self.map_item)
+        self.profile_line.setPen(pen)
+        self.profile_line.setZValue(100)
+        self.profile_line.hide()
+        self.drag_start = None
+
+        # layers drawn over and next to the map, each from its own image
+        self.layers = LayerStack(self.map_item)
+        self.contour_view = None
+
+        # isolines are traced off the GUI thread, only the latest request is drawn
+        self.contour_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="contours")
+        self.contour_request = 0
+        self.contour_tracing = False
+        self.contours_traced.connect(self.contours_ready)
+        self.contours_failed.connect(self.contour_tracing_failed)
+
+        # textures are reprojected off the GUI thread, only the latest view requested is shown
+        self.texture_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="textures")
+        self.texture_request = 0
+        self.texture_ready.connect(self.show_reprojection)
+        self.texture_failed.connect(self.reprojection_failed)
+
+        # rendering state shown while a plot is being rendered in the background
+        self.label_status = QLabel("", self)
+        layout.addWidget(self.label_status)
+
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
+
+        # worker that runs the pygmt renders off the GUI thread
+        self.render_worker = RenderWorker(self)
+        self.render_worker.started.connect(self.render_started)
+        self.render_worker.previewed.connect(self.render_previewed)
+        self.render_worker.finished.connect(self.render_finished)
+        self.render_worker.layer_ready.connect(self.render_layer_ready)
+        self.render_worker.done.connect(self.render_done)
+        self.render_worker.failed.connect(self.render_failed)
+        self.render_worker.exported.connect(self.view_exported)
+        self.render_worker.export_failed.connect(self.export_failed)
+
+        # pre-rendered frames of the 3D view for the perspective slider
+        self.perspective_sweep = PerspectiveSweep(self.render_cache, self)
+        self.perspective_sweep.progress.connect(self.sweep_progress)
+
+        # fly-over animations of the 3D view, rendered in their own processes
+        self.flyover = FlyoverExport(self)
+        self.flyover.progress.connect(self.flyover_progress)
+        self.flyover.finished.connect(self.flyover_finished)
+        self.flyover.failed.connect(self.export_failed)
+
+        # pixel to lon/lat transform of the displayed map and of the latest requested view
+        self.view_transform = None
+        self.pending_view = None
+        self.pending_layers = {}
+        self.displayed_view = None
+        self.displayed_dpi = 300
+
+        # manifest job of the displayed view, rendered by GMT at print quality on export
+        self.displayed_job = None
+
+        # readout of the position and elevation under the cursor
+        self.label_position = QLabel("", self)
+        layout.addWidget(self.label_position)
+
+        # the initial global map is shown once the colour map is loaded
+        self.placeholder = self.scene.addText("Loading...")
+        self.label_status.setText("Loading datasets...")
+        self.first_paint = None
+        self.first_map = None
+        self.report_startup = False
+
+        # buttons for visualisation techniques
+        btn_global_map = QPushButton("Global Map", self)
+        btn_3d_perspective = QPushButton("3D Perspective", self)
+        btn_isocontours = QPushButton("Isocontours", self)
+        btn_perspective_sweep = QPushButton("Pre-render Perspective Sweep", self)
+        layout.addWidget(btn_global_map)
+        layout.addWidget(btn_3d_perspective)
+        layout.addWidget(btn_isocontours)
+        layout.addWidget(btn_perspective_sweep)
+
+        btn_export = QPushButton("Export", self)
+        btn_flyover = QPushButton("Export Fly-over", self)
+        layout.addWidget(btn_export)
+        layout.addWidget(btn_flyover)
+
+        # tile viewer with the dataset its tiles are drawn from
+        tile_row = QHBoxLayout()
+        btn_tile_viewer = QPushButton("Tile Viewer", self)
+        self.tile_source = QComboBox(self)
+        self.tile_source.addItems(["colour", "relief"])
+        self.tile_source.setCurrentText(self.default_tile_source)
+        tile_row.addWidget(btn_tile_viewer)
+        tile_row.addWidget(self.tile_source)
+        layout.addLayout(tile_row)
+
+        # layers that can be shown and hidden without rendering them again
+        layer_toggles = QHBoxLayout()
+        for layer, label in self.layer_toggles:
+            checkbox = QCheckBox(label, self)
+            checkbox.setChecked(True)
+            checkbox.toggled.connect(partial(self.layers.set_visible, layer))
+            layer_toggles.addWidget(checkbox)
+        layout.addLayout(layer_toggles)
+
+        # slider for perspective
+        self.label_slider_value = QLabel("Change Perspective:", self)
+        layout.addWidget(self.label_slider_value)
+
+        self.slider_perspective = QSlider(Qt.Horizontal)
+        self.slider_perspective.setMinimum(-180)
+        self.slider_perspective.setMaximum(180)
+        self.slider_perspective.setValue(self.perspective[0])
+        layout.addWidget(self.slider_perspective)
+
+        # slider for contour values
+        self.label_contour_value = QLabel("Change Contour Interval:", self)
+        layout.addWidget(self.label_contour_value)
+
+        self.slider_contour = QSlider(Qt.Horizontal)
+        self.slider_contour.setMinimum(100)
+        self.slider_contour.setMaximum(2000)
+        self.slider_contour.setSingleStep(BASE_INTERVAL)
+        self.slider_contour.setPageStep(BASE_INTERVAL * 4)
+        self.slider_contour.setValue(self.contour_interval)
+        layout.addWidget(self.slider_contour)
+
+        # connecting widgets to functions
+        btn_global_map.clicked.connect(self.show_global_map)
+        btn_3d_perspective.clicked.connect(self.plot_3d_pespective)
+        btn_isocontours.clicked.connect(self.show_isocontours)
+        btn_perspective_sweep.clicked.connect(self.start_perspective_sweep)
+        btn_tile_viewer.clicked.connect(self.show_tile_viewer)
+        btn_export.clicked.connect(self.export_view)
+        btn_flyover.clicked.connect(self.export_flyover)
+        self.tile_source.currentTextChanged.connect(self.tile_view.set_source)
+
+        # value changes of the sliders are coalesced into previews at a steady rate while
+        # they move, the full quality render runs once the value settles
+        self.perspective_scheduler = RenderScheduler(parent=self)
+        self.perspective_scheduler.preview.connect(self.preview_perspective)
+        self.perspective_scheduler.settled.connect(self.update_perspective)
+        self.perspective_scheduler.connect_slider(self.slider_perspective)
+
+        self.contour_scheduler = RenderScheduler(parent=self)
+        self.contour_scheduler.preview.connect(self.preview_contour_interval)
+        self.contour_scheduler.settled.connect(self.adjust_contour_interval)
+        self.contour_scheduler.connect_slider(self.slider_contour)
+
+        # zoom functionality
+        self.graphics_view.wheelEvent = self.zoom_event
+
+        # mouse events
+        self.graphics_view.mousePressEvent = self.mouse_press_event
+        self.graphics_view.mouseMoveEvent = self.mouse_move_event
+        self.graphics_view.mouseReleaseEvent = self.mouse_release_event
+        self.graphics_view.viewport().setMouseTracking(True)
+
+    @abstractmethod
+    def add_datasets(self):
+        # the datasets of the visualizer, added to self.datasets in the order they are loaded in
+        pass
+
+    @property
+    def color_map(self):
+        return self.datasets.get("color_map")
+
+    @property
+    def displacement_map(self):
+        return self.datasets.get("displacement_map")
+
+    @property
+    def sampler(self):
+        return self.datasets.get("sampler")
+
+    @property
+    def queries(self):
+        return self.datasets.get("queries")
+
+    def dataset_loaded(self, name):
+        # the global map comes up as soon as it can unless another view was asked for meanwhile
+        if name == "color_map" and self.displayed_view is None and self.displayed_job is None:
+            self.label_status.setText("")
+            self.show_global_map()
+
+    def dataset_failed(self, name, message):
+        self.label_status.setText(f"Loading {name} failed: {message}")
+
+    def dataset_available(self, name):
+        # waits for a dataset that is still loading. One that failed is reported again in the
+        # status bar and the view that needs it is not shown, the error does not escape the slot
+        try:
+            self.datasets.get(name)
+        except Exception as error:
+            self.dataset_failed(name, str(error))
+            return False
+
+        return True
+
+    def color_map_level(self, region_to_plot, projection, dpi=300):
+        # coarsest level of the colour map that is fine enough for the view, with its cache id
+        level, color_map = self.color_map.level_for(region_to_plot, projection, dpi)
+        return f"{self.color_map_id}/{level}", color_map
+
+    def displacement_map_level(self, region_to_plot, projection, dpi=300):
+        level, displacement_map = self.displacement_map.level_for(region_to_plot, projection, dpi)
+        return f"{self.displacement_map_id}/{level}", displacement_map
+
+    def relief_level(self, region_to_plot, projection):
+        # relief grids are passed by resolution and taken from the grid provider by the render job
+        resolution = relief_resolution(region_to_plot, projection)
+        return f"{self.relief_dataset(resolution)}/{resolution}", resolution
+
+    def relief_dataset(self, resolution):
+        # cache id of the relief grid of a resolution
+        return self.relief.fingerprint(resolution)
+
+    def view_requested(self):
+        # called when another view replaces the displayed one, a texture still being reprojected is not shown
+        self.texture_request += 1
+
+    def show_global_map(self):
+        self.show_texture([-180, 180, -90, 90], "W6i")
+        self.displayed_job = {"mode": "global"}
+
+    def show_texture(self, region_to_plot, projection, dpi=300):
+        # the colour map is reprojected with numpy on the texture thread and shown without a
+        # GMT render, render_map stays for export
+        self.view_requested()
+        self.render_worker.cancel()
+        self.clear_contours()
+        self.layers.clear()
+        self.show_map_view()
+        self.progress_bar.show()
+
+        self.texture_executor.submit(self.run_reprojection, self.texture_request, projection, list(region_to_plot), dpi)
+
+    def run_reprojection(self, request, projection, region_to_plot, dpi):
+        # skip reprojections that were superseded before they started
+        if request != self.texture_request:
+            return
+
+        try:
+            level = self.color_map.select(region_to_plot, projection, dpi)
+            pixels = reproject(self.color_map.levels[level], self.color_map.metadata, projection, region_to_plot, dpi)
+        except Exception as error:
+            self.texture_failed.emit(request, str(error))
+            return
+
+        self.texture_ready.emit(request, pixels, (projection, region_to_plot), dpi)
+
+    def show_reprojection(self, request, pixels, view, dpi):
+        if request != self.texture_request:
+            return
+
+        # the image is a view of the array, the pixmap made from it is the only copy. It is
+        # the map area only, without the margin of the GMT maps
+        height, width = pixels.shape[:2]
+        image = QImage(pixels.data, width, height, pixels.strides[0], QImage.Format_RGB888)
+        self.display_pixmap(QPixmap.fromImage(image), view, dpi, 0)
+        self.progress_bar.hide()
+
+    def reprojection_failed(self, request, message):
+        if request != self.texture_request:
+            return
+
+        self.label_status.setText(f"Rendering failed: {message}")
+        self.progress_bar.hide()
+
+    def perspective_key(self, region_to_plot, perspective, dataset, dpi=300):
+        return self.render_cache.key("perspective", region_to_plot, "M15c", dpi, dataset, perspective=perspective)
+
+    def sweep_progress(self, done, total):
+        self.label_status.setText(f"Perspective sweep: {done}/{total} frames - {self.render_cache.stats()}")
+
+    def trace_contours(self, view, engine_function, *args):
+        # the engine of the view is traced on the contour thread and drawn once it arrives
+        self.contour_request += 1
+        self.contour_tracing = True
+        self.contour_executor.submit(self.run_trace, self.contour_request, view, engine_function, args)
+
+    def run_trace(self, request, view, engine_function, args):
+        # skip traces that were superseded before they started
+        if request != self.contour_request:
+            return
+
+        try:
+            engine = engine_function(*args)
+        except Exception as error:
+            self.contours_failed.emit(request, str(error))
+            return
+
+        self.contours_traced.emit(request, view, engine)
+
+    def contours_ready(self, request, view, engine):
+        if request != self.contour_request:
+            return
+
+        self.contour_tracing = False
+        self.contour_view = (view, engine)
+        self.draw_contours()
+
+    def contour_tracing_failed(self, request, message):
+        if request != self.contour_request:
+            return
+
+        self.contour_tracing = False
+        self.label_status.setText(f"Tracing isolines failed: {message}")
+
+    def clear_contours(self):
+        # a trace still running for the view that is replaced is not drawn
+        self.contour_request += 1
+        self.contour_tracing = False
+        self.contour_view = None
+
+    def draw_contours(self):
+        # isolines at the current interval over the displayed basemap, annotated levels thicker
+        overlay = QPixmap()
+        if self.contour_view is not None and self.contour_view[0] == self.displayed_view:
+            levels, segments = self.contour_view[1].select(self.contour_interval)
+            x, y = self.view_transform.to_pixel(segments[..., 0], segments[..., 1])
+            lines = np.stack([x[:, 0], y[:, 0], x[:, 1], y[:, 1]], axis=1)
+
+            image = QImage(self.map_item.pixmap().size(), QImage.Format_ARGB32_Premultiplied)
+            image.fill(Qt.transparent)
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.Antialiasing)
+            for points, selected in ((0.25, levels % self.annotated_interval != 0), (0.75, levels % self.annotated_interval == 0)):
+                painter.setPen(QPen(Qt.black, points * self.displayed_dpi / 72))
+                painter.drawLines(point_pairs(lines[selected]))
+            painter.end()
+
+            overlay = QPixmap.fromImage(image)
+
+        self.layers.set_layer("contours", overlay, self.displayed_dpi)
+
+    def zoom_event(self, event):
+        factor = 1.2
+        if event.angleDelta().y() < 0:
+            factor = 1.0 / factor
+        self.graphics_view.scale(factor, factor)
+
+    def display_data(self, data, view=None, dpi=300, margin=MAP_MARGIN):
+        pixmap = QPixmap()
+        pixmap.loadFromData(data, "PNG")
+        self.display_pixmap(pixmap, view, dpi, margin)
+
+    def display_pixmap(self, pixmap, view=None, dpi=300, margin=MAP_MARGIN):
+        self.placeholder.hide()
+        self.profile_line.hide()
+        self.map_item.setPixmap(pixmap)
+
+        # previews are scaled up to the size of the full quality image that replaces them
+        self.map_item.setScale(300 / dpi)
+        self.layers.set_dpi(dpi)
+
+        # view is the (projection, region) of the map, None for images that cannot be picked,
+        # margin the blank space in inches the map is drawn on
+        self.view_transform = ViewTransform.for_view(*view, dpi, margin) if view is not None else None
+        self.displayed_view = view
+        self.displayed_dpi = dpi
+        self.draw_contours()
+
+        if self.first_map is None:
+            self.first_map = time.perf_counter() - self.started
+            self.print_startup_time()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint is None:
+            self.first_paint = time.perf_counter() - self.started
+            self.print_startup_time()
+
+            # loading starts once the window is on screen so it does not hold up the first paint
+            self.datasets.start()
+
+    def print_startup_time(self):
+        # the first map can come before the first paint when the colour map was needed early
+        if self.report_startup and self.first_paint is not None and self.first_map is not None:
+            print(f"first paint after {self.first_paint * 1000:.0f} ms")
+            print(f"first map after {self.first_map * 1000:.0f} ms")
+            QTimer.singleShot(0, self.close)
+
+    def render(self, description, key, render_function, *args, view=None, preview=None, preview_only=False, layers=()):
+        # contours are only drawn over the view that show_isocontours sets them for
+        self.view_requested()
+        self.clear_contours()
+        self.layers.clear()
+        self.show_map_view()
+
+        # layers are (name, key, render_function, args), cached and rendered on their own
+        self.pending_layers = {}
+        layer_passes = []
+        for name, layer_key, layer_function, layer_args in layers:
+            layer_data = self.render_cache.get(layer_key)
+            if layer_data is not None:
+                self.show_layer(name, layer_data)
+            else:
+                self.pending_layers[layer_key] = name
+                layer_passes.append((layer_key, layer_function, layer_args))
+
+        # views that were rendered before are shown straight from the cache
+        data = self.render_cache.get(key)
+        if data is not None:
+            self.display_data(data, view)
+            if layer_passes:
+                self.render_worker.submit_layers(description, layer_passes)
+                return
+
+            self.render_worker.cancel()
+            self.label_status.setText(self.render_cache.stats())
+            self.progress_bar.hide()
+            return
+
+        self.pending_view = view
+
+        # preview is an optional (key, render_function, args) quick first pass
+        preview_pass = None
+        if preview is not None:
+            preview_key, preview_function, preview_args = preview
+            preview_data = self.render_cache.get(preview_key)
+            if preview_data is not None:
+                self.display_data(preview_data, view, PREVIEW_DPI)
+            else:
+                preview_pass = (preview_key, preview_function, preview_args)
+
+        # while a slider is dragged only the quick pass is rendered, the full pass once it settles
+        if preview_only:
+            if preview_pass is not None:
+                self.render_worker.submit_preview(description, *preview_pass)
+            else:
+                self.render_worker.cancel()
+            return
+
+        self.render_worker.submit(description, key, render_function, *args, preview=preview_pass, layers=layer_passes)
+
+    def render_started(self, job_id, description):
+        self.label_status.setText(f"Rendering {description}...")
+        self.progress_bar.show()
+
+    def render_previewed(self, job_id, key, data):
+        # the preview stays up with the progress bar until the full quality image replaces it
+        self.render_cache.put(key, data)
+        if not self.render_worker.is_current(job_id):
+            return
+
+        self.display_data(data, self.pending_view, PREVIEW_DPI)
+
+    def render_finished(self, job_id, key, data):
+        # superseded renders are still cached, but only the latest request is displayed
+        self.render_cache.put(key, data)
+        if not self.render_worker.is_current(job_id):
+            return
+
+        self.display_data(data, self.pending_view)
+
+    def render_layer_ready(self, job_id, key, data):
+        self.render_cache.put(key, data)
+        if not self.render_worker.is_current(job_id):
+            return
+
+        self.show_layer(self.pending_layers.pop(key), data)
+
+    def render_done(self, job_id):
+        # the progress bar stays up until the last pass of the job, which is the preview while a slider is dragged
+        if not self.render_worker.is_current(job_id):
+            return
+
+        self.label_status.setText(self.render_cache.stats())
+        self.progress_bar.hide()
+
+    def show_layer(self, name, data, dpi=300):
+        pixmap = QPixmap()
+        pixmap.loadFromData(data, "PNG")
+        self.layers.set_layer(name, pixmap, dpi)
+
+    def render_failed(self, job_id, message):
+        if not self.render_worker.is_current(job_id):
+            return
+
+        self.label_status.setText(f"Rendering failed: {message}")
+        self.progress_bar.hide()
+
+    def export_view(self):
+        if self.displayed_job is None:
+            self.label_status.setText("Nothing to export")
+            return
+
+        output_path, _ = QFileDialog.getSaveFileName(self, "Export Map", "./output_plot.png", "PNG image (*.png)")
+        if not output_path:
+            return
+
+        # the isolines are exported at the interval currently shown
+        job = dict(self.displayed_job, style=self.style, contour_interval=self.contour_interval)
+        self.render_worker.export(output_path, render_job, job)
+        self.label_status.setText(f"Exporting {output_path}...")
+
+    def export_flyover(self):
+        # a full turn around the current 3D view, an interrupted export of the same file resumes
+        output_path, _ = QFileDialog.getSaveFileName(self, "Export Fly-over", "./flyover.mp4", "Video (*.mp4 *.gif)")
+        if not output_path:
+            return
+
+        self.flyover.start(output_path, orbit(self.perspective, self.region_to_plot), self.style)
+        self.label_status.setText(f"Exporting {output_path}...")
+
+    def flyover_progress(self, done, total):
+        self.label_status.setText(f"Fly-over: {done}/{total} frames")
+
+    def flyover_finished(self, output_path, summary):
+        self.label_status.setText(f"Exported {output_path}: {summary}")
+
+    def view_exported(self, output_path):
+        self.label_status.setText(f"Exported {output_path}")
+
+    def export_failed(self, output_path, message):
+        self.label_status.setText(f"Export of {output_path} failed: {message}")
+
+    def closeEvent(self, event):
+        self.datasets.shutdown()
+        self.render_worker.shutdown()
+        self.render_cache.flush()
+        self.flyover.shutdown()
+        self.tile_view.shutdown()
+        self.perspective_sweep.cancel()
+        self.contour_executor.shutdown(wait=False, cancel_futures=True)
+        self.texture_executor.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
+
+    def show_tile_viewer(self):
+        self.view_requested()
+        self.profile_chart.hide()
+        self.render_worker.cancel()
+        self.displayed_job = None
+        self.progress_bar.hide()
+        self.graphics_view.hide()
+        self.tile_view.show()
+
+    def show_map_view(self):
+        self.tile_view.hide()
+        self.graphics_view.show()
+
+    def tile_hovered(self, lon, lat):
+        self.label_position.setText(self.position_text(lon, lat))
+
+    def mouse_press_event(self, event):
+        # a press starts a drag that draws a profile, it is a click if the mouse is released where it was pressed
+        self.drag_start = event.pos()
+
+    def mouse_release_event(self, event):
+        start, self.drag_start = self.drag_start, None
+        if start is None:
+            return
+
+        if (event.pos() - start).manhattanLength() >= DRAG_DISTANCE:
+            self.show_profile(start, event.pos())
+        else:
+            self.profile_line.hide()
+            self.profile_chart.hide()
+            self.map_clicked(event.pos())
+
+    def show_profile(self, start, end):
+        lon0, lat0 = self.pick(start)
+        lon1, lat1 = self.pick(end)
+        if lon0 is None or lon1 is None or not self.dataset_available("queries"):
+            self.profile_line.hide()
+            return
+
+        profile = self.queries.profile((lon0, lat0), (lon1, lat1))
+        self.profile_chart.setPixmap(profile_pixmap(profile, self.graphics_view.width(), self.profile_chart.height()))
+        self.profile_chart.show()
+        self.label_status.setText(f"Profile of {profile['distance_km'][-1]:.0f} km from {np.nanmin(profile['height']):.0f} m to {np.nanmax(profile['height']):.0f} m")
+
+    @abstractmethod
+    def map_clicked(self, pos):
+        # a click on the map at a view position that did not drag a profile
+        pass
+
+    def pick(self, pos):
+        # view position to lon/lat, through the zoom of the view and the transform of the displayed map
+        if self.view_transform is None:
+            return None, None
+
+        image_pos = self.map_item.mapFromScene(self.graphics_view.mapToScene(pos))
+        lon, lat = self.view_transform.to_lonlat(image_pos.x(), image_pos.y())
+        if np.isnan(lon):
+            return None, None
+
+        return float(lon), float(lat)
+
+    def mouse_move_event(self, event):
+        if self.drag_start is not None and self.view_transform is not None and (event.pos() - self.drag_start).manhattanLength() >= DRAG_DISTANCE:
+            start = self.map_item.mapFromScene(self.graphics_view.mapToScene(self.drag_start))
+            end = self.map_item.mapFromScene(self.graphics_view.mapToScene(event.pos()))
+            self.profile_line.setLine(QLineF(start, end))
+            self.profile_line.show()
+
+        lon, lat = self.pick(event.pos())
+        if lon is None:
+            self.label_position.setText("")
+            return
+
+        self.label_position.setText(self.position_text(lon, lat))
+
+    def position_text(self, lon, lat):
+        # the height is left out until the relief grid has loaded, rather than waiting for it
+        if not self.datasets.is_loaded("sampler"):
+            return f"Lon: {lon:.2f}, Lat: {lat:.2f}"
+
+        return f"Lon: {lon:.2f}, Lat: {lat:.2f} - Height: {self.sample_height(lon, lat):.0f} m"
+
+    def sample_height(self, lon, lat):
+        # nan when the relief grid could not be loaded
+        if not self.dataset_available("sampler"):
+            return float("nan")
+
+        sampled_height = float(self.sampler.sample(lon, lat))
+
+        return sampled_height
+
+    def preview_perspective(self, azimuth):
+        # while the slider is dragged the nearest pre-rendered frame is shown, otherwise the quick preview of the angle
+        frame = self.perspective_sweep.nearest(azimuth, self.region_to_plot, self.perspective[1])
+        self.perspective[0] = frame if frame is not None else azimuth
+        self.plot_3d_pespective(preview_only=True)
+
+    def update_perspective(self, azimuth):
+        # update the perspective based on the slider value
+        self.perspective[0] = azimuth
+
+        # snap to the nearest pre-rendered frame, angles outside the sweep are rendered live
+        frame = self.perspective_sweep.nearest(self.perspective[0], self.region_to_plot, self.perspective[1])
+        if frame is not None:
+            self.perspective[0] = frame
+            self.slider_perspective.blockSignals(True)
+            self.slider_perspective.setValue(frame)
+            self.slider_perspective.blockSignals(False)
+
+        self.plot_3d_pespective()
+
+    def preview_contour_interval(self, interval):
+        # the overlay follows the slider while it is dragged, it is drawn without rendering
+        if self.contour_view is not None:
+            self.contour_interval = snap_interval(interval)
+            self.draw_contours()
+
+    def adjust_contour_interval(self, interval):
+        # update the contour interval based on the slider value, snapped to intervals the contour engine can filter
+        self.contour_interval = snap_interval(interval)
+        self.slider_contour.blockSignals(True)
+        self.slider_contour.setValue(self.contour_interval)
+        self.slider_contour.blockSignals(False)
+
+        # only the overlay changes while the isocontours are shown or traced
+        if self.contour_view is not None or self.contour_tracing:
+            self.draw_contours()
+        else:
+            self.show_isocontours()
+
+    # the views each visualizer draws in its own way
+
+    @abstractmethod
+    def plot_3d_pespective(self, preview_only=False):
+        # the 3D view of the region at self.perspective, only its quick pass with preview_only
+        pass
+
+    @abstractmethod
+    def start_perspective_sweep(self):
+        # pre-renders the 3D view of the region at every azimuth of the slider
+        pass
+
+    @abstractmethod
+    def show_isocontours(self):
+        # the basemap of the region with the isolines traced over it
+        pass
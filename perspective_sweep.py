@@ -0,0 +1,101 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from PyQt5.QtCore import QObject, pyqtSignal
+from render import render_to_bytes
+
+# state of a sweep worker process, set once by init_sweep_worker so the grid is only
+# sent to each process once rather than with every frame
+worker_render_function = None
+worker_grid = None
+
+def init_sweep_worker(render_function, grid):
+    global worker_render_function, worker_grid
+    worker_render_function = render_function
+    worker_grid = grid
+
+def render_sweep_frame(region_to_plot, perspective):
+    # PNG data of a frame, sent back to the GUI process
+    return render_to_bytes(worker_render_function, worker_grid, region_to_plot, perspective)
+
+class PerspectiveSweep(QObject):
+    # pre-renders the 3D perspective view for a set of azimuths in parallel across all
+    # cores and stores the frames in the render cache, so the perspective slider can
+    # snap to the nearest finished frame instead of waiting for a live render. Frames are
+    # tagged with the generation of the sweep they were submitted by, since cancel cannot
+    # stop the ones already rendering
+    progress = pyqtSignal(int, int)
+    frame_ready = pyqtSignal(int, int, str, bytes)
+
+    def __init__(self, render_cache, parent=None):
+        super().__init__(parent)
+
+        self.render_cache = render_cache
+        self.executor = None
+        self.generation = 0
+        self.view = None
+        self.step = 5
+        self.azimuths = []
+        self.frames = {}
+
+        # frames finish in the worker processes, they are stored on the GUI thread
+        self.frame_ready.connect(self.store_frame)
+
+    def start(self, render_function, grid, region_to_plot, elevation, key_for, step=5, azimuths=None):
+        self.cancel()
+
+        self.view = (list(region_to_plot), elevation)
+        self.step = step
+        self.azimuths = list(azimuths) if azimuths is not None else list(range(-180, 181, step))
+        self.frames = {}
+
+        self.executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=get_context("spawn"), initializer=init_sweep_worker, initargs=(render_function, grid))
+
+        for azimuth in self.azimuths:
+            key = key_for(azimuth)
+
+            # frames rendered by an earlier sweep or a live render are reused
+            if self.render_cache.contains(key):
+                self.frames[azimuth] = key
+                continue
+
+            future = self.executor.submit(render_sweep_frame, list(region_to_plot), [azimuth, elevation])
+            future.add_done_callback(partial(self.frame_done, self.generation, azimuth, key))
+
+        self.progress.emit(len(self.frames), len(self.azimuths))
+
+    def frame_done(self, generation, azimuth, key, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        self.frame_ready.emit(generation, azimuth, key, future.result())
+
+    def store_frame(self, generation, azimuth, key, data):
+        # frames of a cancelled sweep are still cached under their own key, but they are not
+        # frames of the current view
+        self.render_cache.put(key, data)
+        if generation != self.generation:
+            return
+
+        self.frames[azimuth] = key
+        self.progress.emit(len(self.frames), len(self.azimuths))
+
+    def nearest(self, azimuth, region_to_plot, elevation):
+        # snaps to the closest finished frame of this view, None when the angle is outside the sweep
+        if self.view != (list(region_to_plot), elevation) or not self.frames:
+            return None
+
+        nearest = min(self.frames, key=lambda frame: abs(frame - azimuth))
+        if abs(nearest - azimuth) > self.step / 2:
+            return None
+
+        return nearest
+
+    def cancel(self):
+        # frames of this sweep that are still rendering are dropped when they come in
+        self.generation += 1
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,76 @@
+import numpy as np
+from projections import parse_projection
+
+class ViewTransform:
+    # maps pixels of a displayed map image to lon/lat and back. The map area is a rectangle
+    # sized from the projection width and the dpi the image was saved at, margin inches
+    # from the left and top of the image: the blank margin GMT maps are drawn on, so the
+    # frame annotations around it are skipped, and none for the reprojected textures
+    def __init__(self, projection, region_to_plot, dpi=300, margin=0):
+        self.projection, width_inches = parse_projection(projection, region_to_plot)
+        self.region_to_plot = list(region_to_plot)
+
+        self.x_min, self.x_max, self.y_min, self.y_max = self.projection.bounds(region_to_plot)
+        self.scale = width_inches * dpi / (self.x_max - self.x_min)
+
+        self.left = margin * dpi
+        self.top = margin * dpi
+
+    @classmethod
+    def for_view(cls, projection, region_to_plot, dpi=300, margin=0):
+        # None for views that cannot be picked, e.g. the 3D perspective
+        projection_model, _ = parse_projection(projection, region_to_plot)
+        if projection_model is None:
+            return None
+
+        return cls(projection, region_to_plot, dpi, margin)
+
+    def to_lonlat(self, px, py):
+        # image pixel positions to lon/lat, NaN outside the map area
+        x = self.x_min + (np.asarray(px, dtype=np.float64) - self.left) / self.scale
+        y = self.y_max - (np.asarray(py, dtype=np.float64) - self.top) / self.scale
+        lon, lat = self.projection.inverse(x, y)
+
+        west, east, south, north = self.region_to_plot
+        outside = (lon < west) | (lon > east) | (lat < south) | (lat > north)
+        return np.where(outside, np.nan, lon), np.where(outside, np.nan, lat)
+
+    def to_pixel(self, lon, lat):
+        x, y = self.projection.forward(lon, lat)
+        return self.left + (x - self.x_min) * self.scale, self.top + (self.y_max - y) * self.scale
+
+def map_size(projection, region_to_plot):
+    # width and height of the map area in inches
+    transform = ViewTransform(projection, region_to_plot, 1)
+    return (transform.x_max - transform.x_min) * transform.scale, (transform.y_max - transform.y_min) * transform.scale
+
+class ElevationSampler:
+    # bilinear elevation lookups on a plain numpy copy of a regularly spaced relief grid,
+    # computed with array arithmetic only so many points can be sampled at once
+    def __init__(self, grid):
+        self.values = np.asarray(grid.values, dtype=np.float32)
+
+        latitudes = grid.lat.values
+        longitudes = grid.lon.values
+        self.lat_origin, self.lat_step = latitudes[0], (latitudes[-1] - latitudes[0]) / (len(latitudes) - 1)
+        self.lon_origin, self.lon_step = longitudes[0], (longitudes[-1] - longitudes[0]) / (len(longitudes) - 1)
+
+    def sample(self, lon, lat):
+        rows = (np.asarray(lat, dtype=np.float64) - self.lat_origin) / self.lat_step
+        cols = (np.asarray(lon, dtype=np.float64) - self.lon_origin) / self.lon_step
+
+        height, width = self.values.shape
+        outside = ~((rows >= 0) & (rows <= height - 1) & (cols >= 0) & (cols <= width - 1))
+        rows = np.clip(np.nan_to_num(rows), 0, height - 1)
+        cols = np.clip(np.nan_to_num(cols), 0, width - 1)
+
+        row0 = np.minimum(rows.astype(np.intp), height - 2)
+        col0 = np.minimum(cols.astype(np.intp), width - 2)
+        row_weight = rows - row0
+        col_weight = cols - col0
+
+        top = self.values[row0, col0] * (1 - col_weight) + self.values[row0, col0 + 1] * col_weight
+        bottom = self.values[row0 + 1, col0] * (1 - col_weight) + self.values[row0 + 1, col0 + 1] * col_weight
+        heights = top * (1 - row_weight) + bottom * row_weight
+
+        return np.where(outside, np.nan, heights)
@@ -1,327 +1,194 @@
-import xarray as xr
-import numpy as np
-from PIL import Image
-import imageio.v2 as imageio
-import pygmt
+import time
+
+# startup is timed from the first line, before the libraries are imported
+STARTED = time.perf_counter()
+
+import os
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QPushButton, QSlider, QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QLabel
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+from map_window import MapWindow
+from picking import ElevationSampler
+from contours import ContourEngine
+from elevation_query import QueryEngine
+from render import load_color_map, load_displacement_map, render_grid_map, render_grid_map_preview, render_perspective_relief, render_perspective_relief_preview, render_colorbar_layer, PREVIEW_DPI, PREVIEW_RESOLUTION
+from hillshade import SUN_AZIMUTH, SUN_ALTITUDE
+from regions import RegionIndex
+from continent_pages import ContinentPages
+
+class EarthElevationVisualizer(MapWindow):
+    title = "Earth Elevation Visualiser - Educational Visualisation"
+    style = "educational"
+    default_tile_source = "relief"
+    layer_toggles = [("contours", "Contours"), ("colorbar", "Colorbar"), ("shading", "Relief Shading"), ("highlight", "Continent Highlight"), ("info", "Info Panel")]
+    annotated_interval = 1000
 
-class EarthElevationVisualizer(QMainWindow):
     def __init__(self):
-        super().__init__()
-
-        self.init_ui()
+        super().__init__(STARTED)
 
     def init_ui(self):
-        
-        self.setWindowTitle("Earth Elevation Visualiser - Educational Visualisation")
-        self.setGeometry(100, 100, 800, 600)
-
-        self.region_to_plot = [-180, 180, -90, 90]
-        self.output_path = "./output_plot.png"
-        self.perspective = [-120, 30]
-        self.contour_interval = 250
-
-        self.grid = pygmt.datasets.load_earth_relief(resolution="10m", region=self.region_to_plot)
-        self.color_map = self.load_color_map()
-        self.displacement_map = self.load_displacement_map()
-
-        # general setup for the window
-        central_widget = QWidget(self)
-        self.setCentralWidget(central_widget)
-
-        layout = QVBoxLayout(central_widget)
-
-        self.graphics_view = QGraphicsView(self)
-        layout.addWidget(self.graphics_view)
-
-        self.scene = QGraphicsScene(self)
-        self.graphics_view.setScene(self.scene)
+        super().init_ui()
+
+        # continent detail pages, rendered in the background and cached per version of their inputs
+        self.continent_pages = ContinentPages(parent=self)
+        self.continent_pages.page_ready.connect(self.continent_page_ready)
+        self.continent_pages.page_failed.connect(self.continent_page_failed)
+        self.wanted_page = None
+        QTimer.singleShot(0, self.continent_pages.warm_up)
+
+    def add_datasets(self):
+        self.datasets.add("color_map", load_color_map)
+        self.datasets.add("sampler", lambda: ElevationSampler(self.relief.grid("10m", [-180, 180, -90, 90])))
+
+        # spatial index of the continent outlines for hit-testing clicks
+        self.datasets.add("regions", RegionIndex)
+        self.datasets.add("displacement_map", load_displacement_map)
+
+        # point, profile and region statistics queries on the 10m grid, continents included
+        self.datasets.add("queries", lambda: QueryEngine(self.relief.grid("10m", [-180, 180, -90, 90]), self.regions))
+
+    def relief_dataset(self, resolution):
+        # relief views are shaded with the precomputed hillshade of this sun position
+        return f"{super().relief_dataset(resolution)}/sun{SUN_AZIMUTH}-{SUN_ALTITUDE}"
+
+    @property
+    def regions(self):
+        return self.datasets.get("regions")
 
-        # pixmap item to hold the map image
-        self.map_item = QGraphicsPixmapItem()
-        self.scene.addItem(self.map_item)
-
-        # set up the initial global map
-        self.show_global_map()
-
-        # buttons for visualization techniques
-        btn_global_map = QPushButton("Global Map", self)
-        btn_3d_perspective = QPushButton("3D Perspective", self)
-        btn_isocontours = QPushButton("Isocontours", self)
-        layout.addWidget(btn_global_map)
-        layout.addWidget(btn_3d_perspective)
-        layout.addWidget(btn_isocontours)
-
-        self.label_slider_value = QLabel(f"Change Perspective:", self)
-        layout.addWidget(self.label_slider_value)
-
-        self.slider_perspective = QSlider(Qt.Horizontal)
-        self.slider_perspective.setMinimum(-180)
-        self.slider_perspective.setMaximum(180)
-        self.slider_perspective.setValue(self.perspective[0])
-        layout.addWidget(self.slider_perspective)
-        self.slider_perspective.sliderReleased.connect(self.update_perspective)
-
-        # slider for contour values
-        self.label_contour_value = QLabel(f"Change Contour Interval:", self)
-        layout.addWidget(self.label_contour_value)
-
-        self.slider_contour = QSlider(Qt.Horizontal)
-        self.slider_contour.setMinimum(100)
-        self.slider_contour.setMaximum(2000)
-        self.slider_contour.setValue(self.contour_interval)
-        layout.addWidget(self.slider_contour)
-        self.slider_contour.sliderReleased.connect(self.adjust_contour_interval)
-
-        # connect widgets to functions
-        btn_global_map.clicked.connect(self.show_global_map)
-        btn_3d_perspective.clicked.connect(self.plot_3d_pespective)
-        btn_isocontours.clicked.connect(self.show_isocontours)
-    
-        # zoom functionality
-        self.graphics_view.wheelEvent = self.zoom_event
-
-        # mouse events
-        self.graphics_view.mousePressEvent = self.mouse_press_event
-    
-    def load_color_map(self):
-            
-        image_path = "./dataset_vis/dataset/colour_dataset/8081_earthmap2k.jpg" 
-        image = Image.open(image_path)
-
-        rgb_array = np.array(image)
-
-        latitudes = np.linspace(90, -90, rgb_array.shape[0])
-        longitudes = np.linspace(-180, 180, rgb_array.shape[1])
-
-        data_array = xr.DataArray(rgb_array, dims=('latitude', 'longitude', 'channel'),coords={'latitude': latitudes,'longitude': longitudes,'channel': ['red', 'green', 'blue']})
-
-        data_array = data_array.transpose('channel', 'latitude', 'longitude')
-
-        return data_array
-    
-    def load_displacement_map(self):
-        displacement_map_file = "./dataset_vis/dataset/displacement_dataset/8081_earthbump10k.jpg"
-
-        # read displacement map image
-        bumpmap = imageio.imread(displacement_map_file)
-
-        # scale the data values to the range [0, 4000]
-        min_value = 0
-        max_value = 4000
-        scaled_image = min_value + ((max_value - min_value) / 255.0) * bumpmap
-
-        height, width = scaled_image.shape
-
-        # create latitude and longitude values
-        latitudes = np.linspace(90, -90, height)
-        longitudes = np.linspace(-180, 180, width)
-
-        # create an xarray.DataArray from the scaled image data with latitude and longitude coordinates
-        bump_array = xr.DataArray(scaled_image, coords=[("lat", latitudes),("lon", longitudes)], dims=["lat", "lon"])
-
-        return bump_array
-
-    def show_global_map(self):
-        self.plot( "./output_plot.png", "W6i", [-180, 180, -90, 90])
-        self.display("./output_plot.png")
-
-    def plot_3d_pespective(self):
-        print("3D Perspective Visualization Selected")
-        output_path = self.output_path
-        region_to_plot = self.region_to_plot
-        perspective = self.perspective
-
-        grid = pygmt.datasets.load_earth_relief(resolution="10m", region=region_to_plot)
-        # grid = self.displacement_map
-
-        frame =  ["xa1f0.25","ya1f0.25", "z2000+lmeters", "wSEnZ"]
-
-        pygmt.makecpt(
-                cmap='geo',
-                series=f'-6000/4000/100',
-                continuous=True
-            )
-
-        fig = pygmt.Figure()
-        fig.grdview(
-            grid=grid,
-            region=region_to_plot + [-6000, 4000],
-            perspective=perspective,
-            frame=frame,
-            projection="M15c",
-            zsize="4c",
-            surftype="i",
-            shading=True,
-            cmap = "geo",
-            contourpen="0.1p",
-            
-        )
-
-        # fig.grdcontour(grid=pygmt.grdclip(grid, below=[1, 0]), annotation="500", interval=self.contour_interval, limit="z+", perspective=perspective)
-        fig.basemap(
-            perspective=True,
-            rose="jTL+w3c+l+o-2c/-1c" #map directional rose at the top left corner 
-        )
-
-        fig.colorbar(perspective=True, frame=["a2000", "x+l'Elevation in (m)'", "y+lm"])
-        fig.savefig(output_path, crop=True, dpi=300)
-        self.display(output_path)
+    def view_requested(self):
+        # a continent page that is still rendering is not shown over another view
+        super().view_requested()
+        self.wanted_page = None
+
+    def plot_3d_pespective(self, preview_only=False):
+        if not preview_only:
+            print("3D Perspective Visualization Selected")
+
+        dataset, resolution = self.relief_level(self.region_to_plot, "M15c")
+        key = self.perspective_key(self.region_to_plot, self.perspective, dataset)
+        # copies so the job is not affected by later changes to the view state
+        # the decimated 10m grid at low dpi is shown first
+        preview_key = self.perspective_key(self.region_to_plot, self.perspective, f"{self.relief_dataset(PREVIEW_RESOLUTION)}/{PREVIEW_RESOLUTION}", PREVIEW_DPI)
+        preview = (preview_key, render_perspective_relief_preview, (list(self.region_to_plot), list(self.perspective)))
+
+        self.displayed_job = {"mode": "perspective", "region": list(self.region_to_plot), "perspective": list(self.perspective)}
+        self.render("3D Perspective", key, render_perspective_relief, resolution, list(self.region_to_plot), list(self.perspective), preview=preview, preview_only=preview_only)
+
+    def start_perspective_sweep(self):
+        # pre-render the current 3D view every 5 degrees of azimuth in the background
+        region_to_plot = list(self.region_to_plot)
+        elevation = self.perspective[1]
+        dataset, resolution = self.relief_level(region_to_plot, "M15c")
+
+        self.perspective_sweep.start(render_perspective_relief, resolution, region_to_plot, elevation, lambda azimuth: self.perspective_key(region_to_plot, [azimuth, elevation], dataset))
 
     def show_isocontours(self):
-        grid = pygmt.datasets.load_earth_relief( resolution="10m", region = self.region_to_plot)
-
-        fig = pygmt.Figure()
-
-        fig.grdimage(
-            grid=grid,
-            cmap="geo",
-            projection="Cyl_stere/30/-20/12c",
-            frame=True,
-            region=self.region_to_plot,
-        )
-        # create the contour plot
-        fig.grdcontour(
-            grid=grid,
-            interval=self.contour_interval,
-            annotation=1000,
-            frame="a",
-            projection="Cyl_stere/30/-20/12c",
-            region=self.region_to_plot,
-        )
-
-        # fig.colorbar(frame=["x+lelevation", "y+lm"])
-        # show the plot
-        fig.savefig(self.output_path)
-        self.display(self.output_path)
+        # the basemap is rendered without contours, the isolines are drawn over it from the
+        # contour engine, so changing the interval does not render anything
+        view = ("Cyl_stere/30/-20/12c", list(self.region_to_plot))
+        dataset, resolution = self.relief_level(self.region_to_plot, "Cyl_stere/30/-20/12c")
+        key = self.render_cache.key("contour-basemap", self.region_to_plot, "Cyl_stere/30/-20/12c", 300, dataset)
+
+        preview_key = self.render_cache.key("contour-basemap", self.region_to_plot, "Cyl_stere/30/-20/12c", PREVIEW_DPI, f"{self.relief_dataset(PREVIEW_RESOLUTION)}/{PREVIEW_RESOLUTION}")
+        preview = (preview_key, render_grid_map_preview, ("Cyl_stere/30/-20/12c", list(self.region_to_plot)))
+
+        # the colour scale is a panel below the map, cached apart from it
+        colorbar_key = self.render_cache.key("layer-colorbar", self.region_to_plot, "Cyl_stere/30/-20/12c", 300, dataset)
+        layers = [("colorbar", colorbar_key, render_colorbar_layer, (resolution, list(self.region_to_plot)))]
+
+        self.displayed_job = {"mode": "isocontours", "region": list(self.region_to_plot)}
+        self.render("Isocontours", key, render_grid_map, resolution, "Cyl_stere/30/-20/12c", list(self.region_to_plot), view=view, preview=preview, layers=layers)
+        self.trace_contours(view, self.contour_engine, resolution, list(self.region_to_plot))
         print("Isocontours Visualization Selected")
 
+    def contour_engine(self, resolution, region_to_plot):
+        # isolines of the relief, traced once per grid and kept with the grids
+        region_to_plot = list(region_to_plot)
+        return self.relief.cached(("contours", resolution, tuple(region_to_plot)), lambda: ContourEngine(self.relief.grid(resolution, region_to_plot)))
 
-    def zoom_event(self, event):
-        factor = 1.2
-        if event.angleDelta().y() < 0:
-            factor = 1.0 / factor
-        self.graphics_view.scale(factor, factor)
-    
-    def display(self, output_path):
-        pixmap = QPixmap(output_path)
-        self.map_item.setPixmap(pixmap)
-
-    def plot(self, output_path, projection, region_to_plot):
-        # grid = pygmt.datasets.load_earth_relief(resolution="10m", region= region_to_plot)
-        grid = self.color_map
-        fig = pygmt.Figure()
-        fig.grdimage(grid=grid, cmap="geo", projection=projection, region = region_to_plot, frame=True)
-        fig.savefig(output_path)
-
-    def plot_image(self, output_path, projection, region_to_plot):
-        grid = pygmt.datasets.load_earth_relief(resolution="10m", region= region_to_plot)
-    
-        fig = pygmt.Figure()
-        fig.grdimage(grid, cmap="geo", projection=projection, region = region_to_plot, shading=True, frame=True)
-        fig.savefig(output_path)
-
-    def mouse_press_event(self, event):
-        pos = event.pos()
-        scene_pos = self.graphics_view.mapToScene(pos)
-        x,y = scene_pos.x(), scene_pos.y()
-
-        print(f"Clicked Position: {x}, {y}")
-        # print(f"grid.shape: {self.grid.shape}")
-        # assuming self.grid.shape is (height, width)
-        # get the height and width of the window
-        height, width = self.grid.shape
-        height -= 180
-        width -= 360
-
-        # print(f"height: {height}, width: {width}")
-
-        # convert the clicked position to a latitude and longitude
-        lon = x / width * 360.0 - 180.0
-        lat = 90.0 - y / height * 180.0
+    def closeEvent(self, event):
+        self.continent_pages.shutdown()
+        super().closeEvent(event)
 
+    def map_clicked(self, pos):
+        lon, lat = self.pick(pos)
+        if lon is None:
+            print("Clicked outside the map")
+            return
 
         # sample the height at the clicked position
         sampled_height = self.sample_height(lon, lat)
 
         print(f"Sampled Height at Lon: {lon}, Lat: {lat} - Height: {sampled_height}")
 
-        # handle click event
-        #if clicked on Africa show Africa
-        if lon >= -20 and lon <= 60 and lat >= -40 and lat <= 40:
-            self.plot_continent("./africa.png", [-20, 60, -40, 40], "AF", "africa_info.png")
-            self.display("./africa.png")
-
-        #if clicked on Europe show Europe
-        elif lon >= -10 and lon <= 40 and lat >= 30 and lat <= 70:
-            self.plot_continent("./europe.png", [-10, 40, 30, 70], "EU", "europe_info.png")
-            self.display("./europe.png")
-        
-        #if clicked on Asia show Asia
-        elif lon >= 60 and lon <= 150 and lat >= 0 and lat <= 60:
-            self.plot_continent("./asia.png", [60, 150, 0, 60], "AS", "asia_info.png")
-            self.display("./asia.png")
-        
-        #if clicked on North America show North America
-        elif lon >= -170 and lon <= -50 and lat >= 10 and lat <= 80:
-            self.plot_continent("./north_america.png", [-170, -50, 10, 80], "NA", "north_america_info.png")
-            self.display("./north_america.png")
-
-        #if clicked on South America show South America
-        elif lon >= -90 and lon <= -30 and lat >= -60 and lat <= 20:
-            self.plot_continent("./south_america.png", [-90, -30, -60, 20], "SA", "south_america_info.png")
-            self.display("./south_america.png")
-
-        #if clicked on Australia show Australia
-        elif lon >= 100 and lon <= 160 and lat >= -50 and lat <= -10:
-            self.plot_continent("./australia.png", [100, 160, -50, -10], "AU", "australia_info.png")
-            self.display("./australia.png")
-
-        #if clicked on Antarctica show Antarctica
-        elif lon >= -180 and lon <= 180 and lat >= -90 and lat <= -60:
-            self.plot_continent("./antarctica.png", [-180, 180, -90, -60], "AN", "antarctica_info.png")
-            self.display("./antarctica.png")
-
-    def plot_continent(self, output_path, region_to_plot, continent_code, info_file):
-        fig = pygmt.Figure()
-
-        fig.image(imagefile = info_file)
-
-        fig.shift_origin(yshift="-2*h-1c")
-
-        fig.coast( region="d", projection="H10c", land="gray", water="white", frame="afg", dcw=[ "="+continent_code+"+gred3" ] )
-
-        fig.shift_origin(xshift="w+3c")   
-        grid = pygmt.datasets.load_earth_relief(resolution="10m", region= region_to_plot)
-        fig.grdimage(grid, cmap="geo", projection="Cyl_stere/30/-20/12c", region = region_to_plot, shading=True, frame=True)
-        self.output_path = output_path
-        self.region_to_plot = region_to_plot
-
-        fig.savefig(output_path)
-        
-
-    def sample_height(self, lon, lat):
-        sampled_height = self.grid[int(lat),int(lon)].values
-
-        return sampled_height
-    
-    def update_perspective(self):
-        # Update the perspective based on the slider value
-        self.perspective[0] = self.slider_perspective.value()
-
-        self.plot_3d_pespective()
-
-    def adjust_contour_interval(self):
-        # Update the contour interval based on the slider value
-        self.contour_interval = self.slider_contour.value()
-
-        self.show_isocontours()
+        # show the detail page of the continent that was clicked on
+        if not self.dataset_available("regions"):
+            return
+
+        region = self.regions.region_at(lon, lat)
+        if region is not None:
+            self.show_continent(region)
+
+    def show_continent(self, region):
+        self.region_to_plot = region.region_to_plot
+
+        # the page replaces whatever is being rendered and is shown as soon as it is ready
+        self.view_requested()
+        self.render_worker.cancel()
+        self.wanted_page = region.name
+        self.displayed_job = {"mode": "continent", "continent": region.name}
+        self.clear_contours()
+        self.layers.clear()
+        self.show_map_view()
+
+        if self.continent_pages.is_ready(region):
+            self.continent_page_ready(region.name)
+            return
+
+        self.continent_pages.request(region)
+        self.label_status.setText(f"Rendering {region.code}...")
+        self.progress_bar.show()
+
+    def continent_page_ready(self, name):
+        if name != self.wanted_page:
+            return
+
+        # the relief map is the map of the page, so positions on it can be picked, and the
+        # other layers are placed over and next to it
+        region = next(region for region in self.regions.regions if region.name == name)
+        paths = self.continent_pages.layer_paths(region)
+        with open(paths["relief"], "rb") as file:
+            self.display_data(file.read(), ("Cyl_stere/30/-20/12c", list(region.region_to_plot)))
+
+        for layer in ("shading", "globe", "highlight"):
+            with open(paths[layer], "rb") as file:
+                self.show_layer(layer, file.read())
+
+        # the info panels are drawn at about the size of the globe, a continent without one has none
+        if os.path.isfile(region.info_file):
+            with open(region.info_file, "rb") as file:
+                self.show_layer("info", file.read(), 150)
+        else:
+            self.layers.clear(["info"])
+        self.label_status.setText("")
+        self.progress_bar.hide()
+
+    def continent_page_failed(self, name, message):
+        if name != self.wanted_page:
+            return
+
+        self.label_status.setText(f"Rendering failed: {message}")
+        self.progress_bar.hide()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = EarthElevationVisualizer()
+
+    # prints the time to the first paint and the first map, then quits
+    window.report_startup = "--startup-time" in sys.argv
     window.show()
+
+    if "--sweep" in sys.argv:
+        window.start_perspective_sweep()
+
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,46 @@
+import numpy as np
+from PyQt5.QtGui import QPixmap, QPainter, QPen, QColor, QPolygonF
+from PyQt5.QtCore import Qt, QPointF
+
+# elevation profile drawn under the map after a drag: the height along the great circle
+# between the two points, with sea level and the range of heights marked
+
+# space around the plot for the labels, in pixels
+MARGIN = 30
+
+# pixels the mouse has to move between press and release for a drag to draw a profile
+DRAG_DISTANCE = 6
+
+def profile_pixmap(profile, width, height):
+    pixmap = QPixmap(width, height)
+    pixmap.fill(Qt.white)
+
+    distances = profile["distance_km"]
+    heights = np.nan_to_num(profile["height"])
+    low, high = min(float(heights.min()), 0.0), max(float(heights.max()), 0.0)
+    span = max(high - low, 1.0)
+
+    def point(distance, elevation):
+        x = MARGIN + distance / max(distances[-1], 1e-6) * (width - 2 * MARGIN)
+        y = height - MARGIN - (elevation - low) / span * (height - 2 * MARGIN)
+        return QPointF(x, y)
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+
+    # ground filled down to the bottom of the plot, sea level as a line across it
+    outline = [point(distance, elevation) for distance, elevation in zip(distances, heights)]
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(QColor(150, 120, 80))
+    painter.drawPolygon(QPolygonF(outline + [point(distances[-1], low), point(0, low)]))
+
+    painter.setPen(QPen(QColor(30, 90, 200), 1, Qt.DashLine))
+    painter.drawLine(point(0, 0), point(distances[-1], 0))
+
+    painter.setPen(Qt.black)
+    painter.drawText(MARGIN, MARGIN - 8, f"{high:.0f} m")
+    painter.drawText(MARGIN, height - 8, f"{low:.0f} m")
+    painter.drawText(width - MARGIN - 80, height - 8, f"{distances[-1]:.0f} km")
+    painter.end()
+
+    return pixmap
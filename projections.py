@@ -0,0 +1,105 @@
+import re
+import numpy as np
+from raster_pyramid import projection_width_inches
+
+# vectorized forward and inverse versions of the GMT map projections the visualizers draw
+# with, in projected units of the unit sphere. Angles are in degrees at the interface
+
+class Projection:
+    def __init__(self, central_meridian=0.0):
+        self.central_meridian = central_meridian
+
+    def bounds(self, region_to_plot, samples=90):
+        # projected extent of a region, from points along its outline
+        west, east, south, north = region_to_plot
+        lon = np.concatenate([np.linspace(west, east, samples), np.full(samples, east), np.linspace(east, west, samples), np.full(samples, west)])
+        lat = np.concatenate([np.full(samples, south), np.linspace(south, north, samples), np.full(samples, north), np.linspace(north, south, samples)])
+        x, y = self.forward(lon, lat)
+
+        return np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y)
+
+class Equirectangular(Projection):
+    # GMT Q / Cyl_equid
+    def forward(self, lon, lat):
+        return np.radians(np.asarray(lon) - self.central_meridian), np.radians(lat)
+
+    def inverse(self, x, y):
+        return np.degrees(x) + self.central_meridian, np.degrees(y)
+
+class CylindricalStereographic(Projection):
+    # GMT Cyl_stere/lon0/lat1
+    def __init__(self, central_meridian=0.0, standard_parallel=0.0):
+        super().__init__(central_meridian)
+        self.cos_standard = np.cos(np.radians(standard_parallel))
+
+    def forward(self, lon, lat):
+        x = self.cos_standard * np.radians(np.asarray(lon) - self.central_meridian)
+        y = (1 + self.cos_standard) * np.tan(np.radians(lat) / 2)
+        return x, y
+
+    def inverse(self, x, y):
+        lon = np.degrees(np.asarray(x) / self.cos_standard) + self.central_meridian
+        lat = np.degrees(2 * np.arctan(np.asarray(y) / (1 + self.cos_standard)))
+        return lon, lat
+
+class WinkelTripel(Projection):
+    # GMT W, the inverse has no closed form and is solved with Newton's method
+    cos_standard = 2 / np.pi
+
+    def forward(self, lon, lat):
+        lam = np.radians(np.asarray(lon, dtype=np.float64) - self.central_meridian)
+        phi = np.radians(np.asarray(lat, dtype=np.float64))
+        return self.forward_radians(lam, phi)
+
+    def forward_radians(self, lam, phi):
+        alpha = np.arccos(np.clip(np.cos(phi) * np.cos(lam / 2), -1, 1))
+        sinc_alpha = np.where(alpha < 1e-12, 1.0, np.sin(alpha) / np.where(alpha < 1e-12, 1.0, alpha))
+
+        x = 0.5 * (lam * self.cos_standard + 2 * np.cos(phi) * np.sin(lam / 2) / sinc_alpha)
+        y = 0.5 * (phi + np.sin(phi) / sinc_alpha)
+        return x, y
+
+    def inverse(self, x, y, iterations=25, step=1e-7):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+
+        # start from the equirectangular position and refine with a finite difference Jacobian
+        lam = x / ((1 + self.cos_standard) / 2)
+        phi = np.clip(y, -np.pi / 2, np.pi / 2)
+        for _ in range(iterations):
+            fx, fy = self.forward_radians(lam, phi)
+            dx_dlam, dy_dlam = [(value - base) / step for value, base in zip(self.forward_radians(lam + step, phi), (fx, fy))]
+            dx_dphi, dy_dphi = [(value - base) / step for value, base in zip(self.forward_radians(lam, phi + step), (fx, fy))]
+
+            determinant = dx_dlam * dy_dphi - dx_dphi * dy_dlam
+            determinant = np.where(np.abs(determinant) < 1e-12, 1e-12, determinant)
+            ex, ey = fx - x, fy - y
+            lam = np.clip(lam - (dy_dphi * ex - dx_dphi * ey) / determinant, -1.5 * np.pi, 1.5 * np.pi)
+            phi = np.clip(phi - (dx_dlam * ey - dy_dlam * ex) / determinant, -np.pi / 2, np.pi / 2)
+
+        # positions outside the map area have no solution
+        fx, fy = self.forward_radians(lam, phi)
+        outside = (np.hypot(fx - x, fy - y) > 1e-6) | (np.abs(lam) > np.pi)
+        lon = np.where(outside, np.nan, np.degrees(lam) + self.central_meridian)
+        lat = np.where(outside, np.nan, np.degrees(phi))
+        return lon, lat
+
+def parse_projection(projection, region_to_plot):
+    # returns the projection and the map width in inches for a GMT projection string such
+    # as "W6i", "Q0/15c" or "Cyl_stere/30/-20/12c", None for projections that are not handled
+    parts = projection.split("/")
+    name, first = re.match(r"([A-Za-z_]+?)(-?[\d.]*[cip]?)$", parts[0]).groups()
+    values = [value for value in [first] + parts[1:] if value]
+    params = [float(value) for value in values[:-1]]
+    center = (region_to_plot[0] + region_to_plot[1]) / 2
+
+    if name == "W":
+        projection_model = WinkelTripel(params[0] if params else center)
+    elif name in ("Q", "Cyl_equid"):
+        projection_model = Equirectangular(params[0] if params else center)
+    elif name == "Cyl_stere":
+        projection_model = CylindricalStereographic(params[0] if params else center, params[1] if len(params) > 1 else 0.0)
+    else:
+        return None, None
+
+    return projection_model, projection_width_inches(projection)
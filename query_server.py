@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+import numpy as np
+from elevation_query import QueryEngine, great_circle
+from grid_provider import default_provider
+from regions import RegionIndex
+
+# local HTTP endpoint of the elevation query engine, with plain asyncio so it needs no web
+# framework. Every request is a JSON POST:
+#   /points    {"lon": [...], "lat": [...]}                  -> {"height": [...]}
+#   /profile   {"start": [lon, lat], "end": [lon, lat], "samples": 256}
+#   /stats     {"region": [west, east, south, north]} or {"continent": "africa"}
+# Points of the point and profile requests that arrive within BATCH_WINDOW of each other
+# are sampled together in one vectorized lookup
+
+BATCH_WINDOW = 0.005
+BATCH_POINTS = 1_000_000
+MAX_SAMPLES = 10000
+
+class PointBatcher:
+    # collects the points of concurrent requests and samples them in one call on a worker
+    # thread, each request gets its own slice of the heights back
+    def __init__(self, engine, window=BATCH_WINDOW, max_points=BATCH_POINTS):
+        self.engine = engine
+        self.window = window
+        self.max_points = max_points
+        self.pending = []
+        self.pending_points = 0
+        self.timer = None
+        self.batches = 0
+        self.batched_requests = 0
+
+    async def heights(self, lons, lats):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((np.asarray(lons, dtype=np.float64).ravel(), np.asarray(lats, dtype=np.float64).ravel(), future))
+        self.pending_points += self.pending[-1][0].size
+
+        if self.pending_points >= self.max_points:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        batch, self.pending, self.pending_points = self.pending, [], 0
+        if batch:
+            asyncio.ensure_future(self.sample(batch))
+
+    async def sample(self, batch):
+        lons = np.concatenate([lons for lons, _, _ in batch])
+        lats = np.concatenate([lats for _, lats, _ in batch])
+        try:
+            heights = await asyncio.get_running_loop().run_in_executor(None, self.engine.heights, lons, lats)
+        except Exception as error:
+            for _, _, future in batch:
+                future.set_exception(error)
+            return
+
+        self.batches += 1
+        self.batched_requests += len(batch)
+        for (_, _, future), part in zip(batch, np.split(heights, np.cumsum([lons.size for lons, _, _ in batch])[:-1])):
+            if not future.cancelled():
+                future.set_result(part)
+
+def json_heights(heights):
+    # NaN outside the grid is not valid JSON, it is sent as null
+    return [None if np.isnan(height) else float(height) for height in heights]
+
+class QueryServer:
+    def __init__(self, engine, window=BATCH_WINDOW):
+        self.engine = engine
+        self.batcher = PointBatcher(engine, window)
+
+    async def points(self, request):
+        lons, lats = request["lon"], request["lat"]
+        if len(lons) != len(lats):
+            raise ValueError("lon and lat must have the same length")
+
+        return {"height": json_heights(await self.batcher.heights(lons, lats))}
+
+    async def profile(self, request):
+        start, end = request["start"], request["end"]
+        if len(start) != 2 or len(end) != 2:
+            raise ValueError("start and end must be [lon, lat] points")
+
+        samples = min(int(request.get("samples", 256)), MAX_SAMPLES)
+        lons, lats, distances = great_circle(start, end, samples)
+        heights = await self.batcher.heights(lons, lats)
+        return {"lon": lons.tolist(), "lat": lats.tolist(), "distance_km": distances.tolist(), "height": json_heights(heights)}
+
+    async def stats(self, request):
+        loop = asyncio.get_running_loop()
+        if "continent" in request:
+            return await loop.run_in_executor(None, self.engine.continent_stats, request["continent"])
+
+        return await loop.run_in_executor(None, self.engine.region_stats, request["region"])
+
+    async def handle(self, path, body):
+        routes = {"/points": self.points, "/profile": self.profile, "/stats": self.stats}
+        if path not in routes:
+            return 404, {"error": f"unknown path {path}"}
+
+        try:
+            return 200, await routes[path](json.loads(body or b"{}"))
+        except (KeyError, ValueError, TypeError) as error:
+            return 400, {"error": f"bad request: {error!r}"}
+
+    async def connection(self, reader, writer):
+        # HTTP/1.1 with keep-alive, requests of a connection are answered in order
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                if method != "POST":
+                    status, response = 405, {"error": "only POST is supported"}
+                else:
+                    status, response = await self.handle(urlsplit(target).path, body)
+
+                data = json.dumps(response).encode()
+                reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}[status]
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(engine, host="127.0.0.1", port=8765, window=BATCH_WINDOW):
+    server = QueryServer(engine, window)
+    listener = await asyncio.start_server(server.connection, host, port)
+    print(f"elevation queries on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve elevation points, profiles and region statistics over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--resolution", default="10m", help="relief grid the queries are answered from, loaded for the whole globe")
+    parser.add_argument("--window", type=float, default=BATCH_WINDOW, help="seconds point requests are collected for before they are sampled together")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    engine = QueryEngine(default_provider().global_grid(args.resolution), RegionIndex())
+    print(f"indexed the {args.resolution} grid in {time.perf_counter() - started:.1f}s")
+
+    asyncio.run(serve(engine, args.host, args.port, args.window))
@@ -0,0 +1,106 @@
+import json
+import os
+import re
+import numpy as np
+from raster_store import STORE_DIR, INGEST_ROWS, open_raster, store_paths
+from lazy_import import is_available
+
+# GMT remote relief resolutions with their grid spacing in pixels per degree, coarsest first
+RELIEF_LEVELS = [("01d", 1), ("30m", 2), ("20m", 3), ("15m", 4), ("10m", 6), ("06m", 10), ("05m", 12), ("04m", 15), ("03m", 20), ("02m", 30), ("01m", 60), ("30s", 120), ("15s", 240)]
+
+# grids finer than a minute are only used when dask is installed to read them chunk by chunk
+FINEST_RELIEF = "15s" if is_available("dask") else "01m"
+
+def projection_width_inches(projection):
+    # map width from the end of a GMT projection string, e.g. "W6i" or "Cyl_stere/30/-20/12c"
+    match = re.search(r"([\d.]+)([cip]?)$", projection)
+    width, unit = float(match.group(1)), match.group(2) or "c"
+
+    return width / {"c": 2.54, "i": 1.0, "p": 72.0}[unit]
+
+def required_density(region_to_plot, projection, dpi=300):
+    # output pixels per degree of longitude the region is drawn at
+    return projection_width_inches(projection) * dpi / (region_to_plot[1] - region_to_plot[0])
+
+def relief_resolution(region_to_plot, projection, dpi=300, finest=FINEST_RELIEF):
+    # coarsest remote relief grid that still has a grid node for every output pixel
+    density = required_density(region_to_plot, projection, dpi)
+    for resolution, pixels_per_degree in RELIEF_LEVELS:
+        if pixels_per_degree >= density or resolution == finest:
+            return resolution
+
+    return RELIEF_LEVELS[-1][0]
+
+class RasterPyramid:
+    # levels of a texture halved in size down to min_width, built from the full resolution
+    # store once and memory mapped afterwards. level_for picks the coarsest level that
+    # still meets the pixel density of the figure a region is drawn into
+    def __init__(self, source_path, open_level, store_dir=STORE_DIR, min_width=500, **ingest_options):
+        self.source_path = source_path
+        self.open_level = open_level
+        self.store_dir = store_dir
+
+        base, self.metadata = open_raster(source_path, store_dir, **ingest_options)
+        self.levels = [base]
+
+        while self.levels[-1].shape[1] // 2 >= min_width:
+            self.levels.append(self.build_level(len(self.levels), self.levels[-1]))
+
+    def level_paths(self, index):
+        data_path, meta_path = store_paths(self.source_path, self.store_dir)
+        suffix = f"_level{index}"
+
+        return data_path.replace(".npy", suffix + ".npy"), meta_path.replace(".json", suffix + ".json")
+
+    def build_level(self, index, finer):
+        data_path, meta_path = self.level_paths(index)
+
+        # levels are rebuilt whenever the full resolution store was ingested again
+        if os.path.isfile(data_path) and os.path.isfile(meta_path):
+            with open(meta_path) as file:
+                if json.load(file) == self.metadata:
+                    return np.load(data_path, mmap_mode="r")
+
+        height, width = finer.shape[0] // 2, finer.shape[1] // 2
+        partial_path = data_path + ".partial"
+        coarser = np.lib.format.open_memmap(partial_path, mode="w+", dtype=finer.dtype, shape=(height, width) + finer.shape[2:])
+
+        # each output pixel is the mean of a 2x2 block, done in row blocks to bound memory
+        for row in range(0, height, INGEST_ROWS):
+            rows = min(INGEST_ROWS, height - row)
+            block = np.asarray(finer[2 * row:2 * (row + rows), :2 * width], dtype=np.float32)
+            block = block.reshape(rows, 2, width, 2, *finer.shape[2:]).mean(axis=(1, 3))
+            if np.issubdtype(finer.dtype, np.integer):
+                block = np.rint(block)
+            coarser[row:row + rows] = block.astype(finer.dtype)
+
+        coarser.flush()
+        del coarser
+        os.replace(partial_path, data_path)
+
+        with open(meta_path, "w") as file:
+            json.dump(self.metadata, file, indent=2)
+
+        return np.load(data_path, mmap_mode="r")
+
+    def density(self, index):
+        longitudes = self.metadata["longitude"]
+        return self.levels[index].shape[1] / (longitudes[1] - longitudes[0])
+
+    def select(self, region_to_plot, projection, dpi=300):
+        return self.select_density(required_density(region_to_plot, projection, dpi))
+
+    def select_density(self, density):
+        # coarsest level with at least density pixels per degree, the full resolution otherwise
+        for index in reversed(range(len(self.levels))):
+            if self.density(index) >= density:
+                return index
+
+        return 0
+
+    def level(self, index):
+        return self.open_level(self.levels[index], self.metadata)
+
+    def level_for(self, region_to_plot, projection, dpi=300):
+        index = self.select(region_to_plot, projection, dpi)
+        return index, self.level(index)
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import numpy as np
+from lazy_import import LazyModule, is_available
+
+xr = LazyModule("xarray")
+Image = LazyModule("PIL.Image")
+dask_array = LazyModule("dask.array")
+
+# the colour and displacement textures are decoded once into raw .npy files next to a
+# small json file with their lat/lon extent. The loaders memory map them, so opening a
+# texture costs the same at any resolution and only the pages a plot reads are loaded.
+# Values are stored as decoded, a scale and offset to apply on read are kept in the json
+STORE_DIR = "./dataset_vis/store"
+
+# rows written per block while ingesting, bounds the extra memory the ingest needs
+INGEST_ROWS = 1024
+
+def store_paths(source_path, store_dir=STORE_DIR):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(store_dir, name + ".npy"), os.path.join(store_dir, name + ".json")
+
+def source_signature(source_path):
+    stat = os.stat(source_path)
+    return {"source": os.path.abspath(source_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def is_ingested(source_path, store_dir=STORE_DIR, scale=1.0, offset=0.0, dtype=None):
+    data_path, meta_path = store_paths(source_path, store_dir)
+    if not os.path.isfile(data_path) or not os.path.isfile(meta_path):
+        return False
+
+    with open(meta_path) as file:
+        metadata = json.load(file)
+
+    # a changed source file or different ingest options make the stored copy stale
+    if metadata["signature"] != source_signature(source_path):
+        return False
+    if metadata["scale"] != scale or metadata["offset"] != offset:
+        return False
+
+    return dtype is None or metadata["dtype"] == np.dtype(dtype).str
+
+def ingest(source_path, store_dir=STORE_DIR, scale=1.0, offset=0.0, dtype=None):
+    os.makedirs(store_dir, exist_ok=True)
+    data_path, meta_path = store_paths(source_path, store_dir)
+
+    Image.MAX_IMAGE_PIXELS = None
+    image = np.asarray(Image.open(source_path))
+    dtype = np.dtype(dtype or image.dtype)
+
+    # written to a temporary name first so an interrupted ingest is never opened
+    partial_path = data_path + ".partial"
+    stored = np.lib.format.open_memmap(partial_path, mode="w+", dtype=dtype, shape=image.shape)
+    for row in range(0, image.shape[0], INGEST_ROWS):
+        stored[row:row + INGEST_ROWS] = image[row:row + INGEST_ROWS]
+    stored.flush()
+    del stored
+    os.replace(partial_path, data_path)
+
+    metadata = {
+        "signature": source_signature(source_path),
+        "shape": list(image.shape),
+        "dtype": dtype.str,
+        "latitude": [90, -90],
+        "longitude": [-180, 180],
+        "scale": scale,
+        "offset": offset,
+    }
+    with open(meta_path, "w") as file:
+        json.dump(metadata, file, indent=2)
+
+    return data_path
+
+def open_raster(source_path, store_dir=STORE_DIR, **ingest_options):
+    # returns the memory-mapped array and its metadata, ingesting the source on first use
+    if not is_ingested(source_path, store_dir, **ingest_options):
+        ingest(source_path, store_dir, **ingest_options)
+
+    data_path, meta_path = store_paths(source_path, store_dir)
+    with open(meta_path) as file:
+        metadata = json.load(file)
+
+    return np.load(data_path, mmap_mode="r"), metadata
+
+def as_color_map(rgb_array, metadata):
+    latitudes = np.linspace(*metadata["latitude"], rgb_array.shape[0])
+    longitudes = np.linspace(*metadata["longitude"], rgb_array.shape[1])
+
+    data_array = xr.DataArray(rgb_array, dims=('latitude', 'longitude', 'channel'), coords={'latitude': latitudes, 'longitude': longitudes, 'channel': ['red', 'green', 'blue']})
+
+    # transposing only changes the strides of the view, nothing is read
+    return data_array.transpose('channel', 'latitude', 'longitude')
+
+def open_color_map(source_path, store_dir=STORE_DIR):
+    return as_color_map(*open_raster(source_path, store_dir))
+
+def displacement_options(min_value=0, max_value=4000):
+    # the bump values stay uint8, a stored value v is offset + scale * v metres in the range [min_value, max_value]
+    return {"scale": (max_value - min_value) / 255.0, "offset": float(min_value), "dtype": np.uint8}
+
+def as_displacement_map(raw_image, metadata):
+    latitudes = np.linspace(*metadata["latitude"], raw_image.shape[0])
+    longitudes = np.linspace(*metadata["longitude"], raw_image.shape[1])
+
+    attrs = {"scale_factor": metadata["scale"], "add_offset": metadata["offset"]}
+    return xr.DataArray(raw_image, coords=[("lat", latitudes), ("lon", longitudes)], dims=["lat", "lon"], attrs=attrs)
+
+def rescale(block, scale, offset, below=None):
+    values = np.asarray(block, dtype=np.float32) * np.float32(scale) + np.float32(offset)
+    if below is not None:
+        values[values < below[0]] = below[1]
+    return values
+
+def displacement_region(displacement_map, region_to_plot, below=None):
+    # metres of the part of a displacement map inside a region, as float32. Only the subset
+    # is rescaled, a block of rows at a time, and values under below[0] are set to below[1]
+    # as pygmt.grdclip(below=below) would, so no full size float copy of the map is made.
+    # With dask installed the blocks are rescaled in parallel
+    west, east, south, north = region_to_plot
+    subset = displacement_map.sel(lon=slice(west, east), lat=slice(north, south))
+    scale, offset = displacement_map.attrs["scale_factor"], displacement_map.attrs["add_offset"]
+
+    values = np.empty(subset.shape, dtype=np.float32)
+    if is_available("dask"):
+        # each block is written into place, the blocks are never concatenated
+        blocks = dask_array.from_array(subset.data, chunks=(INGEST_ROWS, -1), name=False)
+        dask_array.store(blocks.map_blocks(rescale, scale, offset, below, dtype=np.float32), values, lock=False)
+    else:
+        for row in range(0, subset.shape[0], INGEST_ROWS):
+            values[row:row + INGEST_ROWS] = rescale(subset.values[row:row + INGEST_ROWS], scale, offset, below)
+
+    return xr.DataArray(values, coords=subset.coords, dims=subset.dims)
+
+def open_displacement_map(source_path, store_dir=STORE_DIR):
+    return as_displacement_map(*open_raster(source_path, store_dir, **displacement_options()))
+
+if __name__ == '__main__':
+    # one-time ingest step, the loaders also ingest missing or stale textures on first use
+    parser = argparse.ArgumentParser(description="Convert colour and displacement textures to the memory-mapped store")
+    parser.add_argument("--colour", nargs="*", default=[], help="colour map images")
+    parser.add_argument("--displacement", nargs="*", default=[], help="displacement (bump) map images")
+    parser.add_argument("--store", default=STORE_DIR, help="store directory")
+    args = parser.parse_args()
+
+    for source_path in args.colour:
+        print("ingested", source_path, "->", ingest(source_path, args.store))
+    for source_path in args.displacement:
+        print("ingested", source_path, "->", ingest(source_path, args.store, **displacement_options()))
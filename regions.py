@@ -0,0 +1,133 @@
+from collections import namedtuple
+import numpy as np
+
+# continents that can be clicked on in the global map: the region plotted on the detail
+# page, the DCW code highlighted on the globe, the info panel, and coarse outlines as
+# lists of (lon, lat) polygons used to decide which continent a position belongs to
+Region = namedtuple("Region", ["name", "code", "region_to_plot", "info_file", "polygons"])
+
+REGIONS = [
+    Region("africa", "AF", [-20, 60, -40, 40], "africa_info.png", [
+        [(-5.9, 35.8), (-6.8, 34.2), (-9.5, 32.5), (-9.8, 29.8), (-13.2, 27.7), (-14.5, 26), (-17, 21), (-16.1, 18.5), (-16.5, 16.5), (-17.6, 14.7), (-16.8, 13.2), (-15, 10.9), (-13.3, 9), (-11.5, 6.9), (-7.5, 4.4), (-4, 5.2), (-2, 4.8), (1.2, 6.1), (3.4, 6.4), (6, 4.3), (8.3, 4.6), (9.7, 4), (9.5, 1), (8.8, -0.7), (11.8, -4), (12.2, -6), (13.2, -8.8), (12.5, -13.5), (11.8, -17.2), (14.5, -22.9), (15, -26.7), (16.5, -28.6), (18, -32.5), (18.4, -34.3), (20, -34.8), (22, -34.2), (25.6, -34), (27.5, -33.3), (31, -29.8), (32.8, -28), (32.6, -25.9), (35.3, -24.5), (35.5, -22), (34.8, -19.8), (37, -17.8), (40.6, -15), (40.4, -10.5), (39.5, -7), (39.3, -5), (40.5, -2.5), (42, -0.8), (45.3, 2), (47.5, 4), (49.5, 6), (51, 10.4), (51.2, 11.8), (44.5, 10.4), (43.3, 11.8), (42.4, 13), (39.7, 15.5), (38.5, 18), (37.3, 21), (35.6, 23.9), (33.8, 27), (32.5, 29.9), (32.3, 31.3), (29.9, 31.2), (25.2, 31.6), (23, 32.6), (20.1, 32.3), (18.9, 30.4), (16, 31.2), (15.2, 32.4), (13.2, 32.9), (11.4, 33.2), (10.1, 33.9), (10.8, 34.8), (11, 35.5), (11.1, 37.1), (9.8, 37.3), (7, 37), (3, 36.9), (1, 36.5), (-2.2, 35.1)],
+        [(49.3, -12), (50.5, -15.5), (49.8, -17), (47.1, -24.9), (45.2, -25.5), (43.7, -23.5), (44.4, -20), (44, -17), (46.3, -15.7), (48, -13.5)],
+    ]),
+    Region("europe", "EU", [-10, 40, 30, 70], "europe_info.png", [
+        [(-9.5, 37), (-9.5, 43.2), (-1.8, 43.4), (-1.2, 46), (-4.8, 48.4), (1.6, 50.9), (4, 51.8), (8.5, 53.8), (8.2, 57.1), (10.6, 57.7), (7, 58), (5, 60), (5, 62), (10, 64), (14, 68), (18, 70), (25, 71.2), (31, 70), (41, 67), (44, 68.5), (60, 69), (60, 55), (52, 51), (48, 46), (40, 47), (37, 45), (40, 41), (28, 41), (26, 40.5), (24, 38), (23, 36.5), (21, 38.5), (19.5, 40), (18.5, 40.1), (17, 39), (16.2, 38), (15.6, 40), (14.3, 40.8), (12.5, 41.5), (11, 42.4), (10.2, 43.8), (9, 44.3), (7.5, 43.7), (6, 43), (4.5, 43.4), (3, 43), (3.2, 42), (0, 39.5), (-0.5, 38.3), (-2, 36.7), (-5.5, 36)],
+        [(-5.7, 50), (1.4, 51.1), (1.7, 52.7), (0.2, 53.5), (-1.4, 55), (-2, 57.6), (-3, 58.7), (-5, 58.6), (-6.2, 57.5), (-5.6, 55.3), (-4.8, 54.6), (-3.3, 54), (-4.6, 53.3), (-4.2, 52.3), (-5.3, 51.8), (-4, 51.2)],
+        [(-10.3, 51.6), (-6.2, 52.2), (-6, 53.5), (-5.5, 54.6), (-7.2, 55.4), (-8.6, 55), (-10.2, 54.2), (-9.9, 53.3)],
+        [(-24.5, 65.5), (-22, 66.4), (-16, 66.5), (-13.5, 65.3), (-15, 64.3), (-18.5, 63.4), (-22.5, 63.8)],
+        [(12.4, 38.2), (15.6, 38.3), (15.1, 36.7), (12.5, 37.6)],
+        [(8.2, 41), (9.8, 41.2), (9.7, 39.2), (9, 38.9), (8.4, 39)],
+        [(8.6, 42.9), (9.4, 43), (9.6, 42.2), (9.2, 41.4), (8.6, 41.7)],
+        [(23.5, 35.6), (26.3, 35.3), (26, 35), (24, 35.2)],
+    ]),
+    Region("asia", "AS", [60, 150, 0, 60], "asia_info.png", [
+        [(26, 40), (28, 41), (40, 41), (37, 45), (40, 47), (48, 46), (52, 51), (60, 55), (60, 69), (70, 73), (80, 73.5), (100, 78), (113, 74), (130, 71.5), (140, 72), (160, 69.5), (180, 70), (180, 65), (170, 60), (163, 58), (156.7, 51), (155.5, 55), (156, 57.5), (151, 59.3), (143, 59.3), (138, 56), (141, 53), (140.5, 48.5), (138, 46), (135, 43.3), (133, 42.8), (130.7, 42.3), (129.8, 41), (128.4, 38.6), (129.5, 37), (129.3, 35.2), (126.3, 34.5), (126.1, 37.7), (124.3, 39.9), (121.5, 39), (122.5, 37.4), (120.3, 36), (119.2, 34.5), (120.8, 32.6), (121.9, 30.9), (122, 29.9), (121.5, 28.5), (119.5, 26.2), (117.5, 23.8), (116.5, 22.9), (113.5, 22.2), (110.5, 21.2), (108, 21.5), (106.6, 20.7), (105.7, 19), (106.6, 17.5), (108.7, 15.3), (109.3, 13.8), (109.2, 11.6), (106.7, 10.4), (105, 8.6), (104.7, 10.4), (103.5, 10.5), (102.5, 12), (100.9, 12.7), (100, 13.4), (99.2, 10.4), (100.3, 8.4), (102.3, 6.2), (103.4, 4.1), (104.3, 1.4), (103.6, 1.2), (101.3, 2.8), (100.4, 5.4), (98.3, 8), (98.5, 12), (97.6, 16.5), (94.3, 16), (92.3, 20.7), (91.8, 22.3), (88.8, 21.6), (86.9, 21.5), (84.8, 19.3), (82.3, 16.6), (80.1, 15.5), (80.2, 13), (79.9, 10.3), (78.2, 8.9), (77.5, 8.1), (76.3, 9.5), (74.8, 12.8), (73.4, 16), (72.7, 19), (72.6, 21.1), (70, 20.8), (68.5, 23.5), (67, 24.8), (61.5, 25.2), (57.3, 25.8), (56.4, 27.1), (54, 26.7), (51.5, 27.8), (50.3, 30), (48.5, 30), (48, 29.3), (49.8, 26.5), (50.8, 25), (51.6, 24.2), (54, 24.2), (55.6, 25.5), (56.4, 26.3), (56.3, 24.5), (58.6, 23.6), (59.8, 22.4), (57.8, 18.9), (55, 17), (52.2, 15.6), (48.7, 14), (45, 12.8), (43.4, 12.6), (42.7, 15.5), (41, 19), (39, 21.5), (37, 25), (35, 28), (34.9, 29.5), (34.2, 31.3), (35, 32.8), (35.9, 35.3), (36.2, 36.6), (34, 36.3), (30.6, 36.8), (28, 36.7), (26.7, 38.5), (26.2, 39.5)],
+        [(130, 31), (140, 35), (142, 40), (145, 44), (141, 45), (139, 38), (130, 34)],
+        [(79.9, 9.8), (80.6, 9.5), (81.3, 8.5), (81.9, 7.3), (81.6, 6.3), (80.6, 5.9), (80, 6.2), (79.7, 7.2), (79.8, 8.2)],
+        [(120.1, 23), (121, 25.3), (122, 25), (121.4, 22.5), (120.8, 21.9)],
+        [(95.3, 5.6), (97.5, 5.2), (100.4, 2.2), (104, -1), (106, -3), (105.8, -5.8), (104.5, -5.9), (102.3, -4), (100.3, -1), (98.7, 1.7), (96, 4)],
+        [(105.2, -6.8), (106, -5.9), (108.3, -6.2), (110.4, -6.9), (112.7, -6.9), (114.5, -7.7), (114.4, -8.7), (110, -8.1), (106.5, -7.4)],
+        [(108.9, 1.6), (111.5, 2.5), (114, 4.6), (116.7, 7), (119.3, 5.3), (118, 1), (118.9, 1), (116.5, -2), (116, -4), (114.5, -4), (111, -3), (110, -1.8)],
+        [(118.8, -3), (119.5, 0.2), (120.6, 1.3), (125, 1.6), (124.6, 0.4), (121.5, 0.5), (123.3, -0.9), (121.4, -1.9), (122.7, -4.6), (121, -4.5), (120.4, -5.5), (119.4, -5.5)],
+        [(120, 18.5), (122.5, 18.5), (126, 7), (122, 7)],
+    ]),
+    Region("north_america", "NA", [-170, -50, 10, 80], "north_america_info.png", [
+        [(-168, 66), (-162, 70), (-141, 70), (-125, 70), (-95, 72), (-80, 74), (-62, 68), (-55, 52), (-66, 44), (-70, 41), (-76, 35), (-81, 31), (-81.4, 30.7), (-80.6, 28.4), (-80, 26.7), (-80.1, 25.3), (-81.1, 25.1), (-81.8, 26.1), (-82.7, 27.9), (-82.8, 29), (-84, 30.1), (-85.4, 29.7), (-86.5, 30.4), (-89.5, 30.2), (-89.4, 29), (-90.5, 29.1), (-93.8, 29.7), (-97.3, 27.7), (-97.5, 25), (-97.7, 22), (-96, 19.3), (-94.5, 18.2), (-92, 18.6), (-90.5, 19.6), (-90.3, 21), (-87, 21.5), (-87.5, 19), (-88.3, 18.5), (-88.2, 15.8), (-86, 16), (-84, 15.8), (-83.2, 15), (-83.7, 11), (-83.4, 10.4), (-81.5, 8.9), (-79.9, 9.4), (-77.4, 8.7), (-77.9, 7.2), (-78.4, 8.3), (-79.5, 8.85), (-80.4, 8.2), (-80, 7.4), (-81.5, 7.6), (-83.6, 8.4), (-85.8, 10.3), (-85.7, 11.1), (-87.6, 13), (-91.5, 14), (-94.5, 16.1), (-96.5, 15.7), (-98.5, 16.3), (-101.5, 17.6), (-105.5, 20), (-105.3, 21.5), (-109.5, 23), (-112, 26.5), (-114, 28), (-117.1, 32.5), (-118.4, 33.8), (-120.6, 34.5), (-121.9, 36.6), (-122.5, 37.8), (-124, 40), (-124, 48), (-130, 55), (-140, 60), (-152, 58), (-165, 54), (-160, 59), (-166, 62)],
+        [(-73, 78), (-60, 82), (-30, 83.5), (-18, 81), (-20, 70), (-40, 65), (-44, 60), (-48.5, 61), (-52.5, 64.5), (-55, 70), (-58, 75.5), (-66, 76)],
+        [(-84.9, 21.9), (-83.2, 22.9), (-82.3, 23.2), (-80.2, 23.1), (-77.5, 21.8), (-75.6, 21.1), (-74.1, 20.2), (-74.5, 19.9), (-77.7, 19.8), (-80.5, 22), (-82, 22.3), (-84, 21.6)],
+        [(-74.5, 18.4), (-72.8, 19.9), (-70, 19.8), (-68.3, 18.6), (-70, 18.2), (-71.5, 17.6), (-74.4, 18)],
+        [(-67.3, 18.5), (-65.6, 18.4), (-65.6, 18), (-67.2, 17.9)],
+    ]),
+    Region("south_america", "SA", [-90, -30, -60, 20], "south_america_info.png", [
+        [(-77.5, 8), (-72, 12), (-62, 10.5), (-51, 4), (-35, -5), (-39, -13), (-41, -22), (-48, -26), (-53, -34), (-58, -38), (-65, -41), (-65, -47), (-69, -52), (-68, -55), (-74, -53), (-74, -46), (-72, -37), (-71, -30), (-70, -18), (-76, -14), (-81, -6), (-80, 0), (-78, 2), (-77, 4)],
+    ]),
+    Region("australia", "AU", [100, 160, -50, -10], "australia_info.png", [
+        [(113, -22), (114, -26), (115, -34), (118, -35), (124, -33), (131, -31.5), (138, -35), (141, -38), (146, -39), (150, -37), (153, -30), (153, -25), (146, -19), (142, -10.5), (141, -17), (136, -12), (130, -11), (126, -14), (122, -18), (117, -20)],
+        [(144.5, -40.5), (148.5, -40.5), (148, -43.5), (146, -43.5)],
+        [(131, -1.2), (134, -0.8), (138, -1.6), (141, -2.6), (144.5, -3.8), (145.8, -5), (147.9, -6), (148, -8), (150.5, -10.5), (149, -10.5), (147, -9.9), (146, -8), (143.5, -9), (141, -9.1), (138.5, -8.3), (137.5, -5), (135, -4.3), (133, -4), (132, -2.8)],
+        [(172.7, -34.4), (174.3, -35.2), (175.8, -36.7), (178.5, -37.7), (177.9, -39.2), (176.8, -40.2), (175.3, -41.6), (174.5, -41.4), (174.9, -40.3), (173.8, -39.3), (174.6, -38), (174.5, -36.9), (173, -35.2)],
+        [(172.7, -40.5), (174.3, -41.2), (173.9, -42.3), (172.7, -43.8), (171.2, -44.5), (170.8, -45.9), (169.3, -46.7), (166.5, -46), (166.8, -45.3), (168.3, -44), (170.8, -42.8), (171.5, -41.7), (172.1, -40.6)],
+    ]),
+    Region("antarctica", "AN", [-180, 180, -90, -60], "antarctica_info.png", [
+        [(-180, -90), (180, -90), (180, -78), (165, -72), (140, -66), (100, -66), (70, -67), (30, -69), (0, -70), (-30, -75), (-60, -73), (-58, -64), (-65, -66), (-75, -72), (-100, -73), (-140, -75), (-160, -78), (-180, -78)],
+    ]),
+]
+
+def points_in_polygon(lons, lats, polygon):
+    # even-odd rule, one pass over the polygon edges for all points at once
+    polygon = np.asarray(polygon, dtype=np.float64)
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+
+    inside = np.zeros(lons.shape, dtype=bool)
+    for edge in range(len(polygon)):
+        crosses = (y0[edge] > lats) != (y1[edge] > lats)
+        if y1[edge] != y0[edge]:
+            x_cross = x0[edge] + (lats - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+            inside ^= crosses & (lons < x_cross)
+
+    return inside
+
+def grow_regions(buckets):
+    # empty cells next to a region take its index, neighbours wrap around in longitude only
+    padded = np.pad(buckets, 1, mode="wrap")
+    padded[0], padded[-1] = -1, -1
+
+    grown = buckets.copy()
+    for neighbour in (padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]):
+        fill = (grown < 0) & (neighbour >= 0)
+        grown[fill] = neighbour[fill]
+
+    return grown
+
+class RegionIndex:
+    # grid buckets over the globe holding the index of the region that covers each cell,
+    # built once from the polygons. Looking up a position is a single array access and
+    # whole rasters of points are classified with one fancy-indexing operation. Cells up to
+    # tolerance degrees off the coarse outlines, such as coastal towns, go to the nearest region
+    def __init__(self, regions=REGIONS, cell_size=0.25, tolerance=1.0):
+        self.regions = regions
+        self.cell_size = cell_size
+        self.masks = {}
+
+        columns, rows = int(round(360 / cell_size)), int(round(180 / cell_size))
+        lons = -180 + (np.arange(columns) + 0.5) * cell_size
+        lats = -90 + (np.arange(rows) + 0.5) * cell_size
+
+        self.buckets = np.full((rows, columns), -1, dtype=np.int8)
+        for index, region in enumerate(regions):
+            for polygon in region.polygons:
+                # only the cells inside the bounding box of the polygon are tested
+                points = np.asarray(polygon)
+                col0, col1 = np.searchsorted(lons, [points[:, 0].min(), points[:, 0].max()])
+                row0, row1 = np.searchsorted(lats, [points[:, 1].min(), points[:, 1].max()])
+                lon_cells, lat_cells = np.meshgrid(lons[col0:col1], lats[row0:row1])
+
+                inside = points_in_polygon(lon_cells, lat_cells, polygon)
+                self.buckets[row0:row1, col0:col1][inside] = index
+
+        for _ in range(int(round(tolerance / cell_size))):
+            self.buckets = grow_regions(self.buckets)
+
+    def classify(self, lons, lats):
+        # index into regions for each position, -1 where no region covers it
+        lons = (np.asarray(lons, dtype=np.float64) + 180) % 360 - 180
+        lats = np.clip(np.asarray(lats, dtype=np.float64), -90, 90)
+
+        rows = np.minimum(((lats + 90) / self.cell_size).astype(np.intp), self.buckets.shape[0] - 1)
+        cols = np.minimum(((lons + 180) / self.cell_size).astype(np.intp), self.buckets.shape[1] - 1)
+        return self.buckets[rows, cols]
+
+    def region_at(self, lon, lat):
+        index = int(self.classify(lon, lat))
+        return self.regions[index] if index >= 0 else None
+
+    def mask(self, longitudes, latitudes):
+        # region index raster for a grid with these coordinates, cached for reuse by overlays
+        key = (longitudes[0], longitudes[-1], len(longitudes), latitudes[0], latitudes[-1], len(latitudes))
+        if key not in self.masks:
+            lons, lats = np.meshgrid(longitudes, latitudes)
+            self.masks[key] = self.classify(lons, lats)
+
+        return self.masks[key]
@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from raster_store import as_color_map, as_displacement_map, displacement_options, displacement_region
+from raster_pyramid import RasterPyramid, relief_resolution, required_density
+from grid_provider import GMT_LOCK, default_provider
+from hillshade import SUN_AZIMUTH, SUN_ALTITUDE, relief_image, relief_intensity, shading_image
+from regions import REGIONS
+from picking import map_size
+from lazy_import import LazyModule
+
+pygmt = LazyModule("pygmt")
+
+# the plots of both visualizers, free of any Qt code so they run the same in the GUI
+# render worker, the perspective sweep processes and the headless batch renderer
+
+def largest_texture(paths):
+    # the first of the textures, largest first, that is on disk. The 10k bump map is a
+    # separate download, without it the largest one shipped in dataset_vis is used
+    return next((path for path in paths if os.path.isfile(path)), paths[-1])
+
+COLOR_MAP_FILE = largest_texture([
+    "./dataset_vis/dataset/colour_dataset/8081_earthmap4k.jpg",
+    "./dataset_vis/dataset/colour_dataset/8081_earthmap2k.jpg",
+    "./dataset_vis/dataset/colour_dataset/earthmap1k.jpg",
+])
+DISPLACEMENT_MAP_FILE = largest_texture([
+    "./dataset_vis/dataset/displacement_dataset/8081_earthbump10k.jpg",
+    "./dataset_vis/dataset/displacement_dataset/8081_earthbump4k.jpg",
+    "./dataset_vis/dataset/displacement_dataset/8081_earthbump2k.jpg",
+    "./dataset_vis/dataset/displacement_dataset/earthbump1k.jpg",
+])
+
+GLOBAL_REGION = [-180, 180, -90, 90]
+GLOBAL_PROJECTION = "W6i"
+REGION_PROJECTION = "Cyl_stere/30/-20/12c"
+PERSPECTIVE_PROJECTION = "M15c"
+
+PAGE_CMAP = "geo"
+
+# blank margin around the maps that can be picked, in inches. It is wider than the frame
+# annotations, so the cropped figure is the map area with this margin on every side and
+# ViewTransform finds the map in it whatever sides are annotated
+MAP_MARGIN = 0.75
+
+# first pass of the progressive renders: a low dpi image of a decimated 10m grid or a
+# coarse texture level, shown while the full quality image is rendered
+PREVIEW_DPI = 60
+PREVIEW_RESOLUTION = "10m"
+
+def load_color_map():
+    # pyramid of memory-mapped levels of the colour map, the JPEG is only decoded by the one-time ingest
+    return RasterPyramid(COLOR_MAP_FILE, as_color_map)
+
+def load_displacement_map():
+    # pyramid of memory-mapped uint8 levels of the displacement map, rescaled to [0, 4000] metres per region by displacement_region
+    return RasterPyramid(DISPLACEMENT_MAP_FILE, as_displacement_map, **displacement_options())
+
+def map_canvas(fig, projection, region_to_plot):
+    # white rectangle of the map area and its margin, drawn first so GMT crops the figure to it
+    width, height = map_size(projection, region_to_plot)
+    fig.shift_origin(xshift=f"-{MAP_MARGIN}i", yshift=f"-{MAP_MARGIN}i")
+    fig.plot(x=[0, 1, 1, 0], y=[0, 0, 1, 1], close=True, fill="white", region=[0, 1, 0, 1], projection=f"X{width + 2 * MAP_MARGIN}i/{height + 2 * MAP_MARGIN}i")
+    fig.shift_origin(xshift=f"{MAP_MARGIN}i", yshift=f"{MAP_MARGIN}i")
+
+def render_map(output_path, grid, projection, region_to_plot, dpi=300):
+    # plots a 2D map of the region specified
+    fig = pygmt.Figure()
+    map_canvas(fig, projection, region_to_plot)
+    fig.grdimage(grid=grid, cmap="geo", projection=projection, region = region_to_plot, frame=True)
+    fig.savefig(output_path, dpi=dpi)
+
+def render_grid_map(output_path, resolution, projection, region_to_plot, dpi=300):
+    # render_map of the relief grid, taken from the grid provider by the render job
+    render_map(output_path, default_provider().grid(resolution, region_to_plot), projection, region_to_plot, dpi)
+
+def render_relief_map(output_path, resolution, projection, region_to_plot, dpi=300, sun=(SUN_AZIMUTH, SUN_ALTITUDE)):
+    # the relief is coloured and shaded by hillshade.py, GMT only draws the image
+    image = relief_image(resolution, region_to_plot, "geo", True, *sun)
+
+    fig = pygmt.Figure()
+    map_canvas(fig, projection, region_to_plot)
+    fig.grdimage(image, projection=projection, region = region_to_plot, frame=True)
+    fig.savefig(output_path, dpi=dpi)
+
+def render_perspective(output_path, grid, region_to_plot, perspective, shading, contourpen, dpi=300):
+    frame =  ["xa1f0.25","ya1f0.25", "z2000+lmeters", "wSEnZ"]
+
+    pygmt.makecpt(
+            cmap='geo',
+            series=f'-6000/4000/100',
+            continuous=True
+        )
+
+    fig = pygmt.Figure()
+    fig.grdview(
+        grid=grid,
+        region=region_to_plot + [-6000, 4000],
+        perspective=perspective,
+        frame=frame,
+        projection=PERSPECTIVE_PROJECTION,
+        zsize="4c",
+        surftype="i",
+        shading=shading,
+        cmap = "geo",
+        contourpen=contourpen,
+
+    )
+    fig.basemap(
+        perspective=True,
+        rose="jTL+w3c+l+o-2c/-1c" #map directional rose at the top left corner
+    )
+
+    fig.colorbar(perspective=True, frame=["a2000", "x+l'Elevation in (m)'", "y+lm"])
+    fig.savefig(output_path, crop=True, dpi=dpi)
+
+def render_perspective_bump(output_path, grid, region_to_plot, perspective, dpi=300):
+    # 3D view of the displacement map of the scientific visualizer, clipped to remove values below sea level.
+    # grid is a uint8 level of the displacement map, only the region drawn is turned into metres
+    render_perspective(output_path, displacement_region(grid, region_to_plot, below=[1, -10]), region_to_plot, perspective, 0, "1p", dpi)
+
+def render_perspective_relief(output_path, resolution, region_to_plot, perspective, dpi=300, sun=(SUN_AZIMUTH, SUN_ALTITUDE)):
+    # 3D view of the relief grid of the educational visualizer, shaded with the precomputed
+    # hillshade instead of gradients worked out by grdview. It is handed over as a grid file
+    grid = default_provider().grid(resolution, region_to_plot)
+    with tempfile.TemporaryDirectory(prefix="shading-") as directory:
+        shading = os.path.join(directory, "intensity.nc")
+        relief_intensity(resolution, region_to_plot, *sun).to_netcdf(shading)
+        render_perspective(output_path, grid, region_to_plot, perspective, shading, "0.1p", dpi)
+
+def render_isocontours(output_path, image_grid, contour_grid, region_to_plot, contour_interval, annotation, dpi=300):
+    fig = pygmt.Figure()
+
+    fig.grdimage(
+        grid=image_grid,
+        cmap="geo",
+        projection=REGION_PROJECTION,
+        frame=True,
+        region=region_to_plot,
+    )
+
+    fig.grdcontour(
+        grid=contour_grid,
+        interval=contour_interval,
+        annotation=annotation,
+        frame="a",
+        projection=REGION_PROJECTION,
+        region=region_to_plot,
+    )
+
+    fig.savefig(output_path, dpi=dpi)
+
+def render_isocontours_texture(output_path, color_map, resolution, region_to_plot, contour_interval, dpi=300):
+    # relief contours over the colour map
+    contours = default_provider().clipped(resolution, region_to_plot, [1, 0])
+    render_isocontours(output_path, color_map, contours, region_to_plot, contour_interval, 500, dpi)
+
+def render_isocontours_relief(output_path, resolution, region_to_plot, contour_interval, dpi=300):
+    # relief contours over the relief grid in the colours grdimage would give it
+    grid = default_provider().grid(resolution, region_to_plot)
+    render_isocontours(output_path, relief_image(resolution, region_to_plot, "geo", False), grid, region_to_plot, contour_interval, 1000, dpi)
+
+def preview_grid(region_to_plot, projection):
+    # the 10m relief thinned out to the density of the preview image
+    return default_provider().decimated(PREVIEW_RESOLUTION, region_to_plot, required_density(region_to_plot, projection, PREVIEW_DPI))
+
+def render_grid_map_preview(output_path, projection, region_to_plot):
+    render_map(output_path, preview_grid(region_to_plot, projection), projection, region_to_plot, PREVIEW_DPI)
+
+def render_perspective_bump_preview(output_path, grid, region_to_plot, perspective):
+    # grid is a coarse level of the displacement map
+    render_perspective_bump(output_path, grid, region_to_plot, perspective, PREVIEW_DPI)
+
+def render_perspective_relief_preview(output_path, region_to_plot, perspective):
+    grid = preview_grid(region_to_plot, PERSPECTIVE_PROJECTION)
+    render_perspective(output_path, grid, region_to_plot, perspective, True, "0.1p", PREVIEW_DPI)
+
+def render_continent_page(output_path, region_to_plot, continent_code, info_file, resolution="10m", sun=(SUN_AZIMUTH, SUN_ALTITUDE)):
+    # info panel, globe with the continent highlighted and a shaded relief map of it
+    fig = pygmt.Figure()
+
+    fig.image(imagefile = info_file)
+
+    fig.shift_origin(yshift="-2*h-1c")
+
+    fig.coast( region="d", projection="H10c", land="gray", water="white", frame="afg", dcw=[ "="+continent_code+"+gred3" ] )
+
+    fig.shift_origin(xshift="w+3c")
+    fig.grdimage(relief_image(resolution, region_to_plot, PAGE_CMAP, True, *sun), projection=REGION_PROJECTION, region = region_to_plot, frame=True)
+
+    fig.savefig(output_path)
+
+# layers of the layered views, each rendered on its own. Geographic layers draw the canvas
+# and frame of the map they go on so they crop to the same image, panels are transparent
+
+def render_colorbar_layer(output_path, resolution, region_to_plot, dpi=300):
+    # colour scale of a relief map drawn with the geo master table, which grdimage stretches to the range of the grid
+    grid = default_provider().grid(resolution, region_to_plot)
+    pygmt.makecpt(cmap="geo", series=[float(grid.min()), float(grid.max())])
+
+    fig = pygmt.Figure()
+    fig.colorbar(position="x0/0+w12c/0.5c+h", frame=["x+lelevation", "y+lm"])
+    fig.savefig(output_path, dpi=dpi, transparent=True)
+
+def render_globe_layer(output_path, dpi=300):
+    fig = pygmt.Figure()
+    fig.coast( region="d", projection="H10c", land="gray", water="white", frame="afg")
+    fig.savefig(output_path, dpi=dpi)
+
+def render_highlight_layer(output_path, continent_code, dpi=300):
+    # the continent in red on a transparent globe, drawn over the globe layer
+    fig = pygmt.Figure()
+    fig.coast( region="d", projection="H10c", frame="afg", dcw=[ "="+continent_code+"+gred3" ] )
+    fig.savefig(output_path, dpi=dpi, transparent=True)
+
+def render_relief_layer(output_path, region_to_plot, resolution="10m", dpi=300):
+    fig = pygmt.Figure()
+    map_canvas(fig, REGION_PROJECTION, region_to_plot)
+    fig.grdimage(relief_image(resolution, region_to_plot, PAGE_CMAP, False), projection=REGION_PROJECTION, region = region_to_plot, frame=True)
+    fig.savefig(output_path, dpi=dpi)
+
+def render_shading_layer(output_path, region_to_plot, resolution="10m", dpi=300, sun=(SUN_AZIMUTH, SUN_ALTITUDE)):
+    # gray hillshade of the relief with the illumination of grdimage shading=True
+    fig = pygmt.Figure()
+    map_canvas(fig, REGION_PROJECTION, region_to_plot)
+    fig.grdimage(shading_image(resolution, region_to_plot, *sun), projection=REGION_PROJECTION, region = region_to_plot, frame=True)
+    fig.savefig(output_path, dpi=dpi)
+
+# pyramids of a batch render process, opened by the first job that needs them
+opened_color_map = None
+opened_displacement_map = None
+
+def batch_color_map():
+    global opened_color_map
+    if opened_color_map is None:
+        opened_color_map = load_color_map()
+
+    return opened_color_map
+
+def batch_displacement_map():
+    global opened_displacement_map
+    if opened_displacement_map is None:
+        opened_displacement_map = load_displacement_map()
+
+    return opened_displacement_map
+
+def render_to_bytes(render_function, *args):
+    # PNG data of a render. GMT can only save a figure to a file, so each render gets a
+    # temporary directory of its own that is gone again once the data is read back
+    with tempfile.TemporaryDirectory(prefix="render-") as directory:
+        output_path = os.path.join(directory, "figure.png")
+        with GMT_LOCK:
+            render_function(output_path, *args)
+
+        with open(output_path, "rb") as file:
+            return file.read()
+
+def render_job(output_path, job):
+    # renders one manifest job with the data the visualizer of its style would use
+    mode = job["mode"]
+    style = job.get("style", "scientific")
+    region_to_plot = list(job.get("region", GLOBAL_REGION))
+    dpi = job.get("dpi", 300)
+    sun = tuple(job.get("sun", (SUN_AZIMUTH, SUN_ALTITUDE)))
+
+    if mode == "global" or mode == "region":
+        projection = job.get("projection", GLOBAL_PROJECTION if mode == "global" else REGION_PROJECTION)
+        if mode == "region" and style == "educational":
+            render_relief_map(output_path, "10m", projection, region_to_plot, dpi, sun)
+        else:
+            _, grid = batch_color_map().level_for(region_to_plot, projection, dpi)
+            render_map(output_path, grid, projection, region_to_plot, dpi)
+    elif mode == "perspective":
+        perspective = list(job.get("perspective", [-120, 30]))
+        if style == "educational":
+            render_perspective_relief(output_path, relief_resolution(region_to_plot, PERSPECTIVE_PROJECTION, dpi), region_to_plot, perspective, dpi, sun)
+        else:
+            _, grid = batch_displacement_map().level_for(region_to_plot, PERSPECTIVE_PROJECTION, dpi)
+            render_perspective_bump(output_path, grid, region_to_plot, perspective, dpi)
+    elif mode == "isocontours":
+        contour_interval = job.get("contour_interval", 250)
+        resolution = relief_resolution(region_to_plot, REGION_PROJECTION, dpi)
+        if style == "educational":
+            render_isocontours_relief(output_path, resolution, region_to_plot, contour_interval, dpi)
+        else:
+            _, color_map = batch_color_map().level_for(region_to_plot, REGION_PROJECTION, dpi)
+            render_isocontours_texture(output_path, color_map, resolution, region_to_plot, contour_interval, dpi)
+    elif mode == "continent":
+        region = next(region for region in REGIONS if region.name == job["continent"])
+        render_continent_page(output_path, region.region_to_plot, region.code, region.info_file, sun=sun)
+    else:
+        raise ValueError(f"unknown render mode {mode}")
+
+def run_job(job):
+    # runs in a batch render process, returns the seconds the job took. The image is
+    # written next to the output and moved into place once it is complete
+    started = time.perf_counter()
+
+    output_path = job["output"]
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    root, extension = os.path.splitext(output_path)
+    partial_path = root + ".partial" + extension
+
+    render_job(partial_path, job)
+    os.replace(partial_path, output_path)
+
+    return time.perf_counter() - started
+
+def run_manifest(jobs, workers=None, report_path=None):
+    # renders all jobs of a manifest across a pool of processes and reports the time each one took
+    started = time.perf_counter()
+    report = []
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+        futures = [(job, executor.submit(run_job, job)) for job in jobs]
+
+        for job, future in futures:
+            try:
+                seconds = future.result()
+            except Exception as error:
+                print(f"{job['output']}: {job['mode']} failed - {error}")
+                report.append({"output": job["output"], "mode": job["mode"], "error": str(error)})
+                continue
+
+            print(f"{job['output']}: {job['mode']} {seconds:.1f}s")
+            report.append({"output": job["output"], "mode": job["mode"], "seconds": seconds})
+
+    failed = sum("error" in entry for entry in report)
+    print(f"{len(jobs) - failed} jobs rendered, {failed} failed in {time.perf_counter() - started:.1f}s")
+
+    if report_path is not None:
+        with open(report_path, "w") as file:
+            json.dump(report, file, indent=2)
+
+    return failed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render the maps of a job manifest without the GUI")
+    parser.add_argument("manifest", help="json list of jobs with mode (global, region, perspective, isocontours or continent), "
+                        "output and optionally style (scientific or educational), region, projection, perspective, contour_interval, dpi and continent")
+    parser.add_argument("--workers", type=int, default=None, help="number of render processes")
+    parser.add_argument("--report", default=None, help="write the per-job timings to this json file")
+    args = parser.parse_args()
+
+    with open(args.manifest) as file:
+        jobs = json.load(file)
+
+    raise SystemExit(1 if run_manifest(jobs, args.workers, args.report) else 0)
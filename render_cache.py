@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import uuid
+from collections import OrderedDict
+
+def dataset_fingerprint(*sources):
+    # identifies the data a render was made from: files by path, size and modification
+    # time, anything else (e.g. a remote pygmt dataset name) by its string
+    parts = []
+    for source in sources:
+        if os.path.isfile(source):
+            stat = os.stat(source)
+            parts.append(f"{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}")
+        else:
+            parts.append(str(source))
+
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+class RenderCache:
+    # rendered PNGs keyed on a hash of the view parameters. Recently used images are
+    # kept in memory, everything else on disk, and both are bounded in size with the
+    # least recently used entries evicted first. Renders arrive as data and are only
+    # written to disk when they leave memory or the cache is flushed on exit
+    def __init__(self, cache_dir="./render_cache", memory_limit=64 * 1024 ** 2, disk_limit=512 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+
+        self.memory = OrderedDict()
+        self.memory_size = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, mode, region_to_plot, projection, dpi, dataset, perspective=None, contour_interval=None):
+        params = {
+            "mode": mode,
+            "region": [round(float(value), 6) for value in region_to_plot],
+            "projection": projection,
+            "dpi": dpi,
+            "dataset": dataset,
+            "perspective": list(perspective) if perspective is not None else None,
+            "contour_interval": contour_interval,
+        }
+
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def contains(self, key):
+        # membership test that does not count as a hit or a miss
+        return key in self.memory or os.path.isfile(self.path_for(key))
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+
+        path = self.path_for(key)
+        if os.path.isfile(path):
+            with open(path, "rb") as file:
+                data = file.read()
+
+            # touch the file so the disk eviction sees it as recently used
+            os.utime(path)
+            self.remember(key, data)
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        return None
+
+    def put(self, key, data):
+        # stores the PNG data of a finished render
+        self.remember(key, data)
+
+    def remember(self, key, data):
+        if key in self.memory:
+            self.memory_size -= len(self.memory.pop(key))
+
+        self.memory[key] = data
+        self.memory_size += len(data)
+
+        while self.memory_size > self.memory_limit and len(self.memory) > 1:
+            evicted_key, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+            self.spill(evicted_key, evicted)
+
+    def spill(self, key, data):
+        # writes an image to the disk tier. It is written under a name unique to this write
+        # and moved into place, so a cut off write is never a cache hit
+        path = self.path_for(key)
+        if os.path.isfile(path):
+            return
+
+        partial_path = f"{path}.{uuid.uuid4().hex[:8]}.partial"
+        with open(partial_path, "wb") as file:
+            file.write(data)
+        os.replace(partial_path, path)
+
+        self.evict_disk()
+
+    def flush(self):
+        # keeps the images still only in memory for the next session
+        for key, data in list(self.memory.items()):
+            self.spill(key, data)
+
+    def evict_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".png"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_limit:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def stats(self):
+        return f"cache: {self.hits} hits / {self.misses} misses"
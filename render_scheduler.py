@@ -0,0 +1,84 @@
+from PyQt5.QtCore import QObject, QTimer, QElapsedTimer, pyqtSignal
+
+# between a slider and the renders of its value. Every change of the value is a request,
+# requests are coalesced so that only the latest value is drawn and previews are drawn at
+# most once per frame budget while the slider moves. The value settles when the slider is
+# released, or when it stops changing for the settle delay while it is not held (keyboard
+# and wheel changes), and only then is the full quality render asked for
+
+# milliseconds between the starts of two previews during a drag
+FRAME_BUDGET = 100
+
+# milliseconds without a change after which a value that is not held is settled
+SETTLE_DELAY = 300
+
+class RenderScheduler(QObject):
+    preview = pyqtSignal(object)
+    settled = pyqtSignal(object)
+
+    def __init__(self, frame_budget=FRAME_BUDGET, settle_delay=SETTLE_DELAY, parent=None):
+        super().__init__(parent)
+
+        self.frame_budget = frame_budget
+        self.value = None
+        self.previewed_value = None
+        self.pending = False
+        self.held = False
+
+        # start of the last preview, the next one waits until the frame budget has passed
+        self.last_frame = QElapsedTimer()
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.draw_preview)
+
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(settle_delay)
+        self.settle_timer.timeout.connect(self.settle_if_idle)
+
+    def request(self, value):
+        self.value = value
+        self.pending = True
+        self.settle_timer.start()
+
+        # a preview already waiting for its frame draws this value instead of the one it was set for
+        if self.frame_timer.isActive():
+            return
+
+        wait = 0 if not self.last_frame.isValid() else max(0, self.frame_budget - self.last_frame.elapsed())
+        self.frame_timer.start(wait)
+
+    def draw_preview(self):
+        if not self.pending or self.value == self.previewed_value:
+            return
+
+        self.last_frame.start()
+        self.previewed_value = self.value
+        self.preview.emit(self.value)
+
+    def hold(self):
+        self.held = True
+
+    def release(self):
+        self.held = False
+        self.settle()
+
+    def settle_if_idle(self):
+        if not self.held:
+            self.settle()
+
+    def settle(self):
+        self.frame_timer.stop()
+        self.settle_timer.stop()
+        if not self.pending:
+            return
+
+        self.pending = False
+        self.previewed_value = None
+        self.settled.emit(self.value)
+
+    def connect_slider(self, slider):
+        slider.valueChanged.connect(self.request)
+        slider.sliderPressed.connect(self.hold)
+        slider.sliderReleased.connect(self.release)
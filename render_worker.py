@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+from grid_provider import GMT_LOCK
+from render import render_to_bytes
+
+class RenderWorker(QObject):
+    # runs the pygmt renders off the GUI thread and reports back through Qt signals.
+    # GMT sessions are not thread safe, so jobs run one at a time on a single worker
+    # thread and hold GMT_LOCK against the grid loads of other threads: a newer request replaces one still waiting in the queue, and receivers
+    # use is_current to drop the result of a job superseded while it was rendering.
+    # A job can have a quick preview pass, reported with previewed before the full pass,
+    # and layer passes drawn over the map, reported with layer_ready after it. Passes
+    # report the cache key they were submitted with and the PNG data of the image, done
+    # follows the last pass of a job, also of jobs that only have a preview
+    started = pyqtSignal(int, str)
+    previewed = pyqtSignal(int, str, bytes)
+    finished = pyqtSignal(int, str, bytes)
+    layer_ready = pyqtSignal(int, str, bytes)
+    done = pyqtSignal(int)
+    failed = pyqtSignal(int, str)
+
+    # exports write to a file the user chose and are never superseded
+    exported = pyqtSignal(str)
+    export_failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        self.latest_job = 0
+        self.pending = None
+
+    def submit(self, description, key, render_function, *args, preview=None, layers=()):
+        # preview and layers are (key, render_function, args) passes
+        return self.queue(description, (key, render_function, args), preview, list(layers))
+
+    def submit_layers(self, description, layers):
+        # only the layers of a view whose map was shown from the cache
+        return self.queue(description, None, None, list(layers))
+
+    def submit_preview(self, description, key, render_function, *args):
+        # only the quick pass, for views that change faster than the full pass renders
+        return self.queue(description, None, (key, render_function, args), [])
+
+    def queue(self, description, main, preview, layers):
+        self.latest_job += 1
+        job_id = self.latest_job
+
+        # cancel the queued request, it has been replaced by this one
+        if self.pending is not None:
+            self.pending.cancel()
+
+        self.pending = self.executor.submit(self.run, job_id, main, preview, layers)
+        self.started.emit(job_id, description)
+
+        return job_id
+
+    def run(self, job_id, main, preview, layers):
+        # skip jobs that were superseded before they reached the worker
+        if not self.is_current(job_id):
+            return
+
+        if preview is not None:
+            preview_key, preview_function, preview_args = preview
+            try:
+                self.previewed.emit(job_id, preview_key, render_to_bytes(preview_function, *preview_args))
+            except Exception:
+                # a failed preview is skipped, the full pass reports its own errors
+                pass
+
+        passes = ([(main, self.finished)] if main is not None else []) + [(layer, self.layer_ready) for layer in layers]
+        for (key, render_function, args), signal in passes:
+            # superseded while an earlier pass was rendering
+            if not self.is_current(job_id):
+                return
+
+            try:
+                data = render_to_bytes(render_function, *args)
+            except Exception as error:
+                self.failed.emit(job_id, str(error))
+                return
+
+            signal.emit(job_id, key, data)
+
+        self.done.emit(job_id)
+
+    def export(self, output_path, render_function, *args):
+        # runs on the render thread after the renders queued before it
+        self.executor.submit(self.run_export, output_path, render_function, args)
+
+    def run_export(self, output_path, render_function, args):
+        try:
+            with GMT_LOCK:
+                render_function(output_path, *args)
+        except Exception as error:
+            self.export_failed.emit(output_path, str(error))
+            return
+
+        self.exported.emit(output_path)
+
+    def is_current(self, job_id):
+        return job_id == self.latest_job
+
+    def cancel(self):
+        # supersedes queued and running jobs, e.g. when a cached image was shown instead
+        self.latest_job += 1
+
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,73 @@
+from functools import lru_cache
+import numpy as np
+from picking import ViewTransform
+from raster_pyramid import projection_width_inches
+
+# the colour map drawn into a map projection with plain numpy, for views that are only
+# shown on screen. For every output pixel the index of the texture pixel it shows is worked
+# out once per projection and size, after that a frame is a single gather from the texture
+
+# background of the pixels outside the map area, as in the GMT figures
+BACKGROUND = 255
+
+def image_size(projection, region_to_plot, dpi=300):
+    # pixel size of the map area of a figure, without the frame and annotations around it
+    transform = ViewTransform(projection, region_to_plot, dpi)
+    width = int(round(projection_width_inches(projection) * dpi))
+    height = int(round((transform.y_max - transform.y_min) * transform.scale))
+    return width, height
+
+def pixel_lonlat(transform, width, height, step=8):
+    # lon/lat of every pixel centre, NaN outside the map area. The Winkel inverse is an
+    # iterative solve, so it is done exactly on a lattice of every step-th pixel only and
+    # interpolated in between. Pixels of lattice cells crossed by the edge of the map are
+    # solved exactly, cells with all corners outside are taken as outside
+    lattice_x = np.arange(0, width + step, step) + 0.5
+    lattice_y = np.arange(0, height + step, step) + 0.5
+    lattice_lon, lattice_lat = transform.to_lonlat(*np.meshgrid(lattice_x, lattice_y))
+
+    rows, cols = np.arange(height), np.arange(width)
+    i, j = rows // step, cols // step
+    fy, fx = ((rows % step) / step)[:, None], (cols % step) / step
+
+    def interpolate(lattice):
+        top = lattice[np.ix_(i, j)] * (1 - fx) + lattice[np.ix_(i, j + 1)] * fx
+        bottom = lattice[np.ix_(i + 1, j)] * (1 - fx) + lattice[np.ix_(i + 1, j + 1)] * fx
+        return top * (1 - fy) + bottom * fy
+
+    lon, lat = interpolate(lattice_lon), interpolate(lattice_lat)
+
+    outside = np.isnan(lattice_lon).astype(np.int8)
+    corners_outside = outside[:-1, :-1] + outside[:-1, 1:] + outside[1:, 1:] + outside[1:, :-1]
+    edge_rows, edge_cols = np.nonzero(((corners_outside > 0) & (corners_outside < 4))[np.ix_(i, j)])
+    lon[edge_rows, edge_cols], lat[edge_rows, edge_cols] = transform.to_lonlat(edge_cols + 0.5, edge_rows + 0.5)
+    return lon, lat
+
+@lru_cache(maxsize=8)
+def reprojection_indices(projection, region_to_plot, dpi, texture_shape, texture_extent):
+    # flat texture index of every output pixel, -1 outside the map area. Arguments are tuples
+    # so the maps can be cached, texture_extent is the (west, east, north, south) of the texture
+    width, height = image_size(projection, region_to_plot, dpi)
+    transform = ViewTransform(projection, region_to_plot, dpi)
+
+    lon, lat = pixel_lonlat(transform, width, height)
+
+    # the texture is grid registered, its first and last rows and columns lie on the edges
+    texture_height, texture_width = texture_shape
+    west, east, north, south = texture_extent
+    rows = np.rint((lat - north) / (south - north) * (texture_height - 1))
+    cols = np.rint((lon - west) / (east - west) * (texture_width - 1))
+
+    outside = np.isnan(rows) | np.isnan(cols)
+    indices = np.nan_to_num(rows).astype(np.int64) * texture_width + np.nan_to_num(cols).astype(np.int64)
+    indices = np.clip(indices, 0, texture_height * texture_width - 1)
+    return np.where(outside, -1, indices).astype(np.int32)
+
+def reproject(texture, metadata, projection, region_to_plot, dpi=300):
+    # (height, width, 3) uint8 image of the map area of a view, from an RGB texture level
+    extent = (*metadata["longitude"], *metadata["latitude"])
+    indices = reprojection_indices(projection, tuple(region_to_plot), dpi, texture.shape[:2], extent)
+
+    pixels = np.take(texture.reshape(-1, texture.shape[2]), np.maximum(indices, 0), axis=0)
+    pixels[indices < 0] = BACKGROUND
+    return pixels
@@ -0,0 +1,47 @@
+import os
+import threading
+from concurrent.futures import Future
+from conftest import wait_until
+import continent_pages
+from continent_pages import ContinentPages, pages_version
+from grid_provider import GridProvider
+from regions import REGIONS
+
+def test_pages_version_follows_the_local_grid_file(tmp_path, monkeypatch):
+    local_file = str(tmp_path / "earth_relief_{resolution}.nc")
+    path = local_file.format(resolution="10m")
+    with open(path, "wb") as file:
+        file.write(b"grid")
+    monkeypatch.setattr(continent_pages, "default_provider", lambda: GridProvider("remote", local_file))
+
+    before = pages_version()
+
+    # a grid replaced at the same path has another size and modification time
+    with open(path, "wb") as file:
+        file.write(b"another grid")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+
+    assert pages_version() != before
+
+def test_layers_finished_on_another_thread_complete_the_page_on_the_gui_thread(app, tmp_path):
+    pages = ContinentPages(regions=REGIONS[:1], cache_dir=str(tmp_path))
+    ready = []
+    pages.page_ready.connect(lambda name: ready.append((name, threading.get_ident())))
+
+    paths = pages.layer_paths(REGIONS[0])
+    for path in paths.values():
+        partial_path = path.replace(".png", ".partial.png")
+        with open(partial_path, "wb") as file:
+            file.write(b"layer")
+        pages.pending.add(path)
+
+        future = Future()
+        future.set_result(None)
+        thread = threading.Thread(target=pages.layer_done, args=(path, partial_path, future))
+        thread.start()
+        thread.join()
+
+    wait_until(lambda: ready)
+    assert ready == [(REGIONS[0].name, threading.get_ident())]
+    assert pages.pending == set()
+    assert pages.is_ready(REGIONS[0])
@@ -0,0 +1,63 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from elevation_query import QueryEngine
+from query_server import QueryServer
+
+xr = pytest.importorskip("xarray")
+
+@pytest.fixture(scope="module")
+def engine():
+    # a 1 degree grid with a hole, the block indexes cover it in 8 by 8 node blocks
+    latitudes, longitudes = np.arange(-90, 91, 1.0), np.arange(-180, 181, 1.0)
+    values = np.add.outer(latitudes * 40, np.sin(np.radians(longitudes)) * 3000)
+    values[100:110, 200:220] = np.nan
+    grid = xr.DataArray(values, coords=[("lat", latitudes), ("lon", longitudes)], dims=["lat", "lon"])
+    return QueryEngine(grid, block=8)
+
+@pytest.mark.parametrize("region_to_plot", [[-20, 60, -40, 40], [10.5, 11.5, 5, 30], [-180, 180, -90, 90], [0, 40, 5, 25]])
+def test_region_stats_match_the_nodes_of_the_region(engine, region_to_plot):
+    west, east, south, north = region_to_plot
+    rows = (engine.latitudes >= south) & (engine.latitudes <= north)
+    cols = (engine.longitudes >= west) & (engine.longitudes <= east)
+    values = engine.values[np.ix_(rows, cols)]
+    values = values[~np.isnan(values)]
+
+    stats = engine.region_stats(region_to_plot)
+
+    assert stats["count"] == values.size
+    assert stats["min"] == pytest.approx(values.min())
+    assert stats["max"] == pytest.approx(values.max())
+    assert stats["mean"] == pytest.approx(values.mean(dtype=np.float64))
+    assert sum(stats["histogram"]) == values.size
+
+@pytest.mark.parametrize("region_to_plot", [
+    [60, -20, -40, 40],
+    [10, 10, -40, 40],
+    [-20, 60, 40, -40],
+    [-200, 60, -40, 40],
+    [-20, 60, -40, 95],
+    [-20, float("nan"), -40, 40],
+])
+def test_region_stats_reject_bad_bounds(engine, region_to_plot):
+    with pytest.raises(ValueError):
+        engine.region_stats(region_to_plot)
+
+@pytest.mark.parametrize("region_to_plot", [[60, -20, -40, 40], [-20, 60, -40, 95], [-20, 60, -40], ["a", 60, -40, 40]])
+def test_server_answers_bad_regions_with_400(engine, region_to_plot):
+    status, body = asyncio.run(QueryServer(engine).handle("/stats", json.dumps({"region": region_to_plot}).encode()))
+
+    assert status == 400 and "error" in body
+
+@pytest.mark.parametrize("start, end", [([1], [2, 3]), ([1, 2], []), ([1, 2, 3], [4, 5])])
+def test_server_answers_profiles_with_short_points_with_400(engine, start, end):
+    status, body = asyncio.run(QueryServer(engine).handle("/profile", json.dumps({"start": start, "end": end}).encode()))
+
+    assert status == 400 and "error" in body
+
+def test_server_answers_region_stats(engine):
+    status, body = asyncio.run(QueryServer(engine).handle("/stats", json.dumps({"region": [-20, 60, -40, 40]}).encode()))
+
+    # the hole lies inside the region
+    assert status == 200 and body["count"] == 81 * 81 - 10 * 20
@@ -0,0 +1,12 @@
+import numpy as np
+from flyover import camera_path, orbit
+
+def test_orbit_is_a_seamless_loop():
+    cameras = camera_path(orbit([30, 45], [-20, 60, -40, 40], frames=72))
+    azimuths = np.array([perspective[0] for perspective, _ in cameras])
+
+    # one frame every 5 degrees, the frame after the last one would be the first again
+    assert len(cameras) == 72
+    np.testing.assert_allclose(np.diff(azimuths), 5)
+    assert azimuths[-1] + 5 - 360 == azimuths[0]
+    assert all(perspective[1] == 45 and region_to_plot == [-20, 60, -40, 40] for perspective, region_to_plot in cameras)
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+import grid_provider
+from grid_provider import GridProvider
+from render import render_to_bytes
+
+def test_fingerprint_follows_the_local_grid_file(tmp_path):
+    local_file = str(tmp_path / "earth_relief_{resolution}.nc")
+    path = local_file.format(resolution="10m")
+    with open(path, "wb") as file:
+        file.write(b"grid")
+
+    provider = GridProvider("remote", local_file)
+    before = provider.fingerprint("10m")
+
+    # a grid replaced at the same path has another size and modification time
+    with open(path, "wb") as file:
+        file.write(b"another grid")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+
+    assert provider.fingerprint("10m") != before
+    assert provider.fingerprint("10m") == GridProvider("remote", local_file).fingerprint("10m")
+
+def test_fingerprint_depends_on_the_source_and_the_file():
+    fingerprints = {
+        GridProvider("remote").fingerprint("10m"),
+        GridProvider("synthetic").fingerprint("10m"),
+        GridProvider("remote", "/data/a_{resolution}.nc").fingerprint("10m"),
+        GridProvider("remote", "/data/b_{resolution}.nc").fingerprint("10m"),
+    }
+
+    assert len(fingerprints) == 4
+
+def test_grid_loads_wait_for_a_running_render(monkeypatch):
+    events = []
+    rendering = threading.Event()
+
+    def slow_render(output_path):
+        rendering.set()
+        events.append("render started")
+        time.sleep(0.1)
+        events.append("render finished")
+        with open(output_path, "wb") as file:
+            file.write(b"figure")
+
+    # GMT downloads of the remote grid run in the same GMT session as the renders
+    monkeypatch.setattr(grid_provider, "pygmt", SimpleNamespace(datasets=SimpleNamespace(load_earth_relief=lambda **kwargs: events.append("loaded"))))
+    render = threading.Thread(target=render_to_bytes, args=(slow_render,))
+    render.start()
+    rendering.wait()
+
+    GridProvider("remote").load("10m")
+    render.join()
+
+    assert events == ["render started", "render finished", "loaded"]
@@ -0,0 +1,46 @@
+import math
+from types import SimpleNamespace
+from conftest import wait_until
+from datasets import DatasetLoader
+from map_window import MapWindow
+import problem1
+import problem2
+
+class DatasetWindow:
+    # the dataset handling of the window on its own, with a status label that keeps its text
+    dataset_failed = MapWindow.dataset_failed
+    dataset_available = MapWindow.dataset_available
+    sample_height = MapWindow.sample_height
+    sampler = MapWindow.sampler
+
+    def __init__(self, datasets):
+        self.datasets = datasets
+        self.status = ""
+        self.label_status = SimpleNamespace(setText=self.set_status)
+
+    def set_status(self, text):
+        self.status = text
+
+def missing_grid():
+    raise FileNotFoundError("earth_relief_10m.nc")
+
+def test_a_dataset_that_failed_to_load_is_reported_not_raised(app):
+    datasets = DatasetLoader()
+    datasets.add("sampler", missing_grid)
+    window = DatasetWindow(datasets)
+    datasets.failed.connect(window.dataset_failed)
+    datasets.start()
+    wait_until(lambda: window.status)
+
+    # the slots asking for it afterwards get no height instead of the error
+    window.status = ""
+    assert math.isnan(window.sample_height(10, 20))
+    assert window.status == "Loading sampler failed: earth_relief_10m.nc"
+    assert not window.dataset_available("sampler")
+
+    datasets.shutdown()
+
+def test_both_visualizers_implement_the_views_of_the_window():
+    assert MapWindow.__abstractmethods__ == {"add_datasets", "map_clicked", "plot_3d_pespective", "start_perspective_sweep", "show_isocontours"}
+    assert not problem1.EarthElevationVisualizer.__abstractmethods__
+    assert not problem2.EarthElevationVisualizer.__abstractmethods__
@@ -0,0 +1,24 @@
+from concurrent.futures import Future
+from perspective_sweep import PerspectiveSweep
+from render_cache import RenderCache
+
+def rendered(data):
+    future = Future()
+    future.set_result(data)
+    return future
+
+def test_frames_of_a_cancelled_sweep_are_cached_but_not_kept(app, tmp_path):
+    cache = RenderCache(str(tmp_path))
+    sweep = PerspectiveSweep(cache)
+
+    # a frame of the previous sweep that was still rendering when it was replaced
+    stale = sweep.generation
+    sweep.cancel()
+    sweep.frame_done(stale, 10, "stale-key", rendered(b"stale"))
+
+    assert sweep.frames == {}
+    assert cache.get("stale-key") == b"stale"
+
+    sweep.frame_done(sweep.generation, 15, "key", rendered(b"frame"))
+
+    assert sweep.frames == {15: "key"}
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from picking import ViewTransform, map_size
+
+REGION_PROJECTION = "Cyl_stere/30/-20/12c"
+
+@pytest.mark.parametrize("projection, region_to_plot", [
+    (REGION_PROJECTION, [-20, 60, -40, 40]),
+    (REGION_PROJECTION, [100, 160, -50, 10]),
+    ("W6i", [-180, 180, -90, 90]),
+])
+def test_pixel_lonlat_pixel_round_trip(projection, region_to_plot):
+    transform = ViewTransform(projection, region_to_plot, 100, 0.75)
+    width, height = map_size(projection, region_to_plot)
+
+    # pixels of the map area, the margin starts it 75 pixels in from the left and top
+    px, py = np.meshgrid(np.linspace(80, 75 + width * 100 - 5, 40), np.linspace(80, 75 + height * 100 - 5, 30))
+    lon, lat = transform.to_lonlat(px, py)
+    inside = ~np.isnan(lon)
+    x, y = transform.to_pixel(lon[inside], lat[inside])
+
+    assert inside.mean() > 0.7
+    np.testing.assert_allclose(x, px[inside], atol=1e-3)
+    np.testing.assert_allclose(y, py[inside], atol=1e-3)
+
+def test_margin_is_not_part_of_the_map():
+    transform = ViewTransform(REGION_PROJECTION, [-20, 60, -40, 40], 100, 0.75)
+
+    lon, lat = transform.to_lonlat([10, 70, 80], [80, 80, 80])
+
+    assert np.isnan(lon[:2]).all()
+    assert not np.isnan(lon[2])
+
+def test_picking_finds_the_map_in_a_rendered_image(tmp_path):
+    # the map area of a GMT figure, told apart from the white margin and the black frame and
+    # annotations by its colour, is where the transform puts the region
+    pytest.importorskip("pygmt")
+    xr = pytest.importorskip("xarray")
+    Image = pytest.importorskip("PIL.Image")
+    from render import render_map, MAP_MARGIN
+
+    region_to_plot = [-20, 60, -40, 40]
+    latitudes, longitudes = np.arange(-40, 40.5, 0.5), np.arange(-20, 60.5, 0.5)
+    grid = xr.DataArray(np.add.outer(latitudes, longitudes) * 5.0 + 1000, coords=[("lat", latitudes), ("lon", longitudes)], dims=["lat", "lon"])
+
+    output_path = str(tmp_path / "map.png")
+    render_map(output_path, grid, REGION_PROJECTION, region_to_plot, dpi=100)
+    image = np.asarray(Image.open(output_path).convert("RGB")).astype(np.int16)
+
+    coloured = (image.max(axis=2) - image.min(axis=2)) > 40
+    rows, cols = np.nonzero(coloured)
+
+    transform = ViewTransform(REGION_PROJECTION, region_to_plot, 100, MAP_MARGIN)
+    left, top = transform.to_pixel(region_to_plot[0], region_to_plot[3])
+    right, bottom = transform.to_pixel(region_to_plot[1], region_to_plot[2])
+
+    assert abs(cols.min() - left) <= 2 and abs(cols.max() + 1 - right) <= 2
+    assert abs(rows.min() - top) <= 2 and abs(rows.max() + 1 - bottom) <= 2
+
+    # a pixel of the rendered map back to the pixel it was picked at
+    lon, lat = transform.to_lonlat(cols[::997] + 0.5, rows[::997] + 0.5)
+    x, y = transform.to_pixel(lon, lat)
+    np.testing.assert_allclose(x, cols[::997] + 0.5, atol=1e-3)
+    np.testing.assert_allclose(y, rows[::997] + 0.5, atol=1e-3)
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+from continent_pages import ContinentPages
+from problem2 import EarthElevationVisualizer
+from regions import REGIONS, RegionIndex
+
+class PageWindow:
+    # the parts of the window the continent page slots use, recording what is shown
+    def __init__(self, regions, continent_pages):
+        self.regions = regions
+        self.continent_pages = continent_pages
+        self.wanted_page = None
+        self.shown = {}
+        self.cleared = []
+        self.layers = SimpleNamespace(clear=self.cleared.extend)
+        self.label_status = SimpleNamespace(setText=lambda text: None)
+        self.progress_bar = SimpleNamespace(hide=lambda: None)
+
+    def display_data(self, data, view):
+        self.shown["map"] = data
+
+    def show_layer(self, name, data, dpi=300):
+        self.shown[name] = data
+
+def test_page_of_a_continent_without_an_info_panel(app, tmp_path):
+    region = REGIONS[0]._replace(info_file=str(tmp_path / "missing_info.png"))
+    regions = RegionIndex([region])
+    pages = ContinentPages(regions=[region], cache_dir=str(tmp_path / "pages"))
+    for name, path in pages.layer_paths(region).items():
+        with open(path, "wb") as file:
+            file.write(name.encode())
+
+    window = PageWindow(regions, pages)
+    window.wanted_page = region.name
+    EarthElevationVisualizer.continent_page_ready(window, region.name)
+
+    assert window.shown == {"map": b"relief", "shading": b"shading", "globe": b"globe", "highlight": b"highlight"}
+    assert window.cleared == ["info"]
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from regions import RegionIndex
+
+@pytest.fixture(scope="module")
+def regions():
+    return RegionIndex()
+
+CITIES = [
+    ("Rome", 12.5, 41.9, "europe"),
+    ("Palermo", 13.36, 38.12, "europe"),
+    ("Cagliari", 9.11, 39.22, "europe"),
+    ("Ajaccio", 8.74, 41.93, "europe"),
+    ("Marseille", 5.37, 43.3, "europe"),
+    ("Reykjavik", -21.94, 64.15, "europe"),
+    ("London", -0.13, 51.51, "europe"),
+    ("Dublin", -6.26, 53.35, "europe"),
+    ("Lisbon", -9.14, 38.72, "europe"),
+    ("Oslo", 10.75, 59.91, "europe"),
+    ("Moscow", 37.62, 55.75, "europe"),
+    ("Dakar", -17.45, 14.69, "africa"),
+    ("Tunis", 10.18, 36.81, "africa"),
+    ("Cairo", 31.24, 30.04, "africa"),
+    ("Lagos", 3.38, 6.52, "africa"),
+    ("Nairobi", 36.82, -1.29, "africa"),
+    ("Cape Town", 18.42, -33.92, "africa"),
+    ("Antananarivo", 47.52, -18.88, "africa"),
+    ("Mumbai", 72.88, 19.08, "asia"),
+    ("Colombo", 79.86, 6.93, "asia"),
+    ("Jakarta", 106.85, -6.21, "asia"),
+    ("Taipei", 121.56, 25.03, "asia"),
+    ("Sulawesi", 120.0, -2.0, "asia"),
+    ("Singapore", 103.82, 1.35, "asia"),
+    ("Manila", 120.98, 14.6, "asia"),
+    ("Beijing", 116.41, 39.9, "asia"),
+    ("Tokyo", 139.69, 35.69, "asia"),
+    ("Riyadh", 46.68, 24.71, "asia"),
+    ("Papua New Guinea", 147.0, -6.0, "australia"),
+    ("Wellington", 174.78, -41.29, "australia"),
+    ("Auckland", 174.76, -36.85, "australia"),
+    ("Sydney", 151.21, -33.87, "australia"),
+    ("Perth", 115.86, -31.95, "australia"),
+    ("Hobart", 147.33, -42.88, "australia"),
+    ("Miami", -80.19, 25.76, "north_america"),
+    ("Havana", -82.37, 23.11, "north_america"),
+    ("Panama", -79.52, 8.98, "north_america"),
+    ("New York", -74.01, 40.71, "north_america"),
+    ("Los Angeles", -118.24, 34.05, "north_america"),
+    ("Mexico City", -99.13, 19.43, "north_america"),
+    ("Anchorage", -149.9, 61.22, "north_america"),
+    ("Nuuk", -51.72, 64.18, "north_america"),
+    ("Bogota", -74.07, 4.71, "south_america"),
+    ("Lima", -77.04, -12.05, "south_america"),
+    ("Rio de Janeiro", -43.17, -22.91, "south_america"),
+    ("Buenos Aires", -58.38, -34.6, "south_america"),
+    ("McMurdo", 166.67, -77.85, "antarctica"),
+]
+
+@pytest.mark.parametrize("city, lon, lat, name", CITIES, ids=[city[0] for city in CITIES])
+def test_cities_are_on_their_continent(regions, city, lon, lat, name):
+    region = regions.region_at(lon, lat)
+
+    assert region is not None and region.name == name
+
+@pytest.mark.parametrize("lon, lat", [(-30, 30), (-150, 0), (80, -30), (-140, -40)])
+def test_open_ocean_is_not_a_continent(regions, lon, lat):
+    assert regions.region_at(lon, lat) is None
+
+def test_classify_matches_region_at(regions):
+    lon = np.array([city[1] for city in CITIES])
+    lat = np.array([city[2] for city in CITIES])
+
+    indices = regions.classify(lon, lat)
+
+    assert [regions.regions[index].name for index in indices] == [city[3] for city in CITIES]
@@ -0,0 +1,89 @@
+import time
+import pytest
+from PyQt5.QtCore import QCoreApplication
+from conftest import wait_until
+from render_worker import RenderWorker
+from render_scheduler import RenderScheduler
+
+@pytest.fixture
+def worker(app):
+    worker = RenderWorker()
+    yield worker
+    worker.shutdown()
+
+def write_data(output_path, data, delay=0):
+    # stands in for a GMT render, the data is the "image" it saves
+    time.sleep(delay)
+    with open(output_path, "wb") as file:
+        file.write(data)
+
+def test_preview_only_job_is_done_after_its_preview(worker):
+    events = []
+    worker.previewed.connect(lambda job_id, key, data: events.append(("previewed", job_id, key, data)))
+    worker.finished.connect(lambda job_id, key, data: events.append(("finished", job_id, key, data)))
+    worker.done.connect(lambda job_id: events.append(("done", job_id)))
+
+    job_id = worker.submit_preview("preview", "preview-key", write_data, b"preview")
+    wait_until(lambda: ("done", job_id) in events)
+
+    assert events == [("previewed", job_id, "preview-key", b"preview"), ("done", job_id)]
+
+def test_failed_job_is_not_done(worker):
+    events = []
+    worker.failed.connect(lambda job_id, message: events.append(("failed", job_id)))
+    worker.done.connect(lambda job_id: events.append(("done", job_id)))
+
+    def fail(output_path):
+        raise RuntimeError("no GMT session")
+
+    job_id = worker.submit("map", "key", fail)
+    wait_until(lambda: events)
+    QCoreApplication.processEvents()
+
+    assert events == [("failed", job_id)]
+
+def test_burst_of_jobs_displays_only_the_last(worker):
+    # the receiver drops superseded results like render_finished does before display_pixmap
+    displayed = []
+    worker.finished.connect(lambda job_id, key, data: displayed.append(key) if worker.is_current(job_id) else None)
+    done = []
+    worker.done.connect(done.append)
+
+    rendered = []
+    def render(output_path, key):
+        rendered.append(key)
+        write_data(output_path, key.encode(), 0.05)
+
+    job_ids = [worker.submit("map", f"key-{n}", render, f"key-{n}") for n in range(20)]
+    wait_until(lambda: job_ids[-1] in done)
+
+    assert displayed == ["key-19"]
+
+    # only the job that was running when the burst came in is rendered besides the last one
+    assert rendered[-1] == "key-19"
+    assert set(rendered) <= {"key-0", "key-19"}
+
+def test_slider_burst_renders_the_settled_value(worker):
+    scheduler = RenderScheduler(frame_budget=20, settle_delay=50)
+    scheduler.preview.connect(lambda value: worker.submit_preview("preview", f"preview-{value}", write_data, b"preview", 0.03))
+    scheduler.settled.connect(lambda value: worker.submit("full", f"full-{value}", write_data, b"full", 0.03))
+
+    displayed = []
+    worker.previewed.connect(lambda job_id, key, data: displayed.append(key) if worker.is_current(job_id) else None)
+    worker.finished.connect(lambda job_id, key, data: displayed.append(key) if worker.is_current(job_id) else None)
+    done = []
+    worker.done.connect(done.append)
+
+    # a drag of the slider: many values while it is held, then released
+    scheduler.hold()
+    for value in range(100):
+        scheduler.request(value)
+        QCoreApplication.processEvents()
+        time.sleep(0.001)
+    scheduler.release()
+    wait_until(lambda: worker.latest_job in done)
+
+    # previews are coalesced to far fewer than the values, the full pass is only of the last
+    assert len(displayed) < 20
+    assert displayed[-1] == "full-99"
+    assert [key for key in displayed if key.startswith("full-")] == ["full-99"]
@@ -0,0 +1,262 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+from raster_pyramid import RELIEF_LEVELS
+from grid_provider import GLOBAL_LIMIT
+from picking import ElevationSampler
+
+# the globe in plate carree tiles of TILE_SIZE pixels: zoom 0 is two tiles of 180 degrees
+# and every zoom level halves the tiles. The scene is in pixels of zoom 0
+TILE_SIZE = 256
+MAX_ZOOM = 7
+WORLD_WIDTH = 2 * TILE_SIZE
+
+# elevation colours of the relief tiles, close to the GMT geo table
+RELIEF_COLORS = [
+    (-8000, (10, 10, 90)), (-4000, (30, 60, 170)), (-200, (110, 170, 230)), (0, (180, 225, 245)),
+    (1, (40, 120, 50)), (500, (120, 170, 80)), (1500, (200, 190, 120)), (3000, (160, 120, 80)), (5000, (240, 240, 240)),
+]
+
+def tile_span(zoom):
+    return 180 / 2 ** zoom
+
+def tile_pixels(zoom, x, y):
+    # lon/lat of the pixel centres of a tile, as a row of longitudes and a column of latitudes
+    span = tile_span(zoom)
+    offsets = (np.arange(TILE_SIZE) + 0.5) * span / TILE_SIZE
+    return -180 + x * span + offsets, (90 - y * span - offsets)[:, None]
+
+class ColorTiles:
+    # tiles of the colour map, from the coarsest pyramid level that is fine enough. The
+    # pyramid is passed as a function returning it, so it can still be loading
+    def __init__(self, pyramid):
+        self.pyramid = pyramid
+
+    def render(self, zoom, x, y):
+        lons, lats = tile_pixels(zoom, x, y)
+        pyramid = self.pyramid()
+        level = pyramid.levels[pyramid.select_density(TILE_SIZE / tile_span(zoom))]
+
+        height, width = level.shape[:2]
+        rows = np.minimum(((90 - lats) / 180 * height).astype(np.intp), height - 1)
+        cols = np.minimum(((lons + 180) / 360 * width).astype(np.intp), width - 1)
+        return np.ascontiguousarray(level[rows, cols], dtype=np.uint8)
+
+class ReliefTiles:
+    # tiles of the relief grid coloured by elevation. Grids finer than the ones the provider
+    # keeps for the whole globe are not loaded, tiles past that are interpolated
+    def __init__(self, provider, finest=GLOBAL_LIMIT):
+        self.provider = provider
+        self.resolutions = [name for name, _ in RELIEF_LEVELS][:[name for name, _ in RELIEF_LEVELS].index(finest) + 1]
+        self.samplers = {}
+        self.lock = threading.Lock()
+
+    def sampler(self, resolution):
+        # tiles are rendered on several threads, each grid is loaded by the first one that needs it
+        with self.lock:
+            if resolution not in self.samplers:
+                self.samplers[resolution] = ElevationSampler(self.provider.global_grid(resolution))
+
+            return self.samplers[resolution]
+
+    def render(self, zoom, x, y):
+        density = TILE_SIZE / tile_span(zoom)
+        resolution = next((name for name in self.resolutions if dict(RELIEF_LEVELS)[name] >= density), self.resolutions[-1])
+
+        lons, lats = tile_pixels(zoom, x, y)
+        heights = self.sampler(resolution).sample(*np.broadcast_arrays(lons, lats))
+
+        stops = [height for height, _ in RELIEF_COLORS]
+        channels = [np.interp(np.nan_to_num(heights), stops, [color[channel] for _, color in RELIEF_COLORS]) for channel in range(3)]
+        return np.stack(channels, axis=-1).astype(np.uint8)
+
+class TileCache:
+    # bounded LRU of rendered tile images
+    def __init__(self, size=512):
+        self.size = size
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        if key not in self.tiles:
+            return None
+
+        self.tiles.move_to_end(key)
+        return self.tiles[key]
+
+    def put(self, key, image):
+        self.tiles[key] = image
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.size:
+            self.tiles.popitem(last=False)
+
+class TileLoader(QObject):
+    # renders tiles on a pool of worker threads, the numpy work releases the GIL. Requests
+    # for tiles that left the view are cancelled before they start
+    tile_ready = pyqtSignal(object, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count()), thread_name_prefix="tiles")
+        self.pending = {}
+
+    def request(self, key, source):
+        if key in self.pending:
+            return
+
+        self.pending[key] = self.executor.submit(self.load, key, source)
+
+    def load(self, key, source):
+        _, zoom, x, y = key
+        try:
+            pixels = source.render(zoom, x, y)
+        finally:
+            self.pending.pop(key, None)
+
+        # the image owns a copy of the pixels so it can be handed to the GUI thread
+        image = QImage(pixels.data, TILE_SIZE, TILE_SIZE, 3 * TILE_SIZE, QImage.Format_RGB888).copy()
+        self.tile_ready.emit(key, image)
+
+    def keep_only(self, keys):
+        for key, future in list(self.pending.items()):
+            if key not in keys and future.cancel():
+                self.pending.pop(key, None)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class TileView(QGraphicsView):
+    # slippy map of the globe: the viewport is covered with the tiles of the zoom level that
+    # matches the view scale, rendered on demand, cached and prefetched one tile around the
+    # view. Tiles of other zoom levels stay in place until the new ones arrive
+    hovered = pyqtSignal(float, float)
+
+    def __init__(self, sources, source, parent=None):
+        super().__init__(parent)
+
+        self.sources = sources
+        self.source = source
+
+        self.setScene(QGraphicsScene(0, 0, WORLD_WIDTH, WORLD_WIDTH / 2, self))
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setMouseTracking(True)
+
+        self.cache = TileCache()
+        self.loader = TileLoader(self)
+        self.loader.tile_ready.connect(self.tile_ready)
+        self.items = {}
+        self.fitted = False
+
+        # view changes are coalesced into one tile update per event loop pass
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(0)
+        self.update_timer.timeout.connect(self.update_tiles)
+        self.horizontalScrollBar().valueChanged.connect(self.update_timer.start)
+        self.verticalScrollBar().valueChanged.connect(self.update_timer.start)
+
+    def set_source(self, source):
+        self.source = source
+        for item in self.items.values():
+            self.scene().removeItem(item)
+        self.items = {}
+        self.update_timer.start()
+
+    def zoom(self):
+        # level whose tiles are drawn at one tile pixel per screen pixel or finer
+        scale = self.transform().m11() * self.devicePixelRatioF()
+        return min(MAX_ZOOM, max(0, math.ceil(math.log2(max(scale, 1e-6)))))
+
+    def tiles_in_view(self, zoom, margin=0):
+        rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        size = TILE_SIZE / 2 ** zoom
+        columns, rows = 2 ** (zoom + 1), 2 ** zoom
+
+        x0, x1 = max(0, int(rect.left() // size) - margin), min(columns - 1, int(rect.right() // size) + margin)
+        y0, y1 = max(0, int(rect.top() // size) - margin), min(rows - 1, int(rect.bottom() // size) + margin)
+        return [(self.source, zoom, x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+    def update_tiles(self):
+        zoom = self.zoom()
+        visible = self.tiles_in_view(zoom)
+        wanted = visible + [key for key in self.tiles_in_view(zoom, 1) if key not in visible]
+
+        # visible tiles are requested before the ones around the view
+        for key in wanted:
+            image = self.cache.get(key)
+            if image is not None:
+                self.show_tile(key, image)
+            else:
+                self.loader.request(key, self.sources[self.source])
+        self.loader.keep_only(set(wanted))
+
+        # tiles of other levels cover the gaps until every visible tile of this level is there
+        covered = all(key in self.items for key in visible)
+        for key in list(self.items):
+            if key not in wanted and (covered or key[1] == zoom or not self.intersects_view(key)):
+                self.scene().removeItem(self.items.pop(key))
+
+    def intersects_view(self, key):
+        return self.items[key].sceneBoundingRect().intersects(self.mapToScene(self.viewport().rect()).boundingRect())
+
+    def show_tile(self, key, image):
+        if key in self.items:
+            return
+
+        source, zoom, x, y = key
+        size = TILE_SIZE / 2 ** zoom
+        item = QGraphicsPixmapItem(QPixmap.fromImage(image))
+        item.setTransformationMode(Qt.SmoothTransformation)
+        item.setPos(x * size, y * size)
+        item.setScale(1 / 2 ** zoom)
+        item.setZValue(zoom)
+        self.scene().addItem(item)
+        self.items[key] = item
+
+    def tile_ready(self, key, image):
+        self.cache.put(key, image)
+        if key[0] == self.source and key[1] == self.zoom():
+            self.show_tile(key, image)
+            self.update_timer.start()
+
+    def wheelEvent(self, event):
+        factor = 1.25 if event.angleDelta().y() > 0 else 1 / 1.25
+
+        # from the whole globe in the view down to the finest tiles at twice their size
+        scale = self.transform().m11() * factor
+        if self.fit_scale() <= scale <= 2 ** (MAX_ZOOM + 1):
+            self.scale(factor, factor)
+            self.update_timer.start()
+
+    def fit_scale(self):
+        return min(self.viewport().width() / WORLD_WIDTH, self.viewport().height() / (WORLD_WIDTH / 2))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.fitted:
+            self.fitInView(self.sceneRect(), Qt.KeepAspectRatio)
+            self.fitted = True
+        self.update_timer.start()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_timer.start()
+
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+
+        position = self.mapToScene(event.pos())
+        lon = position.x() / WORLD_WIDTH * 360 - 180
+        lat = 90 - position.y() / (WORLD_WIDTH / 2) * 180
+        if -180 <= lon <= 180 and -90 <= lat <= 90:
+            self.hovered.emit(lon, lat)
+
+    def shutdown(self):
+        self.loader.shutdown()